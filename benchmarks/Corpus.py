@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Benchmark corpus
+
+Deterministic synthetic images for the benchmarks: the same sizes and kinds always
+produce the same pixels, so results of different commits are comparable.
+"""
+
+import math
+import os
+
+from PIL import Image
+
+SIZES = [0.5, 2.0, 12.0, 24.0, 50.0]
+
+KIND_JPEG = 'jpeg'
+KIND_PNG = 'png'
+KIND_PNG_ALPHA = 'png-alpha'
+KINDS = [KIND_JPEG, KIND_PNG, KIND_PNG_ALPHA]
+
+_EXTENSIONS = {
+    KIND_JPEG: 'jpg',
+    KIND_PNG: 'png',
+    KIND_PNG_ALPHA: 'png'
+}
+
+def create_image(megapixels, alpha=False, aspect=1.5):
+    """Creates a deterministic synthetic photo-like image
+
+    :param megapixels: The size in megapixels
+    :param alpha: Flag whether to add a (radial) alpha channel
+    :param aspect: The aspect ratio (width / height)
+    :return: The RGB or RGBA image
+    """
+    height = int(math.sqrt(megapixels * 1000000 / aspect))
+    width = int(height * aspect)
+    detail = Image.effect_mandelbrot((width, height), (-2.0, -1.0, 1.0, 1.0), 100)
+    horizontal = Image.linear_gradient('L').resize((width, height))
+    vertical = Image.linear_gradient('L').rotate(90).resize((width, height))
+    bands = [detail, horizontal, vertical]
+    if alpha:
+        bands.append(Image.radial_gradient('L').resize((width, height)))
+    return Image.merge('RGBA' if alpha else 'RGB', bands)
+
+def get_corpus_name(kind, megapixels):
+    """Returns the file name of a corpus image
+
+    :param kind: The kind, one of KINDS
+    :param megapixels: The size in megapixels
+    :return: The file name
+    """
+    return f'{kind}-{megapixels:g}mp.{_EXTENSIONS[kind]}'
+
+def create_corpus(directory, sizes=None, kinds=None):
+    """Creates the corpus images that do not exist yet in the directory
+
+    :param directory: The corpus directory
+    :param sizes: The sizes in megapixels, default SIZES
+    :param kinds: The kinds, default KINDS
+    :return: List of dicts with the keys path, kind and megapixels
+    """
+    corpus = []
+    for megapixels in sizes or SIZES:
+        for kind in kinds or KINDS:
+            path = os.path.join(directory, get_corpus_name(kind, megapixels))
+            if not os.path.exists(path):
+                img = create_image(megapixels, alpha=kind == KIND_PNG_ALPHA)
+                if kind == KIND_JPEG:
+                    img.save(path, quality=90)
+                else:
+                    img.save(path)
+            corpus.append({'path': path, 'kind': kind, 'megapixels': megapixels})
+    return corpus
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Draft decode benchmark
+
+Compares the regular scaling path with the fast (reduced JPEG decoding) path
+on synthetic camera-sized JPEGs: wall time per image and PSNR of both outputs
+against a reference that is fully decoded and resized with LANCZOS.
+
+Usage: python benchmarks/DraftDecodeBenchmark.py [--sizes 24,45] [--targets 1200,2400] [--runs 3]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'main', 'python'))
+
+from Corpus import create_image  # pylint: disable=wrong-import-position
+from Quality import get_psnr, get_reference  # pylint: disable=wrong-import-position
+from lib.Scaler import scale_image  # pylint: disable=wrong-import-position
+
+def _time_scaling(input_path, output_path, width, fast_decode, runs):
+    """Returns the best wall time of scaling the image
+
+    :param input_path: The input path
+    :param output_path: The output path
+    :param width: The target width
+    :param fast_decode: Flag whether to use reduced JPEG decoding
+    :param runs: The number of runs
+    :return: The best time in seconds
+    """
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        scale_image(input_path, output_path, width=width, fast_decode=fast_decode)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best
+
+def main():
+    """Runs the benchmark"""
+    parser = argparse.ArgumentParser(description='Benchmarks reduced JPEG decoding against the regular scaling path')
+    parser.add_argument('--sizes', default='24,45', help='Comma separated source sizes in megapixels')
+    parser.add_argument('--targets', default='1200,2400', help='Comma separated target widths in px')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per measurement, the best one is reported')
+    args = parser.parse_args()
+
+    print(f'{"source":>8} {"target":>7} {"regular [s]":>12} {"fast [s]":>9} {"speedup":>8} {"PSNR regular":>13} {"PSNR fast":>10}')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for megapixels in [float(s) for s in args.sizes.split(',')]:
+            input_path = os.path.join(tmpdir, f'{megapixels}mp.jpg')
+            create_image(megapixels).save(input_path, quality=90)
+            for width in [int(t) for t in args.targets.split(',')]:
+                regular_path = os.path.join(tmpdir, 'regular.jpg')
+                fast_path = os.path.join(tmpdir, 'fast.jpg')
+                regular = _time_scaling(input_path, regular_path, width, False, args.runs)
+                fast = _time_scaling(input_path, fast_path, width, True, args.runs)
+                with Image.open(regular_path) as img_regular, Image.open(fast_path) as img_fast:
+                    reference = get_reference(input_path, img_regular.size)
+                    psnr_regular = get_psnr(img_regular, reference)
+                    psnr_fast = get_psnr(img_fast, reference)
+                print(f'{megapixels:>6.1f}MP {width:>5}px {regular:>12.3f} {fast:>9.3f} {regular / fast:>7.2f}x {psnr_regular:>13.2f} {psnr_fast:>10.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Hand-off benchmark
+
+Measures the cost of handing buffers to a worker process and back: pickled bytes against
+shared memory descriptors (lib.SharedBuffer), per buffer size. Then times batches in
+process mode with read-ahead on the synthetic corpus, with and without shared memory.
+
+Usage: python benchmarks/HandoffBenchmark.py [--buffer-sizes 0.25,1,16,64,256] [--runs 5]
+                                             [--sizes 24,50] [--kinds jpeg,png] [--target 4000]
+                                             [--workers 2] [--corpus-dir <dir>] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'main', 'python'))
+
+from PyQt5.QtCore import QThreadPool  # pylint: disable=wrong-import-position
+
+from Corpus import KIND_JPEG, KIND_PNG, create_corpus  # pylint: disable=wrong-import-position
+from gui.threads.ScalerThread import EXECUTION_MODE_PROCESS, ScalerThread  # pylint: disable=wrong-import-position
+from lib.SharedBuffer import SharedBuffer, is_shared_memory_available  # pylint: disable=wrong-import-position
+
+def _echo_bytes(data):
+    """Returns the data, pickled both ways
+
+    :param data: The data (bytes)
+    :return: The data
+    """
+    return data
+
+def _echo_shared(buffer):
+    """Returns a copy of the buffer in a new shared buffer, only the descriptors are pickled
+
+    :param buffer: The input buffer, owned by the caller
+    :return: The output buffer, owned by the caller
+    """
+    try:
+        with buffer.attach().getbuffer() as view:
+            output = SharedBuffer.from_bytes(view)
+        output.close()
+        return output
+    finally:
+        buffer.close()
+
+def _time_handoff(executor, size, shared, runs):
+    """Returns the median time of handing a buffer to a worker and back
+
+    :param executor: The process pool executor
+    :param size: The buffer size in bytes
+    :param shared: Flag whether to use shared memory
+    :param runs: The number of runs
+    :return: The median time in seconds
+    """
+    data = os.urandom(size)
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        if shared:
+            buffer = SharedBuffer.from_bytes(data)
+            output = executor.submit(_echo_shared, buffer).result()
+            with output.attach().getbuffer() as view:
+                assert view[-1] == data[-1]
+            output.unlink()
+            buffer.unlink()
+        else:
+            output = executor.submit(_echo_bytes, data).result()
+            assert output[-1] == data[-1]
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+def _time_batch(images, outdir, target, workers, shared_memory):
+    """Returns the wall time of a batch in process mode with read-ahead
+
+    :param images: The image paths
+    :param outdir: The output directory, emptied before
+    :param target: The target width
+    :param workers: The number of worker processes
+    :param shared_memory: Flag whether to use shared memory
+    :return: The wall time in seconds
+    """
+    shutil.rmtree(outdir, ignore_errors=True)
+    os.makedirs(outdir)
+    threadpool = QThreadPool()
+    threadpool.setMaxThreadCount(workers)
+    thread = ScalerThread(images=images, width=target, outdir=outdir, createpdf=False, threadpool=threadpool,
+                          execution_mode=EXECUTION_MODE_PROCESS, incremental=False, resume=False,
+                          read_ahead=4, shared_memory=shared_memory, in_threadpool=False)
+    start = time.perf_counter()
+    thread.run()
+    return time.perf_counter() - start
+
+def main():
+    """Runs the benchmark"""
+    parser = argparse.ArgumentParser(description='Benchmarks handing buffers to worker processes, pickled against shared memory')
+    parser.add_argument('--buffer-sizes', default='0.25,1,16,64,256', help='Comma separated buffer sizes in MB')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per measurement, the median is reported')
+    parser.add_argument('--sizes', default='24,50', help='Comma separated source sizes of the batches in megapixels')
+    parser.add_argument('--kinds', default=f'{KIND_JPEG},{KIND_PNG}', help='Comma separated source kinds of the batches')
+    parser.add_argument('--target', type=int, default=4000, help='Target width of the batches in px')
+    parser.add_argument('--workers', type=int, default=2, help='Number of worker processes')
+    parser.add_argument('--corpus-dir', help='Directory to create the corpus in and reuse it from (default: temporary directory)')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    if not is_shared_memory_available():
+        print('Shared memory is not available (Python < 3.8)')
+        return
+
+    results = {'benchmark': 'HandoffBenchmark', 'runs': args.runs, 'handoff': [], 'batches': []}
+    mp_context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp_context) as executor:
+        # Starts the worker
+        executor.submit(_echo_bytes, b'').result()
+        print(f'{"buffer [MB]":>11} {"pickled [ms]":>13} {"shared [ms]":>12} {"pickled [MB/s]":>15} {"speedup":>8}')
+        for size_mb in [float(s) for s in args.buffer_sizes.split(',')]:
+            size = int(size_mb * 1024 * 1024)
+            pickled = _time_handoff(executor, size, False, args.runs)
+            shared = _time_handoff(executor, size, True, args.runs)
+            results['handoff'].append({'size_mb': size_mb, 'pickled': pickled, 'shared': shared})
+            print(f'{size_mb:>11.2f} {pickled * 1000:>13.2f} {shared * 1000:>12.2f} {2 * size_mb / pickled:>15.0f} {pickled / shared:>7.2f}x')
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        corpus_dir = args.corpus_dir or tmpdir
+        os.makedirs(corpus_dir, exist_ok=True)
+        corpus = create_corpus(corpus_dir, sizes=[float(s) for s in args.sizes.split(',')], kinds=args.kinds.split(','))
+        images = [entry['path'] for entry in corpus]
+        outdir = os.path.join(tmpdir, 'out')
+        print(f'\n{"batch":>20} {"pickled [s]":>12} {"shared [s]":>11} {"speedup":>8}')
+        pickled = min(_time_batch(images, outdir, args.target, args.workers, False) for _ in range(args.runs))
+        shared = min(_time_batch(images, outdir, args.target, args.workers, True) for _ in range(args.runs))
+        results['batches'].append({'images': len(images), 'target': args.target, 'workers': args.workers, 'pickled': pickled, 'shared': shared})
+        print(f'{f"{len(images)} images {args.target}px":>20} {pickled:>12.3f} {shared:>11.3f} {pickled / shared:>7.2f}x')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as jsonfile:
+            json.dump(results, jsonfile, indent=2)
+
+if __name__ == '__main__':
+    main()
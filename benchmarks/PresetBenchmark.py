@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Preset benchmark
+
+Compares the quality/speed presets of lib.Scaler on the synthetic corpus:
+throughput (source megapixels per second, best of N runs) and PSNR of the
+output against a reference that is fully decoded and resized with LANCZOS in one step.
+
+Usage: python benchmarks/PresetBenchmark.py [--sizes 2,24] [--kinds jpeg,png] [--targets 1200x,600x400]
+                                            [--runs 3] [--corpus-dir <dir>] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'main', 'python'))
+
+from Corpus import KIND_JPEG, KIND_PNG, create_corpus  # pylint: disable=wrong-import-position
+from Quality import get_psnr, get_reference  # pylint: disable=wrong-import-position
+from lib.Scaler import PRESETS, scale_image  # pylint: disable=wrong-import-position
+
+def _parse_target(target):
+    """Parses a target size
+
+    :param target: The target, '<width>x<height>', either may be empty
+    :return: Tuple (width, height), None for unset values
+    """
+    width, _, height = target.partition('x')
+    return (int(width) if width else None, int(height) if height else None)
+
+def _benchmark(entry, target, preset, runs, tmpdir):
+    """Benchmarks scaling a corpus image to the target with the preset
+
+    :param entry: The corpus entry
+    :param target: Tuple (width, height)
+    :param preset: The preset
+    :param runs: The number of runs
+    :param tmpdir: The directory for the outputs
+    :return: The result (dict)
+    """
+    width, height = target
+    output_path = os.path.join(tmpdir, f'{preset}' + os.path.splitext(entry['path'])[1])
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        scale_image(entry['path'], output_path, width=width, height=height, preset=preset)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    with Image.open(output_path) as img:
+        psnr = get_psnr(img, get_reference(entry['path'], img.size))
+        output_size = img.size
+    return {
+        'image': os.path.basename(entry['path']),
+        'target': {'width': width, 'height': height},
+        'preset': preset,
+        'output_size': list(output_size),
+        'time': best,
+        'megapixels_per_second': entry['megapixels'] / best,
+        'psnr': None if psnr == float('inf') else psnr
+    }
+
+def main():
+    """Runs the benchmark"""
+    parser = argparse.ArgumentParser(description='Benchmarks the quality/speed presets')
+    parser.add_argument('--sizes', default='2,24', help='Comma separated source sizes in megapixels')
+    parser.add_argument('--kinds', default=f'{KIND_JPEG},{KIND_PNG}', help='Comma separated source kinds')
+    parser.add_argument('--targets', default='1200x,600x400', help='Comma separated targets <width>x<height>, either may be empty')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per measurement, the best one is reported')
+    parser.add_argument('--corpus-dir', help='Directory to create the corpus in and reuse it from (default: temporary directory)')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        corpus_dir = args.corpus_dir or tmpdir
+        os.makedirs(corpus_dir, exist_ok=True)
+        corpus = create_corpus(corpus_dir, sizes=[float(s) for s in args.sizes.split(',')], kinds=args.kinds.split(','))
+
+        print(f'{"image":>20} {"target":>10} {"preset":>9} {"time [ms]":>10} {"MP/s":>7} {"PSNR":>6}')
+        for entry in corpus:
+            for target in [_parse_target(t) for t in args.targets.split(',')]:
+                for preset in PRESETS:
+                    result = _benchmark(entry, target, preset, args.runs, tmpdir)
+                    results.append(result)
+                    psnr = f'{result["psnr"]:.2f}' if result['psnr'] is not None else 'inf'
+                    target_txt = f'{target[0] or ""}x{target[1] or ""}'
+                    print(f'{result["image"]:>20} {target_txt:>10} {preset:>9} {result["time"] * 1000:>10.1f} '
+                          f'{result["megapixels_per_second"]:>7.1f} {psnr:>6}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as jsonfile:
+            json.dump({'benchmark': 'PresetBenchmark', 'runs': args.runs, 'results': results}, jsonfile, indent=2)
+        print(f'Wrote "{args.output}"')
+
+if __name__ == '__main__':
+    main()
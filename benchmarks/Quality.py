@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Benchmark quality metrics"""
+
+import math
+
+from PIL import Image, ImageChops, ImageStat
+
+def get_psnr(img_a, img_b):
+    """Returns the peak signal-to-noise ratio of two images of the same size
+
+    :param img_a: The first image
+    :param img_b: The second image
+    :return: The PSNR in dB
+    """
+    diff = ImageChops.difference(img_a.convert('RGB'), img_b.convert('RGB'))
+    mse = sum(ImageStat.Stat(diff).sum2) / (3 * diff.size[0] * diff.size[1])
+    if mse == 0:
+        return float('inf')
+    return 10 * math.log10(255 ** 2 / mse)
+
+def get_reference(input_path, size):
+    """Returns the reference downscale of the image: fully decoded, resized with LANCZOS in one step
+
+    :param input_path: The input path
+    :param size: The target size
+    :return: The reference image
+    """
+    with Image.open(input_path) as img:
+        return img.resize(size, Image.LANCZOS)
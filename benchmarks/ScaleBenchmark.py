@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Scale benchmark
+
+Times the stages of scaling a single image - read, decode, resample, encode and
+write, as reported by lib.Scaler.scale_image - the end-to-end time and the output size on the
+synthetic corpus, for several target sizes.
+Results are written as JSON, a previous result file can be passed to compare against.
+
+Usage: python benchmarks/ScaleBenchmark.py [--sizes 0.5,2,12,24,50] [--kinds jpeg,png,png-alpha]
+                                           [--targets 1200x,x800,1600x1600] [--runs 3] [--fast-decode]
+                                           [--jpeg-quality 75] [--max-bytes 0]
+                                           [--corpus-dir <dir>] [--output results.json] [--compare baseline.json]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import PIL
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'main', 'python'))
+
+from Corpus import SIZES, KINDS, create_corpus  # pylint: disable=wrong-import-position
+from lib.Encoder import ENCODER_DEFAULTS, get_encoder_settings  # pylint: disable=wrong-import-position
+from lib.Scaler import scale_image  # pylint: disable=wrong-import-position
+from lib.StageStats import STAGE_READ, STAGE_DECODE, STAGE_RESAMPLE, STAGE_ENCODE, STAGE_WRITE  # pylint: disable=wrong-import-position
+
+STAGES = [STAGE_READ, STAGE_DECODE, STAGE_RESAMPLE, STAGE_ENCODE, STAGE_WRITE, 'total']
+
+def _parse_target(target):
+    """Parses a target size
+
+    :param target: The target, '<width>x<height>', either may be empty
+    :return: Tuple (width, height), None for unset values
+    """
+    width, _, height = target.partition('x')
+    return (int(width) if width else None, int(height) if height else None)
+
+def _get_machine():
+    """Returns a description of the machine and the software versions
+
+    :return: The description (dict)
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'pillow': PIL.__version__,
+        'commit': commit
+    }
+
+def _summarize(durations):
+    """Returns minimum and median of the durations
+
+    :param durations: The durations in seconds
+    :return: The summary (dict)
+    """
+    return {'min': min(durations), 'median': statistics.median(durations)}
+
+def _benchmark(entry, target, fast_decode, encoder_settings, max_bytes, runs, tmpdir):
+    """Benchmarks scaling a corpus image to the target
+
+    :param entry: The corpus entry
+    :param target: Tuple (width, height)
+    :param fast_decode: Flag whether to use reduced JPEG decoding
+    :param encoder_settings: The encoder settings
+    :param max_bytes: The maximum output size in bytes, 0 for no limit
+    :param runs: The number of runs
+    :param tmpdir: The directory for the outputs
+    :return: The result (dict)
+    """
+    width, height = target
+    output_path = os.path.join(tmpdir, 'out' + os.path.splitext(entry['path'])[1])
+    durations = {stage: [] for stage in STAGES}
+    for _ in range(runs):
+        start = time.perf_counter()
+        stage_durations, bytes_in, bytes_out = scale_image(entry['path'], output_path, width=width, height=height, fast_decode=fast_decode,
+                                                                   encoder_settings=encoder_settings, max_bytes=max_bytes)
+        durations['total'].append(time.perf_counter() - start)
+        for stage, duration in stage_durations.items():
+            durations[stage].append(duration)
+
+    with Image.open(entry['path']) as img:
+        input_size = img.size
+        input_mode = img.mode
+    with Image.open(output_path) as img:
+        output_size = img.size
+    return {
+        'image': os.path.basename(entry['path']),
+        'kind': entry['kind'],
+        'megapixels': entry['megapixels'],
+        'mode': input_mode,
+        'input_size': list(input_size),
+        'input_bytes': bytes_in,
+        'target': {'width': width, 'height': height},
+        'fast_decode': fast_decode,
+        'encoder_settings': encoder_settings,
+        'max_bytes': max_bytes,
+        'output_size': list(output_size),
+        'output_bytes': bytes_out,
+        'stages': {stage: _summarize(values) for stage, values in durations.items()}
+    }
+
+def _get_key(result):
+    """Returns the key identifying a measurement across result files
+
+    :param result: The result
+    :return: The key
+    """
+    return (result['image'], result['target']['width'], result['target']['height'], result['fast_decode'])
+
+def _print_result(result, baseline=None):
+    """Prints a result line, with the change against the baseline if given
+
+    :param result: The result
+    :param baseline: The baseline result or None
+    """
+    target = f'{result["target"]["width"] or ""}x{result["target"]["height"] or ""}'
+    line = f'{result["image"]:>20} {target:>10}'
+    for stage in STAGES:
+        median = result['stages'][stage]['median']
+        line += f' {median * 1000:>10.1f}'
+        if baseline and baseline['stages'].get(stage, {}).get('median'):
+            line += f' ({median / baseline["stages"][stage]["median"] - 1:>+6.1%})'
+        elif baseline:
+            line += ' ' * 10
+    line += f' {result["output_bytes"] / 1000:>9.1f}'
+    if baseline and baseline.get('output_bytes'):
+        line += f' ({result["output_bytes"] / baseline["output_bytes"] - 1:>+6.1%})'
+    print(line)
+
+def main():
+    """Runs the benchmark"""
+    parser = argparse.ArgumentParser(description='Benchmarks the stages of scaling single images')
+    parser.add_argument('--sizes', default=','.join(f'{s:g}' for s in SIZES), help='Comma separated source sizes in megapixels')
+    parser.add_argument('--kinds', default=','.join(KINDS), help='Comma separated source kinds')
+    parser.add_argument('--targets', default='1200x,x800,1600x1600', help='Comma separated targets <width>x<height>, either may be empty')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per measurement')
+    parser.add_argument('--fast-decode', action='store_true', help='Use reduced JPEG decoding')
+    parser.add_argument('--jpeg-quality', type=int, default=ENCODER_DEFAULTS['jpeg_quality'], help='JPEG quality of the outputs')
+    parser.add_argument('--max-bytes', type=int, default=0, help='Maximum output size in bytes, 0 for no limit')
+    parser.add_argument('--corpus-dir', help='Directory to create the corpus in and reuse it from (default: temporary directory)')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='Print the changes against the results in this JSON file')
+    args = parser.parse_args()
+
+    baselines = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as jsonfile:
+            baselines = {_get_key(result): result for result in json.load(jsonfile)['results']}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        corpus_dir = args.corpus_dir or tmpdir
+        os.makedirs(corpus_dir, exist_ok=True)
+        print(f'Creating corpus in "{corpus_dir}"')
+        corpus = create_corpus(corpus_dir, sizes=[float(s) for s in args.sizes.split(',')], kinds=args.kinds.split(','))
+        encoder_settings = get_encoder_settings({'jpeg_quality': args.jpeg_quality})
+
+        print(f'{"image":>20} {"target":>10}' + ''.join(f' {stage + " [ms]":>10}' + (' ' * 10 if baselines else '') for stage in STAGES) + f' {"out [kB]":>9}')
+        results = []
+        for entry in corpus:
+            for target in [_parse_target(t) for t in args.targets.split(',')]:
+                result = _benchmark(entry, target, args.fast_decode, encoder_settings, args.max_bytes, args.runs, tmpdir)
+                results.append(result)
+                _print_result(result, baselines.get(_get_key(result)))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as jsonfile:
+            json.dump({
+                'benchmark': 'ScaleBenchmark',
+                'created': datetime.datetime.now().isoformat(timespec='seconds'),
+                'machine': _get_machine(),
+                'runs': args.runs,
+                'results': results
+            }, jsonfile, indent=2)
+        print(f'Wrote "{args.output}"')
+
+if __name__ == '__main__':
+    main()
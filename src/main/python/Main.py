@@ -9,10 +9,13 @@
 """Main"""
 
 import os
+import sys
 import logging
+import multiprocessing
 
 from lib.AppConfig import app_conf_get, get_loglevel
 from gui.GUI import GUI
+from cli.CLI import CLI
 
 def _initialize_logger():
     """Initializes the logger"""
@@ -38,12 +41,20 @@ def _initialize_logger():
         logging.getLogger().addHandler(handler_file)
 
 if __name__ == '__main__':
+    # Worker processes of the 'process' execution mode in frozen apps
+    multiprocessing.freeze_support()
+
+    basedir = os.path.dirname(__file__)
+
+    if len(sys.argv) > 1 and sys.argv[1] in CLI.COMMANDS + ['-h', '--help']:
+        # Headless, stdout is reserved for the machine-readable summary
+        _initialize_logger()
+        sys.exit(CLI(basedir).run(sys.argv[1:]))
+
     print(f'Current working directory: {os.getcwd()}')
 
     _initialize_logger()
 
-    basedir = os.path.dirname(__file__)
-
     print(f'Base directory: {basedir}')
 
     gui = GUI(basedir)
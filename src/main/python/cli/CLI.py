@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""CLI"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+
+import filetype
+
+from PyQt5.QtCore import QCoreApplication, QThreadPool, QTimer
+
+from cli.FolderWatcher import FolderWatcher
+
+from gui.threads.ScalerThread import ScalerThread, EXECUTION_MODE_THREAD, EXECUTION_MODE_PROCESS
+from lib.AppConfig import app_conf_get, app_conf_set
+from lib.Dedupe import DEDUPE_MODES, DEDUPE_OFF, PERCEPTUAL_MAX_DISTANCE
+from lib.Encoder import JPEG_SUBSAMPLINGS, OUTPUT_FORMATS, OUTPUT_FORMAT_KEEP
+from lib.Scaler import PRESETS, PRESET_BALANCED, STATUS_FAILED
+from lib.Schedule import SCHEDULES, SCHEDULE_LIST
+from lib.Utils import load_conf_from_home_folder
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_FAILED = 3
+EXIT_CANCELLED = 4
+
+_FILETYPES = ['image/jpeg', 'image/png']
+
+# Seconds between two progress log lines
+_PROGRESS_INTERVAL = 1.0
+
+def is_image_file(path):
+    """Returns whether the file is a JPEG or PNG image
+
+    :param path: The file path
+    :return: True if the file is a supported image, False else
+    """
+    try:
+        kind = filetype.guess(path)
+    except OSError:
+        return False
+    return bool(kind and kind.mime in _FILETYPES)
+
+def collect_images(paths, recursive=False):
+    """Returns the images of the given files and directories
+
+    :param paths: The files and directories
+    :param recursive: Flag whether to descend into subdirectories
+    :return: The image paths, directory contents sorted by name
+    """
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                if not recursive:
+                    dirs.clear()
+                images.extend(os.path.join(root, f) for f in sorted(files) if is_image_file(os.path.join(root, f)))
+        elif is_image_file(path):
+            images.append(path)
+        else:
+            logging.warning('Skipping "%s", not a JPEG or PNG image', path)
+    return images
+
+def read_failed_images(path):
+    """Returns the images that failed according to a records file
+
+    :param path: The records file, JSON lines as written with --records
+    :return: The image paths in the order of the records
+    :raises OSError: If the file cannot be read
+    :raises ValueError: If a line is not a valid record
+    """
+    # Image path -> None, ordered like the records, for constant time lookups
+    images = {}
+    with open(path, encoding='utf-8') as jsonfile:
+        for line in jsonfile:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record['status'] == STATUS_FAILED:
+                images.setdefault(record['input'], None)
+    return list(images)
+
+class CLI():
+    """Command line interface, scales images without a GUI, once or whenever images are added to watched directories"""
+
+    COMMANDS = ['batch', 'watch']
+
+    def __init__(self, basedir):
+        """Initializes the CLI
+
+        :param basedir: The base directory
+        """
+        logging.debug('Initializing CLI')
+
+        self.basedir = basedir
+
+        self.summary = {}
+        self.pdf_written = False
+        self.records_file = None
+
+    def run(self, argv):
+        """Runs the command
+
+        :param argv: The command line arguments, starting with the command
+        :return: The exit code
+        """
+        self._load_conf()
+        parser = self._create_parser()
+        args = parser.parse_args(argv)
+        if args.loglevel:
+            logging.getLogger().setLevel(args.loglevel)
+
+        if args.command == 'watch':
+            return self._watch(args)
+        return self._batch(args)
+
+    def _load_conf(self):
+        """Loads the configuration from the home folder, does not create it"""
+        conf_loaded, conf = load_conf_from_home_folder()
+        if conf_loaded:
+            for key, val in conf.items():
+                logging.debug('Overwriting config entry "%s": "%s"', key, val)
+                app_conf_set(key, val)
+
+    def _create_parser(self):
+        """Creates the argument parser
+
+        :return: The parser
+        """
+        parser = argparse.ArgumentParser(
+            prog='ImageScaler',
+            description='Scales images without a GUI.',
+            epilog=(f'Exit codes: {EXIT_OK} all images scaled, {EXIT_PARTIAL} some images failed, '
+                    f'{EXIT_USAGE} invalid arguments, {EXIT_FAILED} the batch failed or no images were found, '
+                    f'{EXIT_CANCELLED} the batch has been cancelled (run it again to resume).'))
+        subparsers = parser.add_subparsers(dest='command', required=True)
+
+        batch = subparsers.add_parser('batch', help='Scales the given images once')
+        batch.add_argument('inputs', nargs='*', help='Input images and/or directories')
+        batch.add_argument('-r', '--recursive', action='store_true', help='Include images in subdirectories')
+        self._add_scaling_arguments(batch)
+        batch.add_argument('-p', '--pdf-name', help='Create a PDF file <PDF_NAME>.pdf of all images in the output directory')
+        batch.add_argument('--summary', help='Write the JSON summary to this file instead of stdout')
+        batch.add_argument('--records', help='Write a result record per image to this file (JSON lines), while the batch runs')
+        batch.add_argument('--retry', metavar='RECORDS', help='Scale the images that failed according to this records file')
+        batch.add_argument('--loglevel', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='The log level')
+
+        watch = subparsers.add_parser('watch', help='Watches directories and scales new or changed images until interrupted')
+        watch.add_argument('inputs', nargs='+', help='Input directories')
+        watch.add_argument('-r', '--recursive', action='store_true', help='Watch subdirectories')
+        self._add_scaling_arguments(watch)
+        watch.add_argument('--settle-time', type=float, default=app_conf_get('watch.settle_time', 2.0),
+                           help='Seconds a file has to be unchanged before it is scaled (default: %(default)s)')
+        watch.add_argument('--poll-interval', type=float, default=app_conf_get('watch.poll_interval', 10.0),
+                           help='Seconds between polls, for file systems without change notifications (default: %(default)s)')
+        watch.add_argument('--loglevel', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='The log level')
+
+        return parser
+
+    def _add_scaling_arguments(self, parser):
+        """Adds the scaling arguments
+
+        :param parser: The (sub)parser
+        """
+        parser.add_argument('-W', '--width', type=int, help='Maximum width in px')
+        parser.add_argument('-H', '--height', type=int, help='Maximum height in px')
+        parser.add_argument('-o', '--outdir', required=True, help='Output directory')
+        parser.add_argument('-s', '--suffix', default='-scaled', help='Suffix of the scaled images (default: %(default)s)')
+        parser.add_argument('-w', '--workers', type=int, help='Number of workers (default: number of CPU cores)')
+        parser.add_argument('--auto-workers', action='store_true', default=app_conf_get('scaling.auto_workers', False),
+                            help='Adjust the number of workers to the throughput while scaling, starting with --workers')
+        parser.add_argument('--max-workers', type=int, default=app_conf_get('scaling.max_workers', 0),
+                            help='Maximum number of workers with --auto-workers, 0 for twice the number of CPU cores (default: %(default)s)')
+        parser.add_argument('--schedule', choices=SCHEDULES, default=app_conf_get('scaling.schedule', SCHEDULE_LIST),
+                            help='Order in which the images are started, "largest-first" for the shortest batch, "smallest-first" for early results, '
+                                 'outputs and PDF pages keep the list order (default: %(default)s)')
+        parser.add_argument('--memory-budget', type=int, default=app_conf_get('scaling.memory_budget_mb', 0),
+                            help='Memory in MB the decoded images scaled at the same time may take, 0 for half of the physical memory (default: %(default)s)')
+        parser.add_argument('--strip-min-mp', type=int, default=app_conf_get('scaling.strip_min_mp', 64),
+                            help='Size in megapixels from which PNGs are decoded in strips with bounded memory, 0 to never decode in strips (default: %(default)s)')
+        parser.add_argument('--no-strip-mmap', dest='strip_mmap', action='store_false', default=app_conf_get('scaling.strip_mmap', True),
+                            help='Keep the reduced images of images decoded in strips on the heap instead of in memory-mapped temporary files')
+        parser.add_argument('--max-image-pixels', type=int, default=app_conf_get('scaling.max_image_pixels', 0),
+                            help='Number of pixels above which images are refused as decompression bombs, 0 for the default of Pillow (default: %(default)s)')
+        parser.add_argument('--read-ahead', type=int, default=app_conf_get('scaling.read_ahead', 4),
+                            help='Number of images read ahead while scaling, outputs are written in the background, 0 to read and write in the workers (default: %(default)s)')
+        parser.add_argument('--no-shared-memory', dest='shared_memory', action='store_false', default=app_conf_get('scaling.shared_memory', True),
+                            help='Pickle the inputs read ahead and the outputs of worker processes instead of handing them over in shared memory')
+        parser.add_argument('--dedupe', choices=DEDUPE_MODES, default=app_conf_get('scaling.dedupe', DEDUPE_OFF),
+                            help='Skip duplicate inputs, "exact" for identical files, "perceptual" also for images that look alike (default: %(default)s)')
+        parser.add_argument('--dedupe-max-distance', type=int, default=app_conf_get('scaling.dedupe_max_distance', PERCEPTUAL_MAX_DISTANCE),
+                            help='Maximum number of differing bits (of 64) of the perceptual hashes of near-duplicates (default: %(default)s)')
+        parser.add_argument('--mode', choices=[EXECUTION_MODE_THREAD, EXECUTION_MODE_PROCESS],
+                            default=app_conf_get('scaling.execution_mode', EXECUTION_MODE_THREAD),
+                            help='Scale in threads or worker processes (default: %(default)s)')
+        parser.add_argument('--preset', choices=list(PRESETS), default=app_conf_get('scaling.preset', PRESET_BALANCED),
+                            help='Quality/speed preset of the resampling step (default: %(default)s)')
+        parser.add_argument('--fast-decode', action='store_true', default=app_conf_get('scaling.fast_decode', False),
+                            help='Decode JPEGs at a reduced scale for large downscales')
+        parser.add_argument('--no-incremental', dest='incremental', action='store_false', default=app_conf_get('scaling.incremental', True),
+                            help='Scale all images, even if their output is up to date')
+        parser.add_argument('--incremental-hash', action='store_true', default=app_conf_get('scaling.incremental_hash', False),
+                            help='Compare content hashes of inputs whose mtime changed')
+        parser.add_argument('--no-resume', dest='resume', action='store_false', default=app_conf_get('scaling.resume', True),
+                            help='Do not keep a checkpoint journal to resume an interrupted batch')
+        parser.add_argument('-f', '--format', choices=list(OUTPUT_FORMATS), default=app_conf_get('encoding.output_format', OUTPUT_FORMAT_KEEP),
+                            help='Output format, "keep" writes the format of the input (default: %(default)s)')
+        parser.add_argument('--jpeg-quality', type=int, default=app_conf_get('encoding.jpeg_quality', 75),
+                            help='JPEG quality, 1-95 (default: %(default)s)')
+        parser.add_argument('--jpeg-progressive', action='store_true', default=app_conf_get('encoding.jpeg_progressive', False),
+                            help='Write progressive JPEGs')
+        parser.add_argument('--jpeg-optimize', action='store_true', default=app_conf_get('encoding.jpeg_optimize', False),
+                            help='Optimize the Huffman tables of JPEGs (smaller, slower)')
+        parser.add_argument('--jpeg-subsampling', choices=JPEG_SUBSAMPLINGS, default=app_conf_get('encoding.jpeg_subsampling', '4:2:0'),
+                            help='Chroma subsampling of JPEGs (default: %(default)s)')
+        parser.add_argument('--png-compress-level', type=int, default=app_conf_get('encoding.png_compress_level', 6),
+                            help='PNG compression level, 0 (none, fastest) - 9 (smallest) (default: %(default)s)')
+        parser.add_argument('--webp-quality', type=int, default=app_conf_get('encoding.webp_quality', 80),
+                            help='WebP quality, 1-100, the compression effort for lossless WebP (default: %(default)s)')
+        parser.add_argument('--webp-method', type=int, default=app_conf_get('encoding.webp_method', 4),
+                            help='WebP encoder method, 0 (fastest) - 6 (smallest) (default: %(default)s)')
+        parser.add_argument('--max-bytes', type=int, default=app_conf_get('encoding.max_bytes', 0),
+                            help='Maximum size of an output in bytes, lowers the JPEG or WebP quality until it fits, 0 for no limit (default: %(default)s)')
+
+    def _check_scaling_arguments(self, args):
+        """Checks the scaling arguments and creates the output directory
+
+        :param args: The parsed arguments
+        :return: True if the arguments are valid, False else
+        """
+        if not args.width and not args.height:
+            logging.error('Width or height required')
+            return False
+        if not 1 <= args.jpeg_quality <= 95:
+            logging.error('JPEG quality must be between 1 and 95')
+            return False
+        if not 0 <= args.png_compress_level <= 9:
+            logging.error('PNG compression level must be between 0 and 9')
+            return False
+        if not 1 <= args.webp_quality <= 100:
+            logging.error('WebP quality must be between 1 and 100')
+            return False
+        if not 0 <= args.webp_method <= 6:
+            logging.error('WebP method must be between 0 and 6')
+            return False
+        if args.max_bytes < 0:
+            logging.error('Maximum output size must not be negative')
+            return False
+        if args.memory_budget < 0:
+            logging.error('Memory budget must not be negative')
+            return False
+        if args.strip_min_mp < 0 or args.max_image_pixels < 0:
+            logging.error('Strip size and maximum image pixels must not be negative')
+            return False
+        if args.read_ahead < 0:
+            logging.error('Read-ahead must not be negative')
+            return False
+        if (args.workers is not None and args.workers < 1) or args.max_workers < 0:
+            logging.error('Number of workers must be positive')
+            return False
+        if not 0 <= args.dedupe_max_distance < 64:
+            logging.error('Dedupe distance must be between 0 and 63')
+            return False
+        if not os.path.isdir(args.outdir):
+            try:
+                os.makedirs(args.outdir)
+            except OSError as ex:
+                logging.error('Could not create output directory "%s": %s', args.outdir, ex)
+                return False
+        return True
+
+    def _create_threadpool(self, args):
+        """Creates the thread pool of the workers
+
+        :param args: The parsed arguments
+        :return: The thread pool
+        """
+        threadpool = QThreadPool()
+        if args.workers:
+            threadpool.setMaxThreadCount(args.workers)
+        return threadpool
+
+    def _create_scaler_thread(self, args, images, threadpool, pdf_name=None, in_threadpool=True):
+        """Creates the ScalerThread of a batch
+
+        :param args: The parsed arguments
+        :param images: The images
+        :param threadpool: The thread pool of the workers
+        :param pdf_name: The name of the PDF file, None for no PDF file
+        :param in_threadpool: Flag whether the ScalerThread is started in the thread pool, False if it is run directly
+        :return: The ScalerThread
+        """
+        return ScalerThread(
+            images=images,
+            width=args.width,
+            height=args.height,
+            outdir=args.outdir,
+            createpdf=bool(pdf_name),
+            scaled_image_suffix=args.suffix,
+            pdf_name=pdf_name,
+            threadpool=threadpool,
+            execution_mode=args.mode,
+            fast_decode=args.fast_decode,
+            pdf_jpeg_passthrough=app_conf_get('pdf.jpeg_passthrough', True),
+            incremental=args.incremental,
+            incremental_hash=args.incremental_hash,
+            log_stage_stats=app_conf_get('logging.stage_stats', False),
+            resume=args.resume,
+            preset=args.preset,
+            output_format=args.format,
+            encoder_settings={
+                'jpeg_quality': args.jpeg_quality,
+                'jpeg_progressive': args.jpeg_progressive,
+                'jpeg_optimize': args.jpeg_optimize,
+                'jpeg_subsampling': args.jpeg_subsampling,
+                'png_compress_level': args.png_compress_level,
+                'webp_quality': args.webp_quality,
+                'webp_method': args.webp_method
+            },
+            max_bytes=args.max_bytes,
+            memory_budget_mb=args.memory_budget,
+            strip_min_mp=args.strip_min_mp,
+            strip_mmap=args.strip_mmap,
+            max_image_pixels=args.max_image_pixels,
+            read_ahead=args.read_ahead,
+            shared_memory=args.shared_memory,
+            auto_workers=args.auto_workers,
+            max_workers=args.max_workers,
+            schedule=args.schedule,
+            in_threadpool=in_threadpool,
+            dedupe=args.dedupe,
+            dedupe_max_distance=args.dedupe_max_distance,
+            progress_interval=_PROGRESS_INTERVAL)
+
+    def _batch(self, args):
+        """Scales the images once
+
+        :param args: The parsed arguments
+        :return: The exit code
+        """
+        if not self._check_scaling_arguments(args):
+            return EXIT_USAGE
+
+        if not args.inputs and not args.retry:
+            logging.error('Input images or --retry required')
+            return EXIT_USAGE
+        images = collect_images(args.inputs, recursive=args.recursive)
+        if args.retry:
+            try:
+                failed_images = read_failed_images(args.retry)
+            except (OSError, ValueError, KeyError) as ex:
+                logging.error('Could not read records "%s": %s', args.retry, ex)
+                return EXIT_USAGE
+            logging.info('Retrying %d failed images', len(failed_images))
+            known_images = set(images)
+            images.extend(img for img in failed_images if img not in known_images)
+        self.summary = {
+            'images': len(images),
+            'scaled': 0,
+            'cached': 0,
+            'failed': [],
+            'duplicates': {},
+            'tuning': [],
+            'outdir': os.path.abspath(args.outdir),
+            'output_format': args.format,
+            'pdf': None,
+            'records': os.path.abspath(args.records) if args.records else None,
+            'wall_time': 0.0,
+            'workers': {},
+            'stages': {},
+            'cancelled': False,
+            'error': None
+        }
+        if not images:
+            logging.error('No images found')
+            self.summary['error'] = 'No images found'
+            self._write_summary(args.summary)
+            return EXIT_FAILED
+
+        if args.records:
+            try:
+                self.records_file = open(args.records, 'w', encoding='utf-8')
+            except OSError as ex:
+                logging.error('Could not open records "%s": %s', args.records, ex)
+                return EXIT_USAGE
+
+        threadpool = self._create_threadpool(args)
+        # Runs on this thread, not in the pool of the workers
+        thread = self._create_scaler_thread(args, images, threadpool, pdf_name=args.pdf_name, in_threadpool=False)
+        thread.signals.scalingprogress.connect(self._callback_processing_progress)
+        thread.signals.scalingrecords.connect(self._callback_processing_records)
+        thread.signals.scalingerror.connect(self._callback_processing_error)
+        thread.signals.scalingworkerstats.connect(self._callback_processing_stats)
+        thread.signals.scalingstagestats.connect(self._callback_processing_stage_stats)
+        thread.signals.scalingfinished.connect(self._callback_processing_finished)
+
+        def _cancel(_signum, _frame):
+            logging.info('Interrupted')
+            thread.cancel()
+        signal.signal(signal.SIGINT, _cancel)
+        signal.signal(signal.SIGTERM, _cancel)
+        # Runs the batch in this thread, the images are scaled on the thread pool
+        thread.run()
+        threadpool.waitForDone()
+        if self.records_file:
+            self.records_file.close()
+            self.records_file = None
+
+        if self.pdf_written:
+            self.summary['pdf'] = os.path.abspath(os.path.join(args.outdir, f'{args.pdf_name}.pdf'))
+        self._write_summary(args.summary)
+
+        if self.summary['error']:
+            return EXIT_FAILED
+        if self.summary['cancelled']:
+            return EXIT_CANCELLED
+        if self.summary['failed']:
+            return EXIT_PARTIAL
+        return EXIT_OK
+
+    def _watch(self, args):
+        """Watches the input directories and scales new or changed images until interrupted
+
+        :param args: The parsed arguments
+        :return: The exit code
+        """
+        if not self._check_scaling_arguments(args):
+            return EXIT_USAGE
+        for path in args.inputs:
+            if not os.path.isdir(path):
+                logging.error('"%s" is not a directory', path)
+                return EXIT_USAGE
+
+        app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+        threadpool = self._create_threadpool(args)
+        watcher = FolderWatcher(
+            args.inputs,
+            args.outdir,
+            is_image_file,
+            lambda images: self._create_scaler_thread(args, images, threadpool),
+            threadpool,
+            recursive=args.recursive,
+            settle_time=args.settle_time,
+            poll_interval=args.poll_interval)
+
+        def _quit(_signum, _frame):
+            logging.info('Interrupted')
+            app.quit()
+        signal.signal(signal.SIGINT, _quit)
+        signal.signal(signal.SIGTERM, _quit)
+        # Returns to the interpreter regularly, Python signal handlers do not run inside the Qt event loop
+        signal_timer = QTimer()
+        signal_timer.timeout.connect(lambda: None)
+        signal_timer.start(500)
+
+        watcher.start()
+        app.exec_()
+        watcher.stop()
+        if watcher.is_busy():
+            logging.info('Waiting for the running batch to stop')
+        threadpool.waitForDone()
+
+        return EXIT_OK
+
+    def _write_summary(self, path):
+        """Writes the summary as JSON
+
+        :param path: The file path, None for stdout
+        """
+        if path:
+            with open(path, 'w', encoding='utf-8') as jsonfile:
+                json.dump(self.summary, jsonfile, indent=2)
+        else:
+            json.dump(self.summary, sys.stdout, indent=2)
+            sys.stdout.write('\n')
+
+    def _callback_processing_progress(self, progress):
+        """The processing callback, on progress
+
+        :param progress: The progress report, see lib.Progress.Progress.get_report
+        """
+        logging.info('%d/%d images processed (%d up to date), %.0f%%, %.1f images/s, %.1f MB/s, %s remaining',
+                     progress['processed'], progress['total'], progress['cached'], progress['fraction'] * 100,
+                     progress['images_per_s'], progress['mb_per_s'], f'{progress["eta"]:.0f}s' if progress['eta'] is not None else 'unknown')
+
+    def _callback_processing_records(self, records):
+        """The processing callback, on result records
+
+        :param records: The result records, see lib.Scaler.get_result_record
+        """
+        if self.records_file:
+            self.records_file.writelines(json.dumps(record) + '\n' for record in records)
+            self.records_file.flush()
+
+    def _callback_processing_error(self, ex):
+        """The processing callback, on error
+
+        :param ex: The exception
+        """
+        logging.error('Failed to process: "%s"', ex)
+        self.summary['error'] = str(ex)
+
+    def _callback_processing_stats(self, stats):
+        """The processing callback, on statistics
+
+        :param stats: The batch statistics
+        """
+        self.summary['scaled'] = stats['scaled']
+        self.summary['cached'] = stats['cached']
+        self.summary['failed'] = stats['failed']
+        self.summary['duplicates'] = stats['duplicates']
+        self.summary['tuning'] = stats['tuning']
+        self.summary['wall_time'] = stats['wall_time']
+        self.summary['workers'] = stats['workers']
+        self.summary['cancelled'] = stats['cancelled']
+
+    def _callback_processing_stage_stats(self, stats):
+        """The processing callback, on stage statistics
+
+        :param stats: The stage statistics
+        """
+        self.summary['stages'] = stats
+
+    def _callback_processing_finished(self, img_processed, img_cnt, pdf_written):
+        """The processing callback, on finished
+
+        :param img_processed: Number of scaled images, not counting the ones that were up to date
+        :param img_cnt: Number of images
+        :param pdf_written: Boolean flag whether a PDF file has been written
+        """
+        logging.info('%d/%d images scaled', img_processed, img_cnt)
+        self.pdf_written = pdf_written
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Folder watcher"""
+
+import logging
+import os
+import time
+
+from PyQt5.QtCore import QObject, QTimer, QFileSystemWatcher, pyqtSlot
+
+class FolderWatcher(QObject):
+    """Watches input directories and scales new or changed images
+
+    Directory changes are reported by the OS (inotify, kqueue, ReadDirectoryChangesW) via
+    QFileSystemWatcher, the directories are additionally polled (stat only) for file systems
+    that do not report changes, e.g. network shares.
+    A file is processed once its size and mtime did not change for the settle time,
+    so that partially written files are not picked up. Only one batch runs at a time,
+    files that become ready meanwhile are collected for the next batch.
+    """
+
+    def __init__(self, dirs, outdir, is_image_file, create_thread, threadpool, recursive=False, settle_time=2.0, poll_interval=10.0):
+        """Initializes the watcher
+
+        :param dirs: The directories to watch
+        :param outdir: The output directory, never treated as input
+        :param is_image_file: Function returning whether a file is a supported image
+        :param create_thread: Function returning a ScalerThread for a list of images
+        :param threadpool: The thread pool the ScalerThreads are started in
+        :param recursive: Flag whether to watch subdirectories
+        :param settle_time: The time in seconds a file has to be unchanged before it is processed
+        :param poll_interval: The polling interval in seconds
+        """
+        super().__init__()
+
+        logging.debug('Initializing FolderWatcher')
+
+        self.dirs = [os.path.abspath(d) for d in dirs]
+        self.outdir = os.path.abspath(outdir)
+        self.is_image_file = is_image_file
+        self.create_thread = create_thread
+        self.threadpool = threadpool
+        self.recursive = recursive
+        self.settle_time = settle_time
+
+        # path -> (size, mtime) of files that have been processed or ignored
+        self._processed = {}
+        # path -> ((size, mtime), time the signature was first seen)
+        self._candidates = {}
+        # path -> (size, mtime) of files ready for the next batch
+        self._ready = {}
+        self._batch = {}
+        self._thread = None
+
+        self._fs_watcher = QFileSystemWatcher()
+        self._fs_watcher.directoryChanged.connect(self._directory_changed)
+
+        self._scan_timer = QTimer()
+        self._scan_timer.setSingleShot(True)
+        self._scan_timer.timeout.connect(self._scan)
+
+        self._poll_timer = QTimer()
+        self._poll_timer.setInterval(int(poll_interval * 1000))
+        self._poll_timer.timeout.connect(self._scan)
+
+    def start(self):
+        """Starts watching"""
+        for directory in self.dirs:
+            logging.info('Watching "%s"', directory)
+        self._fs_watcher.addPaths(self.dirs)
+        self._poll_timer.start()
+        self._scan()
+
+    def stop(self):
+        """Stops watching, a running batch is cancelled"""
+        logging.info('Stopping to watch')
+        if self._thread:
+            self._thread.cancel()
+        self._poll_timer.stop()
+        self._scan_timer.stop()
+        if self._fs_watcher.directories():
+            self._fs_watcher.removePaths(self._fs_watcher.directories())
+
+    def is_busy(self):
+        """Returns whether a batch is running
+
+        :return: True if a batch is running, False else
+        """
+        return bool(self._batch)
+
+    @pyqtSlot(str)
+    def _directory_changed(self, path):
+        """Schedules a scan, events are debounced
+
+        :param path: The changed directory
+        """
+        logging.debug('Directory "%s" changed', path)
+        self._schedule_scan(0.5)
+
+    def _schedule_scan(self, delay):
+        """Schedules a scan unless one is scheduled earlier
+
+        :param delay: The delay in seconds
+        """
+        delay_ms = int(delay * 1000)
+        if not self._scan_timer.isActive() or self._scan_timer.remainingTime() > delay_ms:
+            self._scan_timer.start(delay_ms)
+
+    def _iter_files(self):
+        """Iterates the files of the watched directories
+
+        :return: Generator of (path, os.stat_result)
+        """
+        dirs = list(self.dirs)
+        while dirs:
+            directory = dirs.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.name.startswith('.'):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.recursive and os.path.abspath(entry.path) != self.outdir:
+                                dirs.append(entry.path)
+                                if entry.path not in self._fs_watcher.directories():
+                                    self._fs_watcher.addPath(entry.path)
+                        elif entry.is_file():
+                            yield entry.path, entry.stat()
+            except OSError as ex:
+                logging.warning('Could not scan "%s": %s', directory, ex)
+
+    @pyqtSlot()
+    def _scan(self):
+        """Scans the directories for new or changed files and starts a batch of the ready ones"""
+        now = time.monotonic()
+        seen = set()
+        for path, stat in self._iter_files():
+            if os.path.dirname(os.path.abspath(path)) == self.outdir:
+                continue
+            seen.add(path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if self._processed.get(path) == signature or self._ready.get(path) == signature or self._batch.get(path) == signature:
+                continue
+            candidate = self._candidates.get(path)
+            if not candidate or candidate[0] != signature:
+                self._candidates[path] = (signature, now)
+            elif now - candidate[1] >= self.settle_time:
+                del self._candidates[path]
+                if self.is_image_file(path):
+                    logging.debug('File "%s" is ready', path)
+                    self._ready[path] = signature
+                else:
+                    self._processed[path] = signature
+
+        for path in [p for p in self._candidates if p not in seen]:
+            del self._candidates[path]
+        if self._candidates:
+            # Files are still being written, check again when they might have settled
+            self._schedule_scan(self.settle_time)
+
+        self._start_batch()
+
+    def _start_batch(self):
+        """Starts a batch of the ready files unless a batch is running"""
+        if self._batch or not self._ready:
+            return
+        self._batch = self._ready
+        self._ready = {}
+        logging.info('Processing %d new or changed images', len(self._batch))
+        thread = self.create_thread(sorted(self._batch))
+        self._thread = thread
+        thread.signals.scalingerror.connect(self._batch_error)
+        thread.signals.scalingworkerstats.connect(self._batch_stats)
+        thread.signals.scalingfinished.connect(self._batch_finished)
+        self.threadpool.start(thread)
+
+    @pyqtSlot(object)
+    def _batch_error(self, ex):
+        """Logs a failed batch, its files are retried when they change
+
+        :param ex: The exception
+        """
+        logging.error('Failed to process batch: "%s"', ex)
+
+    @pyqtSlot(object)
+    def _batch_stats(self, stats):
+        """Logs the statistics of a batch
+
+        :param stats: The batch statistics
+        """
+        logging.info('Scaled %d images, %d were up to date, in %.2fs', stats['scaled'], stats['cached'], stats['wall_time'])
+        for img in stats['failed']:
+            logging.warning('Failed to scale "%s"', img)
+
+    @pyqtSlot(object, object, object)
+    def _batch_finished(self, img_processed, img_cnt, _pdf_written):
+        """Marks the files of the batch as processed and starts the next batch
+
+        :param img_processed: Number of scaled images, not counting the ones that were up to date
+        :param img_cnt: Number of images
+        :param _pdf_written: Boolean flag whether a PDF file has been written
+        """
+        logging.info('Scaled %d/%d images', img_processed, img_cnt)
+        self._processed.update(self._batch)
+        self._batch = {}
+        self._thread = None
+        self._start_batch()
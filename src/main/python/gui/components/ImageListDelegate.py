@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""ImageListDelegate"""
+
+import logging
+
+from PyQt5.QtCore import Qt, QEvent, QPersistentModelIndex, QRect, QSize
+from PyQt5.QtGui import QPalette
+from PyQt5.QtWidgets import QApplication, QStyle, QStyledItemDelegate, QStyleOptionButton, QStyleOptionViewItem
+
+# Margin around the file name and the remove button, in px
+_MARGIN = 6
+
+class ImageListDelegate(QStyledItemDelegate):
+    """Paints the file name and a remove button of the list elements
+
+    No widgets are created per element, clicking the button removes the row from the model.
+    """
+
+    def __init__(self, i18n, parent=None):
+        """Initializes the delegate
+
+        :param i18n: The I18n
+        :param parent: The parent component
+        """
+        super(ImageListDelegate, self).__init__(parent)
+
+        self.i18n = i18n
+        self.remove_text = self.i18n.translate('GUI.MAIN.WIDGET.REMOVE')
+
+        self._button_size = None
+        self._pressed = QPersistentModelIndex()
+
+    def _get_style(self, option):
+        """Returns the style of the view
+
+        :param option: The style option
+        :return: The style
+        """
+        return option.widget.style() if option.widget else QApplication.style()
+
+    def _get_button_size(self, option):
+        """Returns the size of the remove button, the same for all elements
+
+        :param option: The style option
+        :return: The size
+        """
+        if self._button_size is None:
+            button = QStyleOptionButton()
+            button.text = self.remove_text
+            text_size = option.fontMetrics.size(Qt.TextShowMnemonic, self.remove_text)
+            self._button_size = self._get_style(option).sizeFromContents(QStyle.CT_PushButton, button, text_size, option.widget)
+        return self._button_size
+
+    def _get_button_rect(self, option):
+        """Returns the area of the remove button in the element
+
+        :param option: The style option
+        :return: The area
+        """
+        size = self._get_button_size(option)
+        rect = option.rect
+        return QRect(rect.right() - _MARGIN - size.width() + 1, rect.top() + (rect.height() - size.height()) // 2,
+                     size.width(), size.height())
+
+    # @override
+    def sizeHint(self, option, index):
+        """sizeHint
+
+        :param option: The style option
+        :param index: The index
+        :return: The size of an element
+        """
+        button_size = self._get_button_size(option)
+        return QSize(button_size.width() + 2 * _MARGIN,
+                     max(button_size.height(), option.fontMetrics.height()) + 2 * _MARGIN)
+
+    # @override
+    def paint(self, painter, option, index):
+        """paint
+
+        :param painter: The painter
+        :param option: The style option
+        :param index: The index
+        """
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        style = self._get_style(opt)
+        text = opt.text
+        # Background, selection and focus
+        opt.text = ''
+        style.drawControl(QStyle.CE_ItemViewItem, opt, painter, opt.widget)
+
+        button_rect = self._get_button_rect(opt)
+        text_rect = QRect(opt.rect.left() + _MARGIN, opt.rect.top(),
+                          button_rect.left() - opt.rect.left() - 2 * _MARGIN, opt.rect.height())
+        painter.save()
+        selected = opt.state & QStyle.State_Selected
+        painter.setPen(opt.palette.color(QPalette.HighlightedText if selected else QPalette.Text))
+        painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignVCenter, opt.fontMetrics.elidedText(text, Qt.ElideMiddle, text_rect.width()))
+        painter.restore()
+
+        button = QStyleOptionButton()
+        button.rect = button_rect
+        button.text = self.remove_text
+        button.state = QStyle.State_Enabled | (QStyle.State_Sunken if self._pressed == index else QStyle.State_Raised)
+        style.drawControl(QStyle.CE_PushButton, button, painter, opt.widget)
+
+    # @override
+    def editorEvent(self, event, model, option, index):
+        """editorEvent
+
+        :param event: The event
+        :param model: The model
+        :param option: The style option
+        :param index: The index
+        :return: True if the event has been handled, False else
+        """
+        if event.type() not in (QEvent.MouseButtonPress, QEvent.MouseButtonRelease, QEvent.MouseButtonDblClick):
+            return super().editorEvent(event, model, option, index)
+        on_button = event.button() == Qt.LeftButton and self._get_button_rect(option).contains(event.pos())
+        if event.type() == QEvent.MouseButtonRelease:
+            pressed = self._pressed == index
+            self._pressed = QPersistentModelIndex()
+            if option.widget:
+                # Repaints the button raised, also if released elsewhere
+                option.widget.viewport().update()
+            if pressed and on_button:
+                logging.debug('Removing element #%d', index.row())
+                model.removeRow(index.row())
+                return True
+            return pressed
+        if on_button:
+            self._pressed = QPersistentModelIndex(index)
+            return True
+        return super().editorEvent(event, model, option, index)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""ImageListModel"""
+
+import logging
+import os
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+
+from lib.ImageList import ImageList
+
+# Role of the image path
+PATH_ROLE = Qt.UserRole
+
+class ImageListModel(QAbstractListModel):
+    """Model of the selected images, backed by a lib.ImageList
+
+    Rows are added in batches, removed and moved (internal drag and drop) without copying the list.
+    """
+
+    def __init__(self, parent=None):
+        """Initializes the model
+
+        :param parent: The parent object
+        """
+        super(ImageListModel, self).__init__(parent)
+
+        self.image_list = ImageList()
+
+    # @override
+    def rowCount(self, parent=QModelIndex()):
+        """rowCount
+
+        :param parent: The parent index
+        :return: The number of rows
+        """
+        if parent.isValid():
+            return 0
+        return len(self.image_list)
+
+    # @override
+    def data(self, index, role=Qt.DisplayRole):
+        """data
+
+        :param index: The index
+        :param role: The role
+        :return: The file name, the path or None
+        """
+        if not index.isValid() or index.row() >= len(self.image_list):
+            return None
+        if role == Qt.DisplayRole:
+            return os.path.basename(self.image_list[index.row()])
+        if role in (Qt.ToolTipRole, PATH_ROLE):
+            return self.image_list[index.row()]
+        return None
+
+    # @override
+    def flags(self, index):
+        """flags
+
+        :param index: The index
+        :return: The item flags, rows can be dragged and dropped between rows
+        """
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+
+    # @override
+    def supportedDropActions(self):
+        """supportedDropActions
+
+        :return: The drop actions
+        """
+        return Qt.MoveAction
+
+    # @override
+    def removeRows(self, row, count, parent=QModelIndex()):
+        """removeRows
+
+        :param row: The first row
+        :param count: The number of rows
+        :param parent: The parent index
+        :return: True if the rows have been removed, False else
+        """
+        if parent.isValid() or row < 0 or count < 1 or row + count > len(self.image_list):
+            return False
+        logging.debug('Removing %d elements from #%d', count, row)
+        self.beginRemoveRows(QModelIndex(), row, row + count - 1)
+        self.image_list.remove(row, count)
+        self.endRemoveRows()
+        return True
+
+    # @override
+    def moveRows(self, source_parent, source_row, count, destination_parent, destination_child):
+        """moveRows
+
+        :param source_parent: The parent index of the rows
+        :param source_row: The first row
+        :param count: The number of rows
+        :param destination_parent: The parent index to move the rows to
+        :param destination_child: The row to move them before
+        :return: True if the rows have been moved, False else
+        """
+        if source_parent.isValid() or destination_parent.isValid() or count < 1:
+            return False
+        if source_row < 0 or source_row + count > len(self.image_list) or not 0 <= destination_child <= len(self.image_list):
+            return False
+        if not self.beginMoveRows(QModelIndex(), source_row, source_row + count - 1, QModelIndex(), destination_child):
+            # Moving rows onto themselves
+            return False
+        self.image_list.move(source_row, count, destination_child)
+        self.endMoveRows()
+        return True
+
+    def add_image_entries(self, entries):
+        """Appends the images that are not in the list yet, with one insertion, without reading the file system
+
+        :param entries: List of tuples (image path, key), the keys computed with lib.Dedupe.get_path_key
+        :return: The number of images added
+        """
+        entries = self.image_list.filter_new_entries(entries)
+        if entries:
+            first = len(self.image_list)
+            self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+            self.image_list.add_entries(entries)
+            self.endInsertRows()
+        return len(entries)
+
+    def get_images(self):
+        """Returns the images
+
+        :return: The image paths, in list order
+        """
+        return self.image_list.get_paths()
@@ -24,6 +24,7 @@ from gui.components.AboutDialog import AboutDialog
 from gui.enums.GUIState import GUIState
 from lib.Utils import save_conf
 from lib.AppConfig import app_conf_get, app_conf_set, get_public_values
+from lib.FileTypeCache import FileTypeCache
 
 class MainWindow(QMainWindow):
     """Main window GUI"""
@@ -40,6 +41,8 @@ class MainWindow(QMainWindow):
 
         self.i18n = i18n
         self.image_cache = image_cache
+        # Kept for all batches, files dropped or selected again are not sniffed again
+        self.filetype_cache = FileTypeCache()
 
         self.state = None
         self.statusbar = None
@@ -264,10 +267,35 @@ class MainWindow(QMainWindow):
         self.phase_done_widget.set_config(
             self.nr_converted_images,
             self.nr_all_images,
-            self.pdf_written)
+            self.pdf_written,
+            nr_images_cached=self.phase_conversion_widget.get_nr_cached_images(),
+            stage_stats=self.phase_conversion_widget.get_stage_stats(),
+            worker_stats=self.phase_conversion_widget.get_worker_stats(),
+            failed_records=self.phase_conversion_widget.get_failed_records(),
+            duplicate_records=self.phase_conversion_widget.get_duplicate_records())
         self.phase_done_widget.init_ui()
         self.setCentralWidget(self.phase_done_widget)
 
+    def _retry_failed(self, images):
+        """Converts the images that failed again, with the same config
+
+        The PDF file of the first conversion is kept, no PDF file is created for the retried images.
+
+        :param images: The paths of the images that failed
+        """
+        logging.info('Retrying %d failed images', len(images))
+
+        self.images = images
+        self.config = dict(self.config, CREATE_PDF=False)
+        self._init_conversion_phases()
+
+        self._set_state(GUIState.PHASE_CONVERSION)
+        self.show_message(self.i18n.translate('GUI.MAIN.LOG.PHASE.CONVERSION'))
+
+        self.phase_conversion_widget.set_config(self.images, self.config)
+        self.phase_conversion_widget.init_ui()
+        self.setCentralWidget(self.phase_conversion_widget)
+
     def _reset_phases(self):
         """Resets all phases"""
         logging.info('Resetting all phases')
@@ -303,13 +331,18 @@ class MainWindow(QMainWindow):
                                         cb_cancel=self.cancel,
                                         cb_next_phase=self.next_phase,
                                         i18n=self.i18n,
-                                        image_cache=self.image_cache)
+                                        image_cache=self.image_cache,
+                                        filetype_cache=self.filetype_cache)
         self.phase_output_widget = PhaseOutputWidget(
                                         log=self.show_message,
                                         cb_cancel=self.cancel,
                                         cb_next_phase=self.next_phase,
                                         i18n=self.i18n,
                                         image_cache=self.image_cache)
+        self._init_conversion_phases()
+
+    def _init_conversion_phases(self):
+        """Initializes the conversion and the done phase"""
         self.phase_conversion_widget = PhaseConversionWidget(
                                         log=self.show_message,
                                         cb_cancel=self.cancel,
@@ -319,6 +352,7 @@ class MainWindow(QMainWindow):
         self.phase_done_widget = PhaseDoneWidget(
                                         log=self.show_message,
                                         cb_next_phase=self.next_phase,
+                                        cb_retry=self._retry_failed,
                                         i18n=self.i18n,
                                         image_cache=self.image_cache)
 
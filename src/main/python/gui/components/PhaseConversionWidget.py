@@ -16,6 +16,23 @@ from PyQt5.QtWidgets import QSizePolicy, QWidget, QGridLayout, QLabel, QPushButt
 
 from gui.threads.ScalerThread import ScalerThread
 from lib.AppConfig import app_conf_get
+from lib.Dedupe import DEDUPE_OFF, PERCEPTUAL_MAX_DISTANCE
+from lib.Encoder import ENCODER_DEFAULTS, OUTPUT_FORMAT_KEEP
+from lib.Scaler import PRESET_BALANCED, STATUS_CACHED, STATUS_DUPLICATE, STATUS_FAILED
+from lib.Schedule import SCHEDULE_LIST
+
+# Resolution of the progress bar
+_PROGRESS_STEPS = 1000
+
+def _format_duration(seconds):
+    """Formats a duration as m:ss or h:mm:ss
+
+    :param seconds: The duration in seconds
+    :return: The formatted duration
+    """
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{seconds:02d}' if hours else f'{minutes}:{seconds:02d}'
 
 class PhaseConversionWidget(QWidget):
     """Phase Conversion widget GUI"""
@@ -41,6 +58,7 @@ class PhaseConversionWidget(QWidget):
 
         self.components = []
         self.progressbar = None
+        self.button_cancel = None
 
         self.images = []
         self.config = {}
@@ -48,6 +66,11 @@ class PhaseConversionWidget(QWidget):
 
         self.img_processed = 0
         self.img_cnt = 0
+        self.stage_stats = None
+        self.worker_stats = None
+        self.records = []
+        self.thread = None
+        self.cancelling = False
 
         self.is_enabled = False
 
@@ -129,6 +152,24 @@ class PhaseConversionWidget(QWidget):
         label_output_dir_value.setFont(font_label_info)
         label_output_dir_value.setAlignment(Qt.AlignLeft)
 
+        label_preset = QLabel(self.i18n.translate('GUI.PHASE.CONVERSION.LABEL.PRESET'))
+        label_preset.setFont(font_label_header_small)
+        label_preset.setAlignment(Qt.AlignLeft)
+
+        preset = self.config.get('PRESET', app_conf_get('scaling.preset', PRESET_BALANCED))
+        label_preset_value = QLabel(self.i18n.translate(f'GUI.PRESET.{preset.upper()}'))
+        label_preset_value.setFont(font_label_info)
+        label_preset_value.setAlignment(Qt.AlignLeft)
+
+        label_format = QLabel(self.i18n.translate('GUI.PHASE.CONVERSION.LABEL.FORMAT'))
+        label_format.setFont(font_label_header_small)
+        label_format.setAlignment(Qt.AlignLeft)
+
+        output_format = self.config.get('OUTPUT_FORMAT', app_conf_get('encoding.output_format', OUTPUT_FORMAT_KEEP))
+        label_format_value = QLabel(self.i18n.translate(f'GUI.FORMAT.{output_format.upper().replace("-", "_")}'))
+        label_format_value.setFont(font_label_info)
+        label_format_value.setAlignment(Qt.AlignLeft)
+
         label_pdf = QLabel(self.i18n.translate('GUI.PHASE.CONVERSION.LABEL.PDF'))
         label_pdf.setFont(font_label_header_small)
         label_pdf.setAlignment(Qt.AlignLeft)
@@ -143,9 +184,9 @@ class PhaseConversionWidget(QWidget):
 
         label_spacer = QLabel('')
 
-        button_cancel = QPushButton(self.i18n.translate('GUI.PHASE.CANCEL'))
-        button_cancel.clicked[bool].connect(self._cancel)
-        self.components.append(button_cancel)
+        self.button_cancel = QPushButton(self.i18n.translate('GUI.PHASE.CANCEL'))
+        self.button_cancel.clicked[bool].connect(self._cancel)
+        self.components.append(self.button_cancel)
 
         button_start = QPushButton(self.i18n.translate('GUI.PHASE.CONVERSION.BUTTON.PROCESS'))
         button_start.clicked[bool].connect(self._start_processing)
@@ -187,6 +228,13 @@ class PhaseConversionWidget(QWidget):
         curr_gridid += 1
         grid.addWidget(label_output_dir_value, curr_gridid, 1, 1, 9)
 
+        curr_gridid += 1
+        grid.addWidget(label_preset, curr_gridid, 0, 1, 5)
+        grid.addWidget(label_format, curr_gridid, 5, 1, 5)
+        curr_gridid += 1
+        grid.addWidget(label_preset_value, curr_gridid, 1, 1, 4)
+        grid.addWidget(label_format_value, curr_gridid, 5, 1, 5)
+
         curr_gridid += 1
         grid.addWidget(label_pdf, curr_gridid, 0, 1, 10)
         curr_gridid += 1
@@ -202,7 +250,7 @@ class PhaseConversionWidget(QWidget):
         grid.addWidget(self.progressbar, curr_gridid, 0, 1, 10)
 
         curr_gridid += 1
-        grid.addWidget(button_cancel, curr_gridid, 0, 1, 4)
+        grid.addWidget(self.button_cancel, curr_gridid, 0, 1, 4)
         grid.addWidget(button_start, curr_gridid, 4, 1, 6)
 
         self.setLayout(grid)
@@ -237,16 +285,26 @@ class PhaseConversionWidget(QWidget):
             comp.setEnabled(True)
         self.is_enabled = True
 
-    def _callback_processing_result(self, img_processed, img_cnt):
-        """The processing callback, on result
+    def _callback_processing_progress(self, progress):
+        """The processing callback, on progress
 
-        :param img_processed: Number of processed images
-        :param img_cnt: Number of images
+        :param progress: The progress report, see lib.Progress.Progress.get_report
         """
-        logging.debug('Callback: Processing result')
+        logging.debug('Callback: Processing progress')
 
-        self.log(self.i18n.translate(f'GUI.PHASE.CONVERSION.LOG.DONE_PROCESSING.{"SINGULAR" if img_processed == 1 else "PLURAL"}')
-                                     .format(img_processed, img_cnt))
+        self.progressbar.setMaximum(_PROGRESS_STEPS)
+        self.progressbar.setValue(round(progress['fraction'] * _PROGRESS_STEPS))
+        eta = progress['eta']
+        self.log(self.i18n.translate(f'GUI.PHASE.CONVERSION.LOG.PROGRESS{"" if eta is not None else ".NO_ETA"}')
+                                     .format(progress['processed'], progress['total'], progress['images_per_s'], progress['mb_per_s'],
+                                             _format_duration(eta) if eta is not None else None))
+
+    def _callback_processing_records(self, records):
+        """The processing callback, on result records
+
+        :param records: The result records, see lib.Scaler.get_result_record
+        """
+        self.records.extend(records)
 
     def _callback_processing_error(self, ex):
         """The processing callback, on error
@@ -260,10 +318,35 @@ class PhaseConversionWidget(QWidget):
 
         self._reset_enabled()
 
+    def _callback_processing_stage_stats(self, stats):
+        """The processing callback, on stage statistics
+
+        :param stats: The stage statistics
+        """
+        logging.debug('Callback: Processing stage statistics')
+
+        self.stage_stats = stats
+
+    def _callback_processing_worker_stats(self, stats):
+        """The processing callback, on worker statistics
+
+        :param stats: The worker statistics
+        """
+        logging.debug('Callback: Processing worker statistics')
+
+        self.worker_stats = stats
+
     def _cancel(self):
-        """Cancels"""
+        """Cancels the running batch or, if there is none, the conversion"""
         logging.debug('Cancel')
 
+        if self.thread:
+            self.cancelling = True
+            self.button_cancel.setEnabled(False)
+            self.log(self.i18n.translate('GUI.PHASE.CONVERSION.LOG.CANCELLING'))
+            self.thread.cancel()
+            return
+
         if self.cb_cancel:
             self._disable()
             if not self.cb_cancel():
@@ -272,12 +355,21 @@ class PhaseConversionWidget(QWidget):
     def _callback_processing_finished(self, img_processed, img_cnt, pdf_written):
         """The processing callback, on finished
 
-        :param img_processed: Number of processed images
+        :param img_processed: Number of scaled images, not counting the ones that were up to date
         :param img_cnt: Number of images
         :param pdf_written: Boolean flag whether a PDF file has been written
         """
         logging.debug('Callback: Processing finished')
 
+        self.thread = None
+        if self.cancelling:
+            self.cancelling = False
+            self.progressbar.setMaximum(1)
+            self.progressbar.reset()
+            self.log(self.i18n.translate('GUI.PHASE.CONVERSION.LOG.CANCELLED').format(img_processed, img_cnt))
+            self._reset_enabled()
+            return
+
         self.img_processed = img_processed
         self.img_cnt = img_cnt
         self.pdf_written = pdf_written
@@ -323,6 +415,9 @@ class PhaseConversionWidget(QWidget):
             try:
                 logging.debug('Starting processing')
                 self.log(self.i18n.translate('GUI.PHASE.CONVERSION.LOG.START_PROCESSING'))
+                self.records = []
+                self.stage_stats = None
+                self.worker_stats = None
 
                 if 'IMG_WIDTH' in self.config and self.config['IMG_WIDTH']:
                     width = int(self.config['IMG_WIDTH'])
@@ -340,13 +435,43 @@ class PhaseConversionWidget(QWidget):
                     outdir=outdir,
                     createpdf=self.config['CREATE_PDF'] if 'CREATE_PDF' in self.config else True,
                     scaled_image_suffix=self.i18n.translate('SCALED_IMAGE_SUFFIX'),
-                    pdf_name=self.i18n.translate('PDF.NAME'))
-                thread.signals.scalingresult.connect(self._callback_processing_result)
+                    pdf_name=self.i18n.translate('PDF.NAME'),
+                    threadpool=self.threadpool,
+                    execution_mode=app_conf_get('scaling.execution_mode', 'thread'),
+                    fast_decode=app_conf_get('scaling.fast_decode', False),
+                    pdf_jpeg_passthrough=app_conf_get('pdf.jpeg_passthrough', True),
+                    incremental=app_conf_get('scaling.incremental', True),
+                    incremental_hash=app_conf_get('scaling.incremental_hash', False),
+                    log_stage_stats=app_conf_get('logging.stage_stats', False),
+                    resume=app_conf_get('scaling.resume', True),
+                    preset=self.config.get('PRESET', app_conf_get('scaling.preset', PRESET_BALANCED)),
+                    output_format=self.config.get('OUTPUT_FORMAT', app_conf_get('encoding.output_format', OUTPUT_FORMAT_KEEP)),
+                    encoder_settings={key: app_conf_get(f'encoding.{key}', default) for key, default in ENCODER_DEFAULTS.items()},
+                    max_bytes=app_conf_get('encoding.max_bytes', 0),
+                    memory_budget_mb=app_conf_get('scaling.memory_budget_mb', 0),
+                    strip_min_mp=app_conf_get('scaling.strip_min_mp', 64),
+                    strip_mmap=app_conf_get('scaling.strip_mmap', True),
+                    max_image_pixels=app_conf_get('scaling.max_image_pixels', 0),
+                    read_ahead=app_conf_get('scaling.read_ahead', 4),
+                    shared_memory=app_conf_get('scaling.shared_memory', True),
+                    auto_workers=app_conf_get('scaling.auto_workers', False),
+                    max_workers=app_conf_get('scaling.max_workers', 0),
+                    schedule=app_conf_get('scaling.schedule', SCHEDULE_LIST),
+                    dedupe=app_conf_get('scaling.dedupe', DEDUPE_OFF),
+                    dedupe_max_distance=app_conf_get('scaling.dedupe_max_distance', PERCEPTUAL_MAX_DISTANCE))
+                thread.signals.scalingprogress.connect(self._callback_processing_progress)
+                thread.signals.scalingrecords.connect(self._callback_processing_records)
                 thread.signals.scalingerror.connect(self._callback_processing_error)
+                thread.signals.scalingstagestats.connect(self._callback_processing_stage_stats)
+                thread.signals.scalingworkerstats.connect(self._callback_processing_worker_stats)
                 thread.signals.scalingfinished.connect(self._callback_processing_finished)
+                self.thread = thread
                 self.threadpool.start(thread)
+                # Cancels the running batch
+                self.button_cancel.setEnabled(True)
             except Exception as ex:
                 logging.debug('Error while scaling: %s', ex)
+                self.thread = None
                 self.log('GUI.PHASE.CONVERSION.LOG.ERROR_PROCESSING')
                 self._reset_enabled()
 
@@ -379,3 +504,38 @@ class PhaseConversionWidget(QWidget):
         :return: Boolean flag whether a PDF file has been written
         """
         return self.pdf_written
+
+    def get_stage_stats(self):
+        """Returns the stage statistics of the last batch
+
+        :return: The stage statistics or None
+        """
+        return self.stage_stats
+
+    def get_worker_stats(self):
+        """Returns the worker statistics of the last batch
+
+        :return: The worker statistics or None
+        """
+        return self.worker_stats
+
+    def get_nr_cached_images(self):
+        """Returns the number of images of the last batch whose output was up to date
+
+        :return: The number of images
+        """
+        return sum(1 for record in self.records if record['status'] == STATUS_CACHED)
+
+    def get_failed_records(self):
+        """Returns the result records of the images of the last batch that could not be converted
+
+        :return: The records, see lib.Scaler.get_result_record
+        """
+        return [record for record in self.records if record['status'] == STATUS_FAILED]
+
+    def get_duplicate_records(self):
+        """Returns the result records of the duplicates of the last batch that have been skipped
+
+        :return: The records, see lib.Scaler.get_result_record
+        """
+        return [record for record in self.records if record['status'] == STATUS_DUPLICATE]
@@ -9,23 +9,30 @@
 """Phase Done widget"""
 
 import logging
+import os
+from html import escape
 
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
 from PyQt5.QtWidgets import QSizePolicy, QWidget, QGridLayout, QLabel, QPushButton
 
 from lib.AppConfig import app_conf_get
+from lib.StageStats import get_size_change
+
+# Maximum number of failed or duplicate images listed
+_MAX_LISTED = 10
 
 class PhaseDoneWidget(QWidget):
     """Phase Done widget GUI"""
 
-    def __init__(self, image_cache, i18n, log, cb_next_phase):
+    def __init__(self, image_cache, i18n, log, cb_next_phase, cb_retry=None):
         """Initializes the widget
 
         :param image_cache: The image cache
         :param i18n: The I18n
         :param log: The (end user) message log
         :param cb_next_phase: Next phase callback
+        :param cb_retry: Retry callback, called with the paths of the images that failed
         """
         super().__init__()
 
@@ -35,12 +42,18 @@ class PhaseDoneWidget(QWidget):
         self.i18n = i18n
         self.log = log
         self.cb_next_phase = cb_next_phase
+        self.cb_retry = cb_retry
 
         self.components = []
 
         self.nr_images_converted = 0
         self.nr_images_all = 0
+        self.nr_images_cached = 0
         self.pdf_created = True
+        self.stage_stats = None
+        self.worker_stats = None
+        self.failed_records = []
+        self.duplicate_records = []
 
         self.is_enabled = False
 
@@ -77,10 +90,47 @@ class PhaseDoneWidget(QWidget):
         label_done_text = QLabel(self.i18n.translate(f'GUI.PHASE.DONE.TEXT.{"SINGULAR" if self.nr_images_converted == 1 else "PLURAL"}')
                                                      .format(self.nr_images_converted, self.nr_images_all))
 
+        label_cached = None
+        if self.nr_images_cached:
+            label_cached = QLabel(self.i18n.translate('GUI.PHASE.DONE.CACHED').format(self.nr_images_cached))
+
         label_done_text_pdf = QLabel(self.i18n.translate('GUI.PHASE.DONE.TEXT.PDF'))
 
         label_done_text_no_pdf = QLabel(self.i18n.translate('GUI.PHASE.DONE.TEXT.NO_PDF'))
 
+        label_stage_stats = None
+        if self.stage_stats and self.stage_stats['stages']:
+            label_stage_stats = QLabel(self._get_stage_stats_html())
+            label_stage_stats.setFont(font_label_info)
+            label_stage_stats.setTextInteractionFlags(Qt.TextSelectableByMouse)
+
+        label_worker_stats = None
+        if self.worker_stats and self.worker_stats['workers']:
+            label_worker_stats = QLabel(self._get_worker_stats_html())
+            label_worker_stats.setFont(font_label_info)
+            label_worker_stats.setTextInteractionFlags(Qt.TextSelectableByMouse)
+
+        label_duplicates = None
+        if self.duplicate_records:
+            label_duplicates = QLabel(self._get_records_html(
+                self.i18n.translate('GUI.PHASE.DONE.DUPLICATES').format(len(self.duplicate_records)),
+                [f'{os.path.basename(record["input"])} = {os.path.basename(record["duplicate_of"])}' for record in self.duplicate_records]))
+            label_duplicates.setFont(font_label_info)
+            label_duplicates.setTextInteractionFlags(Qt.TextSelectableByMouse)
+
+        label_failed = None
+        button_retry = None
+        if self.failed_records:
+            label_failed = QLabel(self._get_records_html(
+                self.i18n.translate('GUI.PHASE.DONE.FAILED').format(len(self.failed_records)),
+                [f'{os.path.basename(record["input"])}: {record["message"] or record["error"] or ""}' for record in self.failed_records]))
+            label_failed.setFont(font_label_info)
+            label_failed.setTextInteractionFlags(Qt.TextSelectableByMouse)
+            if self.cb_retry:
+                button_retry = QPushButton(self.i18n.translate('GUI.PHASE.DONE.RETRY'))
+                button_retry.clicked[bool].connect(self._retry)
+                self.components.append(button_retry)
+
         label_spacer = QLabel('')
 
         button_finish = QPushButton(self.i18n.translate('GUI.PHASE.DONE.NEXT_PHASE'))
@@ -102,17 +152,41 @@ class PhaseDoneWidget(QWidget):
         curr_gridid += 1
         grid.addWidget(label_done_text, curr_gridid, 0, 1, 5)
 
+        if label_cached:
+            curr_gridid += 1
+            grid.addWidget(label_cached, curr_gridid, 0, 1, 5)
+
         curr_gridid += 1
         if self.pdf_created:
             grid.addWidget(label_done_text_pdf, curr_gridid, 0, 1, 5)
         else:
             grid.addWidget(label_done_text_no_pdf, curr_gridid, 0, 1, 5)
 
+        if label_stage_stats:
+            curr_gridid += 1
+            grid.addWidget(label_stage_stats, curr_gridid, 0, 1, 5)
+
+        if label_worker_stats:
+            curr_gridid += 1
+            grid.addWidget(label_worker_stats, curr_gridid, 0, 1, 5)
+
+        if label_duplicates:
+            curr_gridid += 1
+            grid.addWidget(label_duplicates, curr_gridid, 0, 1, 5)
+
+        if label_failed:
+            curr_gridid += 1
+            grid.addWidget(label_failed, curr_gridid, 0, 1, 5)
+
         curr_gridid += 1
         grid.addWidget(label_spacer, curr_gridid, 0, 7, 5)
 
         curr_gridid += 8
-        grid.addWidget(button_finish, curr_gridid, 0, 1, 5)
+        if button_retry:
+            grid.addWidget(button_retry, curr_gridid, 0, 1, 2)
+            grid.addWidget(button_finish, curr_gridid, 3, 1, 2)
+        else:
+            grid.addWidget(button_finish, curr_gridid, 0, 1, 5)
 
         self.setLayout(grid)
         self._reset_enabled()
@@ -151,13 +225,96 @@ class PhaseDoneWidget(QWidget):
         if self.cb_next_phase:
             self.cb_next_phase()
 
-    def set_config(self, nr_images_converted, nr_images_all, pdf_created):
+    def _retry(self):
+        """Retries the images that failed"""
+        logging.debug('Retrying %d failed images', len(self.failed_records))
+        if self.cb_retry:
+            self.cb_retry([record['input'] for record in self.failed_records])
+
+    def _get_records_html(self, header, lines):
+        """Returns a list of images as HTML, shortened to the first entries
+
+        :param header: The header
+        :param lines: The line per image
+        :return: The HTML
+        """
+        html = header
+        for line in lines[:_MAX_LISTED]:
+            html += f'<br/>{escape(line)}'
+        if len(lines) > _MAX_LISTED:
+            html += '<br/>' + self.i18n.translate('GUI.PHASE.DONE.MORE').format(len(lines) - _MAX_LISTED)
+
+        return html
+
+    def _get_stage_stats_html(self):
+        """Returns the stage statistics as HTML table
+
+        :return: The HTML
+        """
+        header = ['STAGE', 'TOTAL', 'P50', 'P95', 'MAX']
+        html = f'{self.i18n.translate("GUI.PHASE.DONE.STAGES.HEADER")}<table cellspacing="0" cellpadding="3"><tr>'
+        html += ''.join(f'<th align="{"left" if col == "STAGE" else "right"}">{self.i18n.translate(f"GUI.PHASE.DONE.STAGES.{col}")}</th>'
+                        for col in header)
+        html += '</tr>'
+        for stage, stats in self.stage_stats['stages'].items():
+            html += (f'<tr><td>{self.i18n.translate(f"GUI.PHASE.DONE.STAGES.{stage.upper()}")}</td>'
+                     f'<td align="right">{stats["total"]:.2f}</td>'
+                     f'<td align="right">{stats["p50"] * 1000:.1f}</td>'
+                     f'<td align="right">{stats["p95"] * 1000:.1f}</td>'
+                     f'<td align="right">{stats["max"] * 1000:.1f}</td></tr>')
+        html += '</table>'
+        html += self.i18n.translate('GUI.PHASE.DONE.STAGES.BYTES').format(self.stage_stats['bytes_in'] / 1000000,
+                                                                          self.stage_stats['bytes_out'] / 1000000)
+        for conversion, stats in self.stage_stats.get('conversions', {}).items():
+            html += self.i18n.translate('GUI.PHASE.DONE.STAGES.CONVERSION').format(conversion.replace(' -> ', ' → '),
+                                                                               stats['count'],
+                                                                               stats['bytes_in'] / 1000000,
+                                                                               stats['bytes_out'] / 1000000,
+                                                                               get_size_change(stats),
+                                                                               stats['encode'])
+
+        return html
+
+    def _get_worker_stats_html(self):
+        """Returns the worker statistics as HTML table
+
+        :return: The HTML
+        """
+        wall_time = self.worker_stats['wall_time']
+        header = ['WORKER', 'IMAGES', 'BUSY', 'UTILIZATION']
+        html = self.i18n.translate('GUI.PHASE.DONE.WORKERS.HEADER').format(self.worker_stats['mode'], wall_time)
+        html += '<table cellspacing="0" cellpadding="3"><tr>'
+        html += ''.join(f'<th align="{"left" if col == "WORKER" else "right"}">{self.i18n.translate(f"GUI.PHASE.DONE.WORKERS.{col}")}</th>'
+                        for col in header)
+        html += '</tr>'
+        for nr, (_, stats) in enumerate(sorted(self.worker_stats['workers'].items()), start=1):
+            utilization = stats['busy_time'] / wall_time if wall_time > 0 else 0.0
+            html += (f'<tr><td>#{nr}</td>'
+                     f'<td align="right">{stats["images"]}</td>'
+                     f'<td align="right">{stats["busy_time"]:.2f}</td>'
+                     f'<td align="right">{utilization:.0%}</td></tr>')
+        html += '</table>'
+
+        return html
+
+    def set_config(self, nr_images_converted, nr_images_all, pdf_created, nr_images_cached=0, stage_stats=None, worker_stats=None,
+                   failed_records=None, duplicate_records=None):
         """Sets the config
 
-        :param nr_images_converted: Number of converted images
+        :param nr_images_converted: Number of converted images, not counting the ones that were up to date
         :param nr_images_all: Number of all images to be converted
         :param pdf_created: Boolean flag whether a PDF file has been created
+        :param nr_images_cached: Number of images whose output was up to date and that have not been converted again
+        :param stage_stats: The stage statistics, see WorkerSignals.scalingstagestats
+        :param worker_stats: The worker statistics, see WorkerSignals.scalingworkerstats
+        :param failed_records: The result records of the images that failed, see lib.Scaler.get_result_record
+        :param duplicate_records: The result records of the duplicates that have been skipped
         """
         self.nr_images_converted = nr_images_converted
         self.nr_images_all = nr_images_all
+        self.nr_images_cached = nr_images_cached
         self.pdf_created = pdf_created
+        self.stage_stats = stage_stats
+        self.worker_stats = worker_stats
+        self.failed_records = failed_records or []
+        self.duplicate_records = duplicate_records or []
@@ -9,21 +9,21 @@
 """Phase Input widget"""
 
 import logging
-import os
 
-import filetype
-
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThreadPool
 from PyQt5.QtGui import QFont, QIcon
-from PyQt5.QtWidgets import QAbstractItemView, QSizePolicy, QWidget, QGridLayout, QLabel, QPushButton, QListWidget, QListWidgetItem, QFileDialog, QMessageBox
+from PyQt5.QtWidgets import QAbstractItemView, QSizePolicy, QWidget, QGridLayout, QLabel, QPushButton, QListView, QFileDialog, QMessageBox
 
-from gui.components.ListWidget import ListWidget
+from gui.components.ImageListDelegate import ImageListDelegate
+from gui.components.ImageListModel import ImageListModel
+from gui.threads.SniffThread import SniffThread
 from lib.AppConfig import app_conf_get
+from lib.FileTypeCache import ANY_IMAGE_MIME_TYPES, IMAGE_MIME_TYPES, FileTypeCache
 
 class PhaseInputWidget(QWidget):
     """Phase Input widget GUI"""
 
-    def __init__(self, image_cache, i18n, log, cb_cancel, cb_next_phase):
+    def __init__(self, image_cache, i18n, log, cb_cancel, cb_next_phase, filetype_cache=None):
         """Initializes the widget
 
         :param image_cache: The image cache
@@ -31,6 +31,7 @@ class PhaseInputWidget(QWidget):
         :param log: The (end user) message log
         :param cb_cancel: Cancel callback
         :param cb_next_phase: Next phase callback
+        :param filetype_cache: The lib.FileTypeCache.FileTypeCache of the files sniffed before, None for a new one
         """
         super().__init__()
 
@@ -41,8 +42,14 @@ class PhaseInputWidget(QWidget):
         self.log = log
         self.cb_cancel = cb_cancel
         self.cb_next_phase = cb_next_phase
+        self.filetype_cache = filetype_cache if filetype_cache else FileTypeCache()
+
+        self.threadpool = QThreadPool()
+        # Running SniffThreads
+        self.sniff_threads = []
 
-        self.widget_list = None
+        self.list_model = None
+        self.list_view = None
         self.components = []
 
         self.is_enabled = False
@@ -99,10 +106,14 @@ class PhaseInputWidget(QWidget):
         label_selected_images_hint.setFont(font_label_info_small)
         label_selected_images_hint.setAlignment(Qt.AlignLeft)
 
-        self.widget_list = QListWidget()
-        self.widget_list.setDragDropMode(QAbstractItemView.InternalMove)
-        self.widget_list.model().rowsMoved.connect(self._item_moved)
-        self.widget_list.current_images = []
+        # Only the visible elements are painted, no widgets are created per element
+        self.list_model = ImageListModel(self)
+        self.list_view = QListView()
+        self.list_view.setModel(self.list_model)
+        self.list_view.setItemDelegate(ImageListDelegate(self.i18n, self.list_view))
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setDragDropMode(QAbstractItemView.InternalMove)
+        self.list_view.setDefaultDropAction(Qt.MoveAction)
 
         button_cancel = QPushButton(self.i18n.translate('GUI.PHASE.CANCEL'))
         button_cancel.clicked[bool].connect(self._cancel)
@@ -135,7 +146,7 @@ class PhaseInputWidget(QWidget):
         grid.addWidget(label_selected_images_hint, curr_gridid, 0, 1, 10)
 
         curr_gridid += 1
-        grid.addWidget(self.widget_list, curr_gridid, 0, 1, 10)
+        grid.addWidget(self.list_view, curr_gridid, 0, 1, 10)
 
         curr_gridid += 1
         grid.addWidget(button_cancel, curr_gridid, 0, 1, 4)
@@ -144,16 +155,6 @@ class PhaseInputWidget(QWidget):
         self.setLayout(grid)
         self._reset_enabled()
 
-    def _item_moved(self, _i1, i_from, _i2, _i3, i_to):
-        if len(self.widget_list.current_images) > 1:
-            _imgs = self.widget_list.current_images
-            elem = _imgs[i_from]
-            _imgs.insert(i_to, elem)
-            for i, ele in enumerate(_imgs):
-                if i != i_to and ele == elem:
-                    _imgs.pop(i)
-                    return
-
     def reset(self):
         """Resets the widget"""
         logging.debug('Resetting widget')
@@ -182,22 +183,25 @@ class PhaseInputWidget(QWidget):
             comp.setEnabled(True)
         self.is_enabled = True
 
-    def _filter_image_files(self, event):
-        filetypes = ['image/jpeg', 'image/png']
-        lst = []
-        for u in event.mimeData().urls():
-            t = filetype.guess(u.toLocalFile())
-            if t and t.mime in filetypes:
-                lst.append(u.toLocalFile())
-        return lst
+    def _get_local_files(self, event):
+        """Returns the local files of a drag and drop event, without reading them
+
+        :param event: The event
+        :return: The file paths
+        """
+        if not event.mimeData().hasUrls():
+            return []
+        return [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
 
     # @override
     def dragEnterEvent(self, event):
         """dragEnterEvent
 
+        Accepts any local file, the files are checked after the drop.
+
         :param event: event
         """
-        if self._filter_image_files(event):
+        if event.mimeData().hasUrls() and any(url.isLocalFile() for url in event.mimeData().urls()):
             event.accept()
         else:
             event.ignore()
@@ -208,35 +212,53 @@ class PhaseInputWidget(QWidget):
 
         :param event: event
         """
-        files = self._filter_image_files(event)
-        for file in files:
-            self._add_to_list(file)
+        files = self._get_local_files(event)
         if files:
             event.accept()
+            self._add_images(files)
         else:
             event.ignore()
 
-    def _add_to_list(self, path_img):
-        """Adds an item to the list
+    def _add_images(self, paths, mime_types=IMAGE_MIME_TYPES):
+        """Adds the supported images among the files to the list, in the background
+
+        The files are sniffed by a SniffThread, the images are added in batches as they are found.
+
+        :param paths: The file paths
+        :param mime_types: The mime types of the accepted images
+        """
+        thread = SniffThread(paths, self.filetype_cache, mime_types=mime_types)
+        thread.signals.sniffedimages.connect(self._callback_sniffed_images)
+        thread.signals.sniffingfinished.connect(lambda nr_images, nr_files: self._callback_sniffing_finished(thread, nr_images, nr_files))
+        self.sniff_threads.append(thread)
+        self.threadpool.start(thread)
+
+    def _callback_sniffed_images(self, entries):
+        """Adds a batch of sniffed images to the list, without reading the files again
+
+        :param entries: List of tuples (image path, key)
+        """
+        added = self.list_model.add_image_entries(entries)
+        logging.debug('Added %d images to list, skipped %d images since they are already contained in list', added, len(entries) - added)
+
+    def _callback_sniffing_finished(self, thread, nr_images, nr_files):
+        """Removes the finished SniffThread
 
-        :param img: The image
+        :param thread: The thread
+        :param nr_images: Number of supported images
+        :param nr_files: Number of files
         """
-        if path_img in self.widget_list.current_images:
-            logging.debug('Skipping adding image "%s" since it is already contained in list', path_img)
-            return
-        logging.debug('Adding to list: "%s"', path_img)
-        try:
-            with open(path_img, encoding='utf-8') as f:
-                fname = os.path.basename(f.name)
-                item = QListWidgetItem(self.widget_list)
-                item_widget = ListWidget(self.i18n, path_img, fname, self.widget_list)
-                item.setSizeHint(item_widget.sizeHint())
-                item.id = item_widget.id
-                self.widget_list.addItem(item)
-                self.widget_list.setItemWidget(item, item_widget)
-                self.widget_list.current_images.append(path_img)
-        except Exception as ex:
-            logging.error('Error adding image "%s" to list: %s', path_img, ex)
+        logging.debug('Found %d images among %d files', nr_images, nr_files)
+        if thread in self.sniff_threads:
+            self.sniff_threads.remove(thread)
+        if nr_images < nr_files and not thread.cancel_event.is_set():
+            key = 'GUI.PHASE.INPUT.LOG.SKIPPED_FILES' if thread.mime_types == IMAGE_MIME_TYPES else 'GUI.PHASE.INPUT.LOG.SKIPPED_NON_IMAGES'
+            self.log(self.i18n.translate(key).format(nr_files - nr_images))
+
+    def _cancel_sniffing(self):
+        """Cancels the running SniffThreads"""
+        for thread in self.sniff_threads:
+            thread.cancel()
 
     def _select_images(self):
         """Selects images"""
@@ -246,10 +268,8 @@ class PhaseInputWidget(QWidget):
         filenames = QFileDialog.getOpenFileNames(self, self.i18n.translate('GUI.PHASE.INPUT.DIALOG.SELECT'), './', filter_mask)[0]
         if filenames:
             self.log(self.i18n.translate('GUI.PHASE.INPUT.LOG.SELECT_IMAGES_SUCCESS').format(len(filenames)))
-            for fname in filenames:
-                if filetype.is_image(fname):
-                    logging.debug('Selected file name: "%s"', fname)
-                    self._add_to_list(fname)
+            # Selected files of any image type are accepted, see filetype.is_image
+            self._add_images(filenames, mime_types=ANY_IMAGE_MIME_TYPES)
         else:
             self.log(self.i18n.translate('GUI.PHASE.INPUT.LOG.SELECT_IMAGES_CANCEL').format(0))
             logging.debug('Cancelled selecting files')
@@ -260,7 +280,9 @@ class PhaseInputWidget(QWidget):
 
         if self.cb_cancel:
             self._disable()
-            if not self.cb_cancel():
+            if self.cb_cancel():
+                self._cancel_sniffing()
+            else:
                 self._reset_enabled()
 
     def _next_phase(self):
@@ -268,7 +290,9 @@ class PhaseInputWidget(QWidget):
         logging.debug('Next phase')
 
         err = []
-        if not self.widget_list.current_images:
+        if self.sniff_threads:
+            err.append(self.i18n.translate('GUI.PHASE.INPUT.ERROR.CHECKING_FILES'))
+        elif not self.list_model.rowCount():
             err.append(self.i18n.translate('GUI.PHASE.INPUT.ERROR.NO_IMAGES_SELECTED'))
         if err:
             logging.debug('Errors: %s', err)
@@ -295,6 +319,6 @@ class PhaseInputWidget(QWidget):
         
         :return: Selected images
         """
-        if not self.widget_list:
+        if not self.list_model:
             return []
-        return self.widget_list.current_images
+        return self.list_model.get_images()
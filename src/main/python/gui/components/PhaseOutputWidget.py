@@ -13,9 +13,11 @@ import os
 
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont, QIntValidator, QIcon
-from PyQt5.QtWidgets import QSizePolicy, QWidget, QGridLayout, QLabel, QCheckBox, QLineEdit, QPushButton, QFileDialog, QMessageBox
+from PyQt5.QtWidgets import QSizePolicy, QWidget, QGridLayout, QLabel, QCheckBox, QComboBox, QLineEdit, QPushButton, QFileDialog, QMessageBox
 
 from lib.AppConfig import app_conf_get
+from lib.Encoder import OUTPUT_FORMATS, OUTPUT_FORMAT_KEEP, get_output_format
+from lib.Scaler import PRESETS, PRESET_BALANCED, get_preset
 
 class PhaseOutputWidget(QWidget):
     """Phase Output widget GUI"""
@@ -42,6 +44,8 @@ class PhaseOutputWidget(QWidget):
         self.edit_image_size_width = None
         self.edit_image_size_height = None
         self.checkbox_create_pdf = None
+        self.combobox_preset = None
+        self.combobox_format = None
         self.components = []
 
         self.edit_output_dir = None
@@ -141,6 +145,26 @@ class PhaseOutputWidget(QWidget):
         button_output_dir.clicked[bool].connect(self._select_output_dir)
         self.components.append(button_output_dir)
 
+        label_preset = QLabel(self.i18n.translate('GUI.PHASE.OUTPUT.LABEL.PRESET'))
+        label_preset.setFont(font_label_header_small)
+        label_preset.setAlignment(Qt.AlignLeft)
+
+        self.combobox_preset = QComboBox()
+        for preset in PRESETS:
+            self.combobox_preset.addItem(self.i18n.translate(f'GUI.PRESET.{preset.upper()}'), preset)
+        self.combobox_preset.setCurrentIndex(self.combobox_preset.findData(get_preset(app_conf_get('scaling.preset', PRESET_BALANCED))))
+        self.components.append(self.combobox_preset)
+
+        label_format = QLabel(self.i18n.translate('GUI.PHASE.OUTPUT.LABEL.FORMAT'))
+        label_format.setFont(font_label_header_small)
+        label_format.setAlignment(Qt.AlignLeft)
+
+        self.combobox_format = QComboBox()
+        for output_format in OUTPUT_FORMATS:
+            self.combobox_format.addItem(self.i18n.translate(f'GUI.FORMAT.{output_format.upper().replace("-", "_")}'), output_format)
+        self.combobox_format.setCurrentIndex(self.combobox_format.findData(get_output_format(app_conf_get('encoding.output_format', OUTPUT_FORMAT_KEEP))))
+        self.components.append(self.combobox_format)
+
         label_pdf = QLabel(self.i18n.translate('GUI.PHASE.OUTPUT.LABEL.PDF'))
         label_pdf.setFont(font_label_header_small)
         label_pdf.setAlignment(Qt.AlignLeft)
@@ -195,6 +219,14 @@ class PhaseOutputWidget(QWidget):
         grid.addWidget(self.edit_output_dir, curr_gridid, 0, 1, 4)
         grid.addWidget(button_output_dir, curr_gridid, 4, 1, 1)
 
+        curr_gridid += 1
+        grid.addWidget(label_preset, curr_gridid, 0, 1, 3)
+        grid.addWidget(label_format, curr_gridid, 3, 1, 2)
+
+        curr_gridid += 1
+        grid.addWidget(self.combobox_preset, curr_gridid, 0, 1, 3)
+        grid.addWidget(self.combobox_format, curr_gridid, 3, 1, 2)
+
         curr_gridid += 1
         grid.addWidget(label_pdf, curr_gridid, 0, 1, 5)
 
@@ -308,5 +340,7 @@ class PhaseOutputWidget(QWidget):
             'OUTPUT_DIR': self.output_dir,
             'IMG_WIDTH': self.edit_image_size_width.text() if self.edit_image_size_width else '',
             'IMG_HEIGHT': self.edit_image_size_height.text() if self.edit_image_size_height else '',
-            'CREATE_PDF': self.checkbox_create_pdf.isChecked() if self.checkbox_create_pdf else True
+            'CREATE_PDF': self.checkbox_create_pdf.isChecked() if self.checkbox_create_pdf else True,
+            'PRESET': self.combobox_preset.currentData() if self.combobox_preset else app_conf_get('scaling.preset', PRESET_BALANCED),
+            'OUTPUT_FORMAT': self.combobox_format.currentData() if self.combobox_format else app_conf_get('encoding.output_format', OUTPUT_FORMAT_KEEP)
         }
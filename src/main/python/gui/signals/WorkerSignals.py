@@ -18,16 +18,54 @@ class WorkerSignals(QObject):
 
     scalingerror
         `object` error data, anything
-    scalingresult
-        `object` data returned from processing, anything
-        - [0] Number of scaled images
-        - [1] Number of images to be processed
+    scalingprogress
+        `dict` progress of the batch, at most once per progress interval and when all images are done,
+        see lib.Progress.Progress.get_report
+        - processed: Number of images done
+        - total: Number of images to be processed
+        - cached: Number of images whose output was up to date
+        - fraction: The fraction of the work done, weighted by pixels, 0.0 - 1.0
+        - images_per_s: Images done per second
+        - mb_per_s: Megabytes read per second
+        - eta: Estimated seconds until the batch is done, None if unknown
+    scalingrecords
+        `list` result records of the images done since the last report, emitted with scalingprogress;
+        before scalingfinished, the images that have not been done are reported as cancelled, so that
+        every image has exactly one record, see lib.Scaler.get_result_record
     scalingfinished
         `object` data returned from processing, anything
-        - [0] Number of scaled images
+        - [0] Number of images that have been scaled (status 'scaled'), not counting the ones whose output was up to date
         - [1] Number of images to be processed
         - [2] Boolean flag whether a PDF file has been created
+    scalingworkerstats
+        `dict` statistics of the workers, emitted before scalingfinished
+        - mode: The execution mode, 'thread' or 'process'
+        - wall_time: The wall time of the batch in seconds
+        - workers: Number of images and busy time in seconds per worker id
+        - scaled: Number of images that have been scaled (status 'scaled'), not counting the ones that were up to date
+        - cached: Number of images whose output was up to date
+        - failed: The images that could not be scaled
+        - duplicates: The duplicates that have been skipped, path -> path of the image it is a copy of
+        - cancelled: Boolean flag whether the batch has been cancelled before all images were done
+    scalingstagestats
+        `dict` durations of the pipeline stages (read, decode, resample, encode, write, pdf),
+        emitted before scalingfinished, see lib.StageStats.StageStats.get_summary
+        - stages: count, total, p50, p95 and max in seconds per stage
+        - bytes_in: Number of bytes read
+        - bytes_out: Number of bytes written
+    sniffedimages
+        `list` tuples (path, key) of the supported images among the files sniffed since the last report,
+        in the order of the files, the keys computed with lib.Dedupe.get_path_key, see gui.threads.SniffThread
+    sniffingfinished
+        `object` data returned from sniffing
+        - [0] Number of supported images
+        - [1] Number of files
     """
     scalingerror = pyqtSignal(object)
-    scalingresult = pyqtSignal(object, object)
+    scalingprogress = pyqtSignal(object)
+    scalingrecords = pyqtSignal(object)
     scalingfinished = pyqtSignal(object, object, object)
+    scalingworkerstats = pyqtSignal(object)
+    scalingstagestats = pyqtSignal(object)
+    sniffedimages = pyqtSignal(object)
+    sniffingfinished = pyqtSignal(object, object)
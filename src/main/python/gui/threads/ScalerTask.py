@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Task"""
+
+from PyQt5.QtCore import QRunnable, pyqtSlot
+
+from lib.Scaler import get_failed_result, scale_image_task
+
+class ScalerTask(QRunnable):
+    """Scales a single image, one work unit of a ScalerThread batch"""
+
+    def __init__(self, scaler, index, img, results, data=None):
+        """Initializes the task
+
+        :param scaler: The ScalerThread the task belongs to
+        :param index: The index of the image in the batch
+        :param img: The image path
+        :param results: The queue to put (index, result of scale_image_task) into when done
+        :param data: The content of the image if it has been read ahead, None else
+        """
+        super().__init__()
+
+        self.scaler = scaler
+        self.index = index
+        self.img = img
+        self.results = results
+        self.data = data
+
+    @pyqtSlot()
+    def run(self):
+        """Runs the task"""
+        result = get_failed_result()
+        try:
+            result = scale_image_task(self.img,
+                                      self.scaler.outdir,
+                                      self.scaler.scaled_image_suffix,
+                                      data=self.data,
+                                      cancel_event=self.scaler.cancel_event,
+                                      **self.scaler.get_task_kwargs())
+        finally:
+            self.data = None
+            self.scaler.release_worker()
+            # Always report back, the ScalerThread waits for every task
+            self.results.put((self.index, result))
@@ -9,17 +9,40 @@
 """Thread"""
 
 import logging
+import multiprocessing
 import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 from PIL import Image
-from PyQt5.QtCore import QObject, QRunnable, pyqtSlot
+from PyQt5.QtCore import QRunnable, QThreadPool, pyqtSlot
 
 from gui.signals.WorkerSignals import WorkerSignals
+from gui.threads.ScalerTask import ScalerTask
+from lib.Dedupe import DEDUPE_OFF, PERCEPTUAL_MAX_DISTANCE, find_duplicates, get_dedupe_mode
+from lib.Encoder import OUTPUT_FORMAT_KEEP, get_encoder_settings, get_output_format
+from lib.Journal import Journal
+from lib.MemoryBudget import MemoryBudget, get_decoded_size, get_memory_budget, read_header
+from lib.Manifest import Manifest
+from lib.PdfWriter import PdfWriter
+from lib.Pipeline import Pipeline
+from lib.Progress import PROGRESS_INTERVAL, Progress
+from lib.Scaler import PRESET_BALANCED, get_failed_result, get_preset, get_result_record, get_scaled_img_path, init_worker_process, read_image_file, scale_image_task, scale_shared_image_task, set_max_image_pixels
+from lib.Schedule import SCHEDULE_LIST, get_schedule, get_start_order, read_headers
+from lib.SharedBuffer import can_share_outputs, is_shared_memory_available, read_shared, release
+from lib.WorkerTuner import WorkerLimit, WorkerTuner
+from lib.StageStats import STAGE_PDF, StageStats, format_summary
+
+EXECUTION_MODE_THREAD = 'thread'
+EXECUTION_MODE_PROCESS = 'process'
 
 class ScalerThread(QRunnable):
     """Image scaler thread"""
 
-    def __init__(self, images=[], width=None, height=None, outdir='', createpdf=True, scaled_image_suffix='-scaled', pdf_name='AllImages'):
+    def __init__(self, images=[], width=None, height=None, outdir='', createpdf=True, scaled_image_suffix='-scaled', pdf_name='AllImages', threadpool=None, execution_mode=EXECUTION_MODE_THREAD, fast_decode=False, pdf_jpeg_passthrough=True, incremental=True, incremental_hash=False, log_stage_stats=False, resume=True, preset=PRESET_BALANCED, output_format=OUTPUT_FORMAT_KEEP, encoder_settings=None, max_bytes=0, memory_budget_mb=0, strip_min_mp=64, strip_mmap=True, max_image_pixels=0, read_ahead=4, progress_interval=PROGRESS_INTERVAL, dedupe=DEDUPE_OFF, dedupe_max_distance=PERCEPTUAL_MAX_DISTANCE, shared_memory=True, auto_workers=False, max_workers=0, schedule=SCHEDULE_LIST, in_threadpool=True):
         """Initializes the thread
 
         :param images: The images
@@ -28,6 +51,36 @@ class ScalerThread(QRunnable):
         :param createpdf: Flag whether to create a PDF file of all images
         :param scaled_image_suffix: Scaled image suffix
         :param pdf_name: The PDF name
+        :param threadpool: The thread pool the thread is started in, runs the per-image tasks
+        :param execution_mode: Where images are scaled, 'thread' (thread pool) or 'process' (worker processes)
+        :param fast_decode: Flag whether to decode JPEGs at a reduced scale (libjpeg DCT scaling) for large downscales
+        :param pdf_jpeg_passthrough: Flag whether to embed scaled JPEGs into the PDF file without re-encoding
+        :param incremental: Flag whether to skip images whose output is up to date according to the manifest in the output directory
+        :param incremental_hash: Flag whether to compare content hashes of inputs whose size or mtime changed
+        :param log_stage_stats: Flag whether to log the stage statistics of the batch
+        :param resume: Flag whether to keep a checkpoint journal in the output directory and resume an interrupted run of the same batch
+        :param preset: The quality/speed preset of the resampling step, see lib.Scaler.PRESETS
+        :param output_format: The output format, see lib.Encoder.OUTPUT_FORMATS, 'keep' writes the format of the input
+        :param encoder_settings: The encoder settings, see lib.Encoder.get_encoder_settings, None for the defaults
+        :param max_bytes: The maximum size of an output in bytes, the quality of lossy formats is lowered to fit, 0 for no limit
+        :param memory_budget_mb: The memory in MB the decoded images being scaled at the same time may take, 0 for half of the physical memory
+        :param strip_min_mp: The size in megapixels from which PNG images are decoded in strips, bounding their memory, 0 to never decode in strips
+        :param strip_mmap: Flag whether to keep the reduced images of images decoded in strips in memory-mapped temporary files
+        :param max_image_pixels: The number of pixels above which images are refused as decompression bombs, 0 for the default of Pillow
+        :param read_ahead: The number of images read into memory ahead of the workers, outputs are then written
+            by a writer thread while the workers go on (see lib.Pipeline), 0 for workers that read and write themselves
+        :param progress_interval: The minimum seconds between two progress reports (scalingprogress)
+        :param dedupe: The dedupe mode, see lib.Dedupe.find_duplicates, duplicates of earlier images are skipped
+        :param dedupe_max_distance: The maximum number of differing bits of the perceptual hashes of near-duplicates
+        :param shared_memory: Flag whether to hand inputs read ahead and encoded outputs to and from worker processes
+            in shared memory instead of pickling them, see lib.SharedBuffer
+        :param auto_workers: Flag whether to adjust the number of active workers to the throughput while the batch runs,
+            starting with the number of threads of the thread pool, see lib.WorkerTuner
+        :param max_workers: The maximum number of workers with auto_workers, 0 for twice the number of CPU cores
+        :param schedule: The order in which the images are started, see lib.Schedule.SCHEDULES,
+            outputs, records and PDF pages keep the list order
+        :param in_threadpool: Flag whether the thread is started in the thread pool, its slot is then given to the
+            per-image tasks while it waits; False if run is called directly, e.g. on the main thread
         """
         super().__init__()
 
@@ -41,112 +94,564 @@ class ScalerThread(QRunnable):
         self.scaled_image_suffix = scaled_image_suffix
 
         self.pdf_name = pdf_name
+        self.threadpool = threadpool if threadpool else QThreadPool.globalInstance()
+        self.execution_mode = execution_mode
+        self.fast_decode = fast_decode
+        self.pdf_jpeg_passthrough = pdf_jpeg_passthrough
+        self.incremental = incremental
+        self.incremental_hash = incremental_hash
+        self.log_stage_stats = log_stage_stats
+        self.resume = resume
+        self.preset = get_preset(preset)
+        self.output_format = get_output_format(output_format)
+        self.encoder_settings = get_encoder_settings(encoder_settings)
+        self.max_bytes = max_bytes
+        self.memory_budget = get_memory_budget(memory_budget_mb)
+        self.strip_min_mp = strip_min_mp
+        self.strip_mmap = strip_mmap
+        self.max_image_pixels = max_image_pixels
+        self.read_ahead = read_ahead
+        self.progress_interval = progress_interval
+        self.dedupe = get_dedupe_mode(dedupe)
+        self.dedupe_max_distance = dedupe_max_distance
+        self.shared_memory = shared_memory and execution_mode == EXECUTION_MODE_PROCESS and is_shared_memory_available()
+        self.auto_workers = auto_workers
+        self.max_workers = max_workers
+        self.schedule = get_schedule(schedule)
+        self.in_threadpool = in_threadpool
+
+        self.cancel_event = threading.Event()
+        self._process_cancel_event = None
+        self._worker_limit = None
 
         self.signals = WorkerSignals()
 
     @pyqtSlot()
     def run(self):
-        """Runs the thread"""
-        processed_img_cnt = 0
+        """Runs the thread
+
+        Every image is scaled as its own work unit, either by a ScalerTask on the thread pool
+        or in a pool of worker processes. The number of work units in flight is bounded.
+        Results are collected in list order, the PDF pages are written as soon as
+        all images before them are done.
+        With read-ahead, the inputs are read and the outputs written by the stages of a pipeline
+        overlapping the disk access with scaling. Worker processes then get large inputs and return
+        large outputs in shared memory, only descriptors are pickled.
+        Images whose output is up to date are not scaled again but reported as cached.
+        The images are started in list order or, with a schedule, by their size read from the headers,
+        largest or smallest first.
+        With dedupe, duplicates of earlier images are found before the batch starts and skipped,
+        they get no output and no PDF page.
+        Images are only started while the estimated sizes of the decoded images in flight fit into
+        the memory budget, an image larger than the budget is scaled alone.
+        With auto workers, a tuner adjusts the number of images scaled at the same time to the
+        throughput of the last seconds, between one and the maximum number of workers.
+        Progress is reported at most once per progress interval, weighted by the pixels of the images,
+        together with the result records of the images done since the last report.
+        When cancelled, no further images are started and the running ones stop after
+        their current stage, no PDF file is written.
+        """
+        cached_img_cnt = 0
+        scaled_img_cnt = 0
+        failed_images = []
+        duplicate_images = {}
+        scaled_img_names = [None] * len(self.images)
+        done = [False] * len(self.images)
+        next_page = 0
+        worker_stats = {}
+        stage_stats = StageStats()
+        memory_budget = MemoryBudget(self.memory_budget)
+        estimates = {}
+        pixels = {}
+        progress = Progress(len(self.images), interval=self.progress_interval)
+        records = []
+        start = time.perf_counter()
+        executor = None
+        pipeline = None
+        tuner = None
+        threadpool_size = self.threadpool.maxThreadCount()
+        pdf_writer = None
+        manifest = None
+        journal = None
+        completed = False
+        cancelled = False
         try:
-            list_img = []
-            for img in self.images:
-                logging.debug('Processing image "%s", %dx%d px (width x height)', img, self.width, self.height)
-                scaled_img_name = self._get_scaled_img_path(img)
-                if scaled_img_name:
-                    logging.debug('Scaled path of image "%s": "%s"', img, scaled_img_name)
-                    logging.debug('Writing to "%s"', scaled_img_name)
-                    try:
-                        self._scale_image(input_image_path=img,
-                                          output_image_path=scaled_img_name,
-                                          width=self.width,
-                                          height=self.height)
-                    except Exception as ex:
-                        logging.warning('Exception while scaling: %s', ex)
-
-                    processed_img_cnt += 1
-
-                    try:
-                        if self.createpdf:
-                            if scaled_img_name.lower().endswith('.png'):
-                                rgba = Image.open(scaled_img_name)
-                                rgb = Image.new('RGB', rgba.size, (255, 255, 255))
-                                rgb.paste(rgba, mask=rgba.split()[3])
-                                list_img.append(rgb)
-                            else:
-                                list_img.append(Image.open(scaled_img_name))
-                    except Exception as ex:
-                        logging.warning('Exception while converting rgba to rgb: %s', ex)
-
-                    self.signals.scalingresult.emit(processed_img_cnt, len(self.images))
+            manifest = self._open_manifest() if self.incremental else None
+            journal = self._open_journal() if self.resume else None
+            resumed = journal.open() if journal else set()
+            pdf_writer = self._open_pdf_writer() if self.createpdf else None
+            results = queue.Queue()
+            nr_workers = max(1, threadpool_size)
+            duplicates = self._find_duplicates(nr_workers)
+            headers = self._read_headers(duplicates, nr_workers)
+            pending = self._get_pending(duplicates, headers)
+            if self.auto_workers:
+                tuner = WorkerTuner(nr_workers, max_workers=self.max_workers)
+                self._worker_limit = WorkerLimit(tuner.workers)
+                logging.info('Tuning the number of workers, starting with %d of at most %d', tuner.workers, tuner.max_workers)
+                nr_workers = tuner.max_workers
+            if self.execution_mode == EXECUTION_MODE_PROCESS:
+                logging.debug('Scaling in %d worker processes', nr_workers)
+                mp_context = multiprocessing.get_context('spawn')
+                self._process_cancel_event = mp_context.Event()
+                if self.cancel_event.is_set():
+                    self._process_cancel_event.set()
+                executor = ProcessPoolExecutor(max_workers=nr_workers,
+                                               mp_context=mp_context,
+                                               initializer=init_worker_process,
+                                               initargs=(self._process_cancel_event, self.max_image_pixels))
+            else:
+                logging.debug('Scaling in %d threads', nr_workers)
+                set_max_image_pixels(self.max_image_pixels)
+                self.threadpool.setMaxThreadCount(nr_workers)
+                if self.in_threadpool:
+                    # This thread only waits for the tasks, give its slot in the pool to them
+                    self.threadpool.releaseThread()
+            max_in_flight, max_read = self._get_max_in_flight(nr_workers, tuned=tuner is not None)
+            if self.read_ahead > 0:
+                logging.debug('Reading %d images ahead', self.read_ahead)
+                pipeline = Pipeline(lambda index, img, data: self._submit(executor, index, img, pipeline, data=data),
+                                    results,
+                                    max_read=max_read,
+                                    max_write=nr_workers,
+                                    strip_min_pixels=self.strip_min_mp * 1000000,
+                                    cancel_event=self.cancel_event,
+                                    read=read_shared if self.shared_memory else read_image_file)
+                pipeline.start()
+            if tuner:
+                max_in_flight, _ = self._get_max_in_flight(tuner.workers, tuned=True)
+            logging.debug('Memory budget: %d MB', self.memory_budget // (1024 * 1024))
+            in_flight = 0
+            try:
+                while pending or in_flight:
+                    if pending and self.cancel_event.is_set():
+                        logging.info('Cancelled, not starting the remaining %d images', len(pending))
+                        pending.clear()
+                        if not in_flight:
+                            break
+                    while pending and in_flight < max_in_flight:
+                        index, img = pending[0]
+                        if index not in estimates:
+                            if index in duplicates:
+                                pending.popleft()
+                                results.put((index, dict(get_failed_result(), duplicate_of=self.images[duplicates[index]])))
+                                in_flight += 1
+                                continue
+                            cached_img_name = self._get_resumed_output(img) if index in resumed else None
+                            cached_img_name = cached_img_name or self._get_cached_output(manifest, img)
+                            if cached_img_name:
+                                pending.popleft()
+                                results.put((index, dict(get_failed_result(), output=cached_img_name, ok=True, cached=True)))
+                                in_flight += 1
+                                continue
+                            header = headers.pop(index) if index in headers else read_header(img)
+                            estimates[index] = get_decoded_size(header)
+                            pixels[index] = header[0] if header else 0
+                        if not memory_budget.can_admit(estimates[index]):
+                            logging.debug('Waiting for memory to scale "%s"', img)
+                            break
+                        pending.popleft()
+                        if estimates[index] > self.memory_budget:
+                            logging.info('"%s" needs about %d MB decoded, more than the memory budget, scaling it alone',
+                                         img, estimates[index] // (1024 * 1024))
+                        memory_budget.admit(estimates[index])
+                        progress.start(pixels[index])
+                        if pipeline:
+                            pipeline.submit(index, img)
+                        else:
+                            self._submit(executor, index, img, results)
+                        in_flight += 1
+
+                    index, result = results.get()
+                    in_flight -= 1
+                    if index in estimates:
+                        memory_budget.release(estimates.pop(index))
+                    image_pixels = pixels.pop(index, None)
+                    if result.get('cancelled'):
+                        progress.cancel(image_pixels or 0)
+                        continue
+                    progress.done(image_pixels or 0, result['bytes_in'], cached=result.get('cached', False), started=image_pixels is not None,
+                                  skipped='duplicate_of' in result)
+                    done[index] = True
+                    if result['worker']:
+                        stats = worker_stats.setdefault(result['worker'], {'images': 0, 'busy_time': 0.0})
+                        stats['images'] += 1
+                        stats['busy_time'] += result['duration']
+                    if tuner and result['ok'] and not result.get('cached'):
+                        tuner.done(image_pixels or 0, result['duration'])
+                        workers = tuner.update()
+                        if workers:
+                            self._worker_limit.set_limit(workers)
+                            max_in_flight, _ = self._get_max_in_flight(workers, tuned=True)
+                    if 'duplicate_of' in result:
+                        duplicate_images[self.images[index]] = result['duplicate_of']
+                    elif result['ok']:
+                        scaled_img_names[index] = result['output']
+                        if journal and index not in resumed:
+                            journal.record(index)
+                        if result.get('cached'):
+                            cached_img_cnt += 1
+                        else:
+                            scaled_img_cnt += 1
+                            stage_stats.add(result['stages'], result['bytes_in'], result['bytes_out'], conversion=result['conversion'])
+                            if manifest:
+                                manifest.record(self.images[index], result['output'], self._get_scale_params(), input_hash=result['input_hash'])
+                    else:
+                        failed_images.append(self.images[index])
+                    records.append(get_result_record(index, self.images[index], result))
+                    if progress.due():
+                        self.signals.scalingprogress.emit(progress.get_report())
+                        self.signals.scalingrecords.emit(records)
+                        records = []
+
+                    while pdf_writer and next_page < len(self.images) and done[next_page]:
+                        if scaled_img_names[next_page]:
+                            page_start = time.perf_counter()
+                            self._add_pdf_page(pdf_writer, scaled_img_names[next_page])
+                            stage_stats.add({STAGE_PDF: time.perf_counter() - page_start})
+                        next_page += 1
+                cancelled = not all(done)
+                completed = not cancelled
+            finally:
+                if executor:
+                    executor.shutdown(wait=True)
+                else:
+                    if self.in_threadpool:
+                        self.threadpool.reserveThread()
+                    self.threadpool.setMaxThreadCount(threadpool_size)
+                if pipeline:
+                    pipeline.stop()
         except Exception as ex:
             logging.exception('Failed to process images.')
             self.signals.scalingerror.emit(ex)
         finally:
-            pdf_written = False
-            if self.createpdf and list_img:
-                pdf_written = True
-                pdf_name = f'{self.outdir}/{self.pdf_name}.pdf'
-                if os.path.exists(pdf_name):
-                    try:
-                        logging.debug('File "%s" exists, deleting', pdf_name)
-                        os.remove(pdf_name)
-                    except Exception as ex:
-                        logging.debug('Exception while deleting existing PDF file: %s', ex)
-                        pdf_written = False
-                if pdf_written:
-                    logging.debug('Generating PDF file "%s"', pdf_name)
-                    list_img[0].save(pdf_name, 'PDF', resolution=100.0, save_all=True, append_images=list_img[1:])
-            self.signals.scalingfinished.emit(processed_img_cnt, len(self.images), pdf_written)
-
-    def _get_scaled_img_path(self, path_img):
-        """returns the image name of the scaled image
-
-        :param path_img: The image path
+            if manifest:
+                manifest.close()
+            if journal:
+                journal.close(completed)
+            if cancelled:
+                logging.info('Cancelled, %d of %d images are done', sum(done), len(self.images))
+            if cached_img_cnt:
+                logging.info('%d images were up to date', cached_img_cnt)
+            if duplicate_images:
+                logging.info('%d duplicate images were skipped', len(duplicate_images))
+            # Every image has a record, the ones that have not been done are reported as cancelled
+            records.extend(get_result_record(index, img) for index, img in enumerate(self.images) if not done[index])
+            if records:
+                self.signals.scalingrecords.emit(records)
+            self._emit_worker_stats(worker_stats, time.perf_counter() - start, scaled_img_cnt, cached_img_cnt, failed_images, duplicate_images, cancelled,
+                                    tuning=tuner.decisions if tuner else [])
+            self._emit_stage_stats(stage_stats)
+            if cancelled and pdf_writer:
+                pdf_writer.abort()
+                pdf_writer = None
+            pdf_written = self._close_pdf_writer(pdf_writer)
+            self.signals.scalingfinished.emit(scaled_img_cnt, len(self.images), pdf_written)
+
+    def cancel(self):
+        """Cancels the batch, returns immediately"""
+        logging.info('Cancelling')
+        self.cancel_event.set()
+        if self._process_cancel_event is not None:
+            self._process_cancel_event.set()
+
+    def get_task_kwargs(self):
+        """Returns the keyword arguments of scale_image_task for the images of this batch
+
+        :return: The keyword arguments (dict)
         """
+        return {
+            'width': self.width,
+            'height': self.height,
+            'fast_decode': self.fast_decode,
+            'preset': self.preset,
+            'output_format': self.output_format,
+            'encoder_settings': self.encoder_settings,
+            'max_bytes': self.max_bytes,
+            'strip_min_pixels': self.strip_min_mp * 1000000,
+            'strip_mmap': self.strip_mmap,
+            'hash_input': self.incremental and self.incremental_hash,
+            'write': self.read_ahead <= 0
+        }
+
+    def _get_scale_params(self):
+        """Returns the parameters the outputs depend on, as recorded in the manifest
+
+        :return: The scale parameters (dict)
+        """
+        return {
+            'width': self.width,
+            'height': self.height,
+            'suffix': self.scaled_image_suffix,
+            'fast_decode': self.fast_decode,
+            'preset': self.preset,
+            'output_format': self.output_format,
+            'encoder_settings': self.encoder_settings,
+            'max_bytes': self.max_bytes,
+            'strip_min_mp': self.strip_min_mp
+        }
+
+    def _find_duplicates(self, nr_workers):
+        """Finds the duplicate images of the batch
+
+        :param nr_workers: The number of threads hashing the images
+        :return: Dict index of a duplicate -> index of the image that is scaled
+        """
+        if self.dedupe == DEDUPE_OFF:
+            return {}
+        start = time.perf_counter()
+        duplicates = find_duplicates(self.images,
+                                     mode=self.dedupe,
+                                     max_distance=self.dedupe_max_distance,
+                                     workers=nr_workers,
+                                     max_pixels=self.strip_min_mp * 1000000,
+                                     cancel_event=self.cancel_event)
+        logging.info('Found %d duplicates among %d images in %.3fs (%s)', len(duplicates), len(self.images), time.perf_counter() - start, self.dedupe)
+        for index, original in sorted(duplicates.items()):
+            logging.debug('"%s" is a duplicate of "%s"', self.images[index], self.images[original])
+
+        return duplicates
+
+    def _read_headers(self, duplicates, nr_workers):
+        """Reads the headers of the images the schedule orders
+
+        :param duplicates: Dict index of a duplicate -> index of the image that is scaled
+        :param nr_workers: The number of threads reading the headers
+        :return: Dict index -> tuple (number of pixels, mode) or None, empty in list order
+        """
+        if self.schedule == SCHEDULE_LIST:
+            return {}
+        start = time.perf_counter()
+        indices = [index for index in range(len(self.images)) if index not in duplicates]
+        headers = read_headers(self.images, indices, workers=nr_workers, cancel_event=self.cancel_event)
+        logging.info('Read %d headers in %.3fs (%s)', len(headers), time.perf_counter() - start, self.schedule)
+
+        return headers
+
+    def _get_pending(self, duplicates, headers):
+        """Returns the images in the order they are started
+
+        With a schedule, duplicates are done without scaling and come first.
+
+        :param duplicates: Dict index of a duplicate -> index of the image that is scaled
+        :param headers: Dict index -> tuple (number of pixels, mode) or None, see _read_headers
+        :return: Deque of tuples (index, image)
+        """
+        if self.schedule == SCHEDULE_LIST:
+            return deque(enumerate(self.images))
+        indices = [index for index in range(len(self.images)) if index not in duplicates]
+        order = sorted(duplicates) + get_start_order(indices, headers, self.schedule)
+
+        return deque((index, self.images[index]) for index in order)
+
+    def _open_manifest(self):
+        """Opens the manifest of the output directory
+
+        :return: The manifest or None if it could not be opened
+        """
+        manifest = Manifest(self.outdir, use_hash=self.incremental_hash)
         try:
-            with open(path_img, encoding='utf-8') as f:
-                fname = os.path.basename(f.name)
-                lindex = fname.rfind('.')
-                newname = fname[:lindex] + self.scaled_image_suffix
-                suffix = fname[lindex:]
-                out_path = f'{self.outdir}/{newname}{suffix}'
-                logging.debug('Output image path: "%s"', out_path)
-
-                return out_path
+            manifest.open()
         except Exception as ex:
-            logging.error('Error getting path for image "%s": %s', path_img, ex)
+            logging.warning('Could not open manifest, processing all images: %s', ex)
+            return None
+
+        return manifest
+
+    def _get_cached_output(self, manifest, img):
+        """Returns the output path of the image if the output is up to date
+
+        :param manifest: The manifest, may be None
+        :param img: The image path
+        :return: The output path or None if the image has to be scaled
+        """
+        if not manifest:
             return None
+        scaled_img_name = get_scaled_img_path(img, self.outdir, self.scaled_image_suffix, output_format=self.output_format)
+        if scaled_img_name and manifest.is_up_to_date(img, scaled_img_name, self._get_scale_params()):
+            logging.debug('Output "%s" is up to date', scaled_img_name)
+            return scaled_img_name
+
+        return None
+
+    def _open_journal(self):
+        """Returns the checkpoint journal of the batch
 
-    def _scale_image(self,
-                     input_image_path,
-                     output_image_path,
-                     width=None,
-                     height=None):
-        """Scales the image
-
-        :param input_image_path: The input image path
-        :param output_image_path: The output image path
-        :param width: The width [optional if height set]
-        :param height: The height [optional if width set]
-        """
-        original_image = Image.open(input_image_path)
-        orig_width, orig_height = original_image.size
-        logging.debug('The original image size is %d wide x %d high', orig_width, orig_height)
-
-        if width and height:
-            max_size = (width, height)
-        elif width:
-            max_size = (width, orig_height)
-        elif height:
-            max_size = (orig_width, height)
+        :return: The journal
+        """
+        return Journal(self.outdir, self.images, self._get_scale_params())
+
+    def _get_resumed_output(self, img):
+        """Returns the output path of an image that has been finished by an interrupted run
+
+        :param img: The image path
+        :return: The output path or None if the output does not exist (anymore)
+        """
+        scaled_img_name = get_scaled_img_path(img, self.outdir, self.scaled_image_suffix, output_format=self.output_format)
+        if scaled_img_name and os.path.exists(scaled_img_name):
+            logging.debug('Output "%s" has been finished before', scaled_img_name)
+            return scaled_img_name
+
+        return None
+
+    def _open_pdf_writer(self):
+        """Removes an existing PDF file and opens a new PDF writer
+
+        :return: The PDF writer or None if the existing file could not be removed
+        """
+        pdf_name = f'{self.outdir}/{self.pdf_name}.pdf'
+        if os.path.exists(pdf_name):
+            try:
+                logging.debug('File "%s" exists, deleting', pdf_name)
+                os.remove(pdf_name)
+            except Exception as ex:
+                logging.debug('Exception while deleting existing PDF file: %s', ex)
+                return None
+        logging.debug('Generating PDF file "%s"', pdf_name)
+        pdf_writer = PdfWriter(pdf_name, resolution=100.0)
+        pdf_writer.open()
+
+        return pdf_writer
+
+    def _add_pdf_page(self, pdf_writer, scaled_img_name):
+        """Adds the scaled image as a page to the PDF file
+
+        :param pdf_writer: The PDF writer
+        :param scaled_img_name: The scaled image path, None if the image could not be scaled
+        """
+        if not scaled_img_name:
+            return
+        try:
+            if self.pdf_jpeg_passthrough and pdf_writer.add_jpeg_file(scaled_img_name):
+                return
+            with Image.open(scaled_img_name) as img:
+                pdf_writer.add_image(img)
+        except Exception as ex:
+            logging.warning('Exception while adding "%s" to the PDF file: %s', scaled_img_name, ex)
+
+    def _close_pdf_writer(self, pdf_writer):
+        """Finishes the PDF file
+
+        :param pdf_writer: The PDF writer, may be None
+        :return: Boolean flag whether a PDF file has been written
+        """
+        if not pdf_writer:
+            return False
+        try:
+            if pdf_writer.get_nr_pages():
+                pdf_writer.close()
+                return True
+        except Exception as ex:
+            logging.warning('Exception while writing the PDF file: %s', ex)
+        pdf_writer.abort()
+
+        return False
+
+    def _submit(self, executor, index, img, results, data=None):
+        """Submits the image as a work unit
+
+        :param executor: The process pool executor, None to run on the thread pool
+        :param index: The index of the image
+        :param img: The image path
+        :param results: The result queue or the pipeline
+        :param data: The content of the image if it has been read ahead (bytes or SharedBuffer, which is freed
+            when the worker is done), None else
+        """
+        if self._worker_limit:
+            self._worker_limit.acquire()
+        if not executor:
+            self.threadpool.start(ScalerTask(self, index, img, results, data=data))
+            return
+
+        def _done(future):
+            self.release_worker()
+            # The worker is done with the input
+            release(data)
+            try:
+                result = future.result()
+            except BaseException as ex:
+                # Also a worker that died, every image needs a result or the batch waits forever
+                logging.warning('Exception in worker process: %s', ex)
+                result = get_failed_result(error=type(ex).__name__, message=str(ex))
+            results.put((index, result))
+
+        if self.shared_memory:
+            future = executor.submit(scale_shared_image_task,
+                                     img,
+                                     self.outdir,
+                                     self.scaled_image_suffix,
+                                     data=data,
+                                     share_output=can_share_outputs(),
+                                     **self.get_task_kwargs())
         else:
-            # No width or height specified
-            raise RuntimeError('Width or height required!')
+            future = executor.submit(scale_image_task,
+                                     img,
+                                     self.outdir,
+                                     self.scaled_image_suffix,
+                                     data=data,
+                                     **self.get_task_kwargs())
+        future.add_done_callback(_done)
+
+    def release_worker(self):
+        """Counts a worker as finished, called when a work unit is done"""
+        if self._worker_limit:
+            self._worker_limit.release()
 
-        original_image.thumbnail(max_size, Image.LANCZOS)
-        original_image.save(output_image_path)
+    def _get_max_in_flight(self, nr_workers, tuned=False):
+        """Returns the maximum number of work units in flight
 
-        scaled_image = Image.open(output_image_path)
-        width, height = scaled_image.size
-        logging.debug('The scaled image size is %d wide x %d high', width, height)
+        :param nr_workers: The number of workers
+        :param tuned: Flag whether the number of workers is tuned, no units are queued for the workers then,
+            so that the coordinator never waits for the limit of the active workers
+        :return: Tuple (maximum number of work units in flight, maximum number of images read ahead and not scaled yet)
+        """
+        if self.execution_mode == EXECUTION_MODE_PROCESS and not tuned:
+            # Keep one task queued per process so that no worker waits for the next one
+            max_scaling = 2 * nr_workers
+        else:
+            max_scaling = nr_workers
+        max_read = max_scaling + self.read_ahead
+        if self.read_ahead > 0:
+            # Images in the pipeline count as in flight
+            return max_read + nr_workers, max_read
+        return max_scaling, max_read
+
+    def _emit_worker_stats(self, worker_stats, wall_time, scaled_img_cnt, cached_img_cnt, failed_images, duplicate_images, cancelled, tuning=None):
+        """Logs and emits the per-worker statistics
+
+        :param worker_stats: The statistics per worker
+        :param wall_time: The wall time of the batch in seconds
+        :param scaled_img_cnt: The number of images that have been scaled, not counting the ones that were up to date
+        :param cached_img_cnt: The number of images whose output was up to date
+        :param failed_images: The images that could not be scaled
+        :param duplicate_images: The skipped duplicates, dict path -> path of the image it is a copy of
+        :param cancelled: Boolean flag whether the batch has been cancelled
+        :param tuning: The decisions of the worker tuner, see lib.WorkerTuner.WorkerTuner
+        """
+        for worker, stats in sorted(worker_stats.items()):
+            logging.info('Worker "%s": %d images in %.3fs', worker, stats['images'], stats['busy_time'])
+        logging.info('Scaled %d, up to date %d, failed %d, duplicates %d of %d images in %.3fs (%s mode)',
+                     scaled_img_cnt, cached_img_cnt, len(failed_images), len(duplicate_images), len(self.images),
+                     wall_time, self.execution_mode)
+        self.signals.scalingworkerstats.emit({
+            'mode': self.execution_mode,
+            'wall_time': wall_time,
+            'workers': worker_stats,
+            'scaled': scaled_img_cnt,
+            'cached': cached_img_cnt,
+            'failed': failed_images,
+            'duplicates': duplicate_images,
+            'tuning': tuning or [],
+            'cancelled': cancelled
+        })
+
+    def _emit_stage_stats(self, stage_stats):
+        """Emits and, if enabled, logs the stage statistics
+
+        :param stage_stats: The stage statistics
+        """
+        summary = stage_stats.get_summary()
+        if self.log_stage_stats:
+            for line in format_summary(summary):
+                logging.info(line)
+        self.signals.scalingstagestats.emit(summary)
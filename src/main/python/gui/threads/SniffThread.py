@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Sniff thread"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QRunnable, pyqtSlot
+
+from gui.signals.WorkerSignals import WorkerSignals
+from lib.Dedupe import get_path_key
+from lib.FileTypeCache import IMAGE_MIME_TYPES
+
+# Maximum number of images reported at once
+SNIFF_BATCH_SIZE = 500
+
+# Maximum seconds between two reports while images are found
+SNIFF_BATCH_INTERVAL = 0.25
+
+class SniffThread(QRunnable):
+    """Finds the supported images among dropped or selected files, in the background"""
+
+    def __init__(self, paths, filetype_cache, mime_types=IMAGE_MIME_TYPES, workers=8, batch_size=SNIFF_BATCH_SIZE,
+                 batch_interval=SNIFF_BATCH_INTERVAL):
+        """Initializes the thread
+
+        :param paths: The file paths
+        :param filetype_cache: The lib.FileTypeCache.FileTypeCache of the files sniffed before
+        :param mime_types: The mime types of the accepted images
+        :param workers: The number of threads sniffing the files, reading from network shares is latency bound
+        :param batch_size: The maximum number of images reported at once (sniffedimages)
+        :param batch_interval: The maximum seconds between two reports while images are found
+        """
+        super().__init__()
+
+        logging.debug('Initializing SniffThread')
+
+        self.paths = paths
+        self.filetype_cache = filetype_cache
+        self.mime_types = mime_types
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+
+        self.cancel_event = threading.Event()
+
+        self.signals = WorkerSignals()
+
+    @pyqtSlot()
+    def run(self):
+        """Runs the thread
+
+        The files are sniffed in parallel, the images are reported in batches in the order of the paths,
+        with the keys of their files (see lib.Dedupe.get_path_key), so that the list needs not read them again.
+        When cancelled, the remaining files are not sniffed.
+        """
+        start = time.perf_counter()
+        nr_images = 0
+        batch = []
+        last_report = time.perf_counter()
+
+        def _sniff(path):
+            if self.cancel_event.is_set() or not self.filetype_cache.is_image(path, self.mime_types):
+                return None
+            return get_path_key(path)
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix='Sniff') as executor:
+                for path, key in zip(self.paths, executor.map(_sniff, self.paths)):
+                    if self.cancel_event.is_set():
+                        break
+                    if key is not None:
+                        batch.append((path, key))
+                    if batch and (len(batch) >= self.batch_size or time.perf_counter() - last_report >= self.batch_interval):
+                        nr_images += len(batch)
+                        self.signals.sniffedimages.emit(batch)
+                        batch = []
+                        last_report = time.perf_counter()
+            if batch and not self.cancel_event.is_set():
+                nr_images += len(batch)
+                self.signals.sniffedimages.emit(batch)
+        except Exception:
+            logging.exception('Failed to check the files.')
+        finally:
+            logging.info('Found %d images among %d files in %.3fs', nr_images, len(self.paths), time.perf_counter() - start)
+            self.signals.sniffingfinished.emit(nr_images, len(self.paths))
+
+    def cancel(self):
+        """Cancels sniffing, returns immediately"""
+        self.cancel_event.set()
@@ -29,8 +29,38 @@ _app_config = {
     'label.header.small.font.size': 12,
     'label.info.font.size': 10,
     'label.info.small.font.size': 8,
+    'scaling.execution_mode': 'thread',
+    'scaling.fast_decode': False,
+    'scaling.incremental': True,
+    'scaling.incremental_hash': False,
+    'scaling.resume': True,
+    'scaling.preset': 'balanced',
+    'scaling.memory_budget_mb': 0,
+    'scaling.strip_min_mp': 64,
+    'scaling.strip_mmap': True,
+    'scaling.max_image_pixels': 0,
+    'scaling.read_ahead': 4,
+    'scaling.shared_memory': True,
+    'scaling.auto_workers': False,
+    'scaling.max_workers': 0,
+    'scaling.schedule': 'list',
+    'scaling.dedupe': 'off',
+    'scaling.dedupe_max_distance': 6,
+    'encoding.output_format': 'keep',
+    'encoding.jpeg_quality': 75,
+    'encoding.jpeg_progressive': False,
+    'encoding.jpeg_optimize': False,
+    'encoding.jpeg_subsampling': '4:2:0',
+    'encoding.png_compress_level': 6,
+    'encoding.webp_quality': 80,
+    'encoding.webp_method': 4,
+    'encoding.max_bytes': 0,
+    'pdf.jpeg_passthrough': True,
+    'watch.settle_time': 2.0,
+    'watch.poll_interval': 10.0,
     'logging.log_to_file': False,
     'logging.loglevel': 'INFO',
+    'logging.stage_stats': False,
     'logging.format': '[%(asctime)s] [%(levelname)-5s] [%(module)-20s:%(lineno)-4s] %(message)s',
     'logging.datefmt': '%d-%m-%Y %H:%M:%S',
     'logging.logfile': str(Path.home()) + '/ImageScaler/logs/application-' + time.strftime('%d-%m-%Y-%H-%M-%S') + '.log'
@@ -40,8 +70,38 @@ _public_value_fields = [
     'window.width',
     'window.height',
     'language.main',
+    'scaling.execution_mode',
+    'scaling.fast_decode',
+    'scaling.incremental',
+    'scaling.incremental_hash',
+    'scaling.resume',
+    'scaling.preset',
+    'scaling.memory_budget_mb',
+    'scaling.strip_min_mp',
+    'scaling.strip_mmap',
+    'scaling.max_image_pixels',
+    'scaling.read_ahead',
+    'scaling.shared_memory',
+    'scaling.auto_workers',
+    'scaling.max_workers',
+    'scaling.schedule',
+    'scaling.dedupe',
+    'scaling.dedupe_max_distance',
+    'encoding.output_format',
+    'encoding.jpeg_quality',
+    'encoding.jpeg_progressive',
+    'encoding.jpeg_optimize',
+    'encoding.jpeg_subsampling',
+    'encoding.png_compress_level',
+    'encoding.webp_quality',
+    'encoding.webp_method',
+    'encoding.max_bytes',
+    'pdf.jpeg_passthrough',
+    'watch.settle_time',
+    'watch.poll_interval',
     'logging.log_to_file',
-    'logging.loglevel'
+    'logging.loglevel',
+    'logging.stage_stats'
 ]
 
 def is_macos():
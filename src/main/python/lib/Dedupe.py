@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Dedupe
+
+Finds duplicate inputs of a batch before they are scaled. Does not depend on Qt.
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageStat
+
+from lib.Manifest import hash_file
+
+DEDUPE_OFF = 'off'
+DEDUPE_EXACT = 'exact'
+DEDUPE_PERCEPTUAL = 'perceptual'
+DEDUPE_MODES = [DEDUPE_OFF, DEDUPE_EXACT, DEDUPE_PERCEPTUAL]
+
+# Maximum number of differing bits of the perceptual hashes of near-duplicates
+PERCEPTUAL_MAX_DISTANCE = 6
+
+# Maximum difference of the mean colours (per channel, alpha included) of near-duplicates
+PERCEPTUAL_MAX_COLOUR_DISTANCE = 16
+
+# Width and height of the perceptual hash, in bits
+_HASH_SIZE = 8
+
+# Minimum variance of the gray pixels of the hash, flatter images have no meaningful hash
+_MIN_VARIANCE = 4.0
+
+def get_dedupe_mode(mode):
+    """Returns the dedupe mode if it is known, 'off' else
+
+    :param mode: The dedupe mode name
+    :return: The dedupe mode name
+    """
+    if mode in DEDUPE_MODES:
+        return mode
+    logging.warning('Unknown dedupe mode "%s", using "%s"', mode, DEDUPE_OFF)
+    return DEDUPE_OFF
+
+def get_path_key(path):
+    """Returns a key that is equal for all paths of the same file
+
+    :param path: The file path
+    :return: The key
+    """
+    return os.path.normcase(os.path.realpath(path))
+
+def get_perceptual_hash(path, max_pixels=0):
+    """Returns the difference hash (dHash) and the mean colour of the image
+
+    The image is reduced to 9x8 pixels, every bit tells whether a gray pixel is brighter than its
+    right neighbour. Scaled, recompressed or slightly edited copies differ in few bits only.
+    Flat images (solid colours, blank pages) all have about the same hash, they are not hashed.
+    JPEG images are decoded at a reduced size.
+
+    :param path: The image path
+    :param max_pixels: The maximum number of pixels of images that cannot be decoded at a reduced size, 0 for no limit
+    :return: Tuple (hash (int), mean colour (RGBA tuple)) or None if the image cannot be read, is too large or flat
+    """
+    try:
+        with Image.open(path) as img:
+            img.draft('RGB', (4 * (_HASH_SIZE + 1), 4 * _HASH_SIZE))
+            if max_pixels and img.format != 'JPEG' and img.width * img.height > max_pixels:
+                logging.debug('Not hashing "%s", too large', path)
+                return None
+            reduced = img.convert('RGBA').resize((_HASH_SIZE + 1, _HASH_SIZE), Image.LANCZOS)
+    except (OSError, ValueError, Image.DecompressionBombError) as ex:
+        logging.debug('Could not hash "%s": %s', path, ex)
+        return None
+    gray = reduced.convert('L')
+    if ImageStat.Stat(gray).var[0] < _MIN_VARIANCE:
+        logging.debug('Not hashing "%s", too flat', path)
+        return None
+    pixels = gray.tobytes()
+    value = 0
+    for row in range(_HASH_SIZE):
+        for col in range(_HASH_SIZE):
+            offset = row * (_HASH_SIZE + 1) + col
+            value = (value << 1) | (pixels[offset] > pixels[offset + 1])
+    return value, tuple(round(mean) for mean in ImageStat.Stat(reduced).mean)
+
+def _find_exact_duplicates(images, executor, cancel_event=None):
+    """Finds the images with identical content
+
+    Paths of the same file are duplicates without reading them. Files of different sizes cannot be
+    identical, only files sharing their size with another file are hashed.
+
+    :param images: The image paths
+    :param executor: The executor hashing the files
+    :param cancel_event: The event that cancels the search
+    :return: Dict index of a duplicate -> index of the first image with the same content
+    """
+    duplicates = {}
+    by_path = {}
+    by_size = {}
+    for index, img in enumerate(images):
+        path_key = get_path_key(img)
+        if path_key in by_path:
+            duplicates[index] = by_path[path_key]
+            continue
+        by_path[path_key] = index
+        try:
+            by_size.setdefault(os.path.getsize(img), []).append(index)
+        except OSError:
+            # Reported when scaling it
+            pass
+
+    candidates = [index for indices in by_size.values() if len(indices) > 1 for index in indices]
+    logging.debug('Hashing %d of %d images with the same size as another one', len(candidates), len(images))
+
+    def _hash(index):
+        if cancel_event and cancel_event.is_set():
+            return None
+        try:
+            return hash_file(images[index])
+        except OSError as ex:
+            logging.debug('Could not hash "%s": %s', images[index], ex)
+            return None
+
+    by_hash = {}
+    for index, digest in zip(candidates, executor.map(_hash, candidates)):
+        if digest is None:
+            continue
+        if digest in by_hash:
+            duplicates[index] = by_hash[digest]
+        else:
+            by_hash[digest] = index
+    return duplicates
+
+def _find_perceptual_duplicates(images, indices, executor, max_distance, max_pixels=0, cancel_event=None):
+    """Finds the images that look alike
+
+    Two hashes within the distance agree completely in at least one of max_distance + 1 bands of
+    bits, only images sharing a band are compared. Images within the distance are near-duplicates
+    if their mean colours (alpha included) are close as well, flat images are never near-duplicates.
+
+    :param images: The image paths
+    :param indices: The indices of the images to compare, in list order
+    :param executor: The executor hashing the images
+    :param max_distance: The maximum number of differing bits of near-duplicates
+    :param max_pixels: The maximum number of pixels of images that cannot be decoded at a reduced size
+    :param cancel_event: The event that cancels the search
+    :return: Dict index of a duplicate -> index of the first image that looks alike
+    """
+    nr_bits = _HASH_SIZE * _HASH_SIZE
+    nr_bands = min(max_distance + 1, nr_bits)
+    bands = [(nr_bits * band // nr_bands, nr_bits * (band + 1) // nr_bands) for band in range(nr_bands)]
+
+    duplicates = {}
+    signatures = {}
+    tables = [{} for _ in bands]
+
+    def _hash(index):
+        if cancel_event and cancel_event.is_set():
+            return None
+        return get_perceptual_hash(images[index], max_pixels)
+
+    def _is_alike(signature, other):
+        if bin(signature[0] ^ other[0]).count('1') > max_distance:
+            return False
+        return all(abs(a - b) <= PERCEPTUAL_MAX_COLOUR_DISTANCE for a, b in zip(signature[1], other[1]))
+
+    perceptual_hashes = executor.map(_hash, indices)
+    for index, signature in zip(indices, perceptual_hashes):
+        if cancel_event and cancel_event.is_set():
+            break
+        if signature is None:
+            continue
+        value = signature[0]
+        keys = [(value >> start) & ((1 << (end - start)) - 1) for start, end in bands]
+        candidates = sorted({other for table, key in zip(tables, keys) for other in table.get(key, [])})
+        original = next((other for other in candidates if _is_alike(signature, signatures[other])), None)
+        if original is not None:
+            duplicates[index] = original
+            continue
+        signatures[index] = signature
+        for table, key in zip(tables, keys):
+            table.setdefault(key, []).append(index)
+    return duplicates
+
+def find_duplicates(images, mode=DEDUPE_EXACT, max_distance=PERCEPTUAL_MAX_DISTANCE, workers=4, max_pixels=0, cancel_event=None):
+    """Finds the duplicate images of a batch, the first image of each group of duplicates is kept
+
+    :param images: The image paths
+    :param mode: The dedupe mode, 'exact' for identical files, 'perceptual' also for images that look alike
+    :param max_distance: The maximum number of differing bits of the perceptual hashes of near-duplicates
+    :param workers: The number of threads hashing the images
+    :param max_pixels: The maximum number of pixels of images hashed perceptually that cannot be decoded at a reduced size, 0 for no limit
+    :param cancel_event: The event that cancels the search
+    :return: Dict index of a duplicate -> index of the image that is kept
+    """
+    mode = get_dedupe_mode(mode)
+    if mode == DEDUPE_OFF or len(images) < 2:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='Dedupe') as executor:
+        duplicates = _find_exact_duplicates(images, executor, cancel_event=cancel_event)
+        if mode == DEDUPE_PERCEPTUAL and not (cancel_event and cancel_event.is_set()):
+            indices = [index for index in range(len(images)) if index not in duplicates]
+            duplicates.update(_find_perceptual_duplicates(images, indices, executor, max_distance, max_pixels=max_pixels,
+                                                          cancel_event=cancel_event))
+    if cancel_event and cancel_event.is_set():
+        return {}
+    # A path of the same file as a kept image may itself be a copy of an earlier image
+    for index, original in duplicates.items():
+        while original in duplicates:
+            original = duplicates[original]
+        duplicates[index] = original
+    return duplicates
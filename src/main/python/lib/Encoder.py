@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Encoder
+
+Encodes scaled images into memory with configurable encoder settings. Does not depend on Qt.
+"""
+
+import io
+import logging
+
+from lib.PdfWriter import flatten_image
+
+OUTPUT_FORMAT_KEEP = 'keep'
+OUTPUT_FORMAT_JPEG = 'jpeg'
+OUTPUT_FORMAT_PNG = 'png'
+OUTPUT_FORMAT_WEBP = 'webp'
+OUTPUT_FORMAT_WEBP_LOSSLESS = 'webp-lossless'
+
+# Pillow format, file extension and lossless flag per output format, 'keep' writes the format of the input
+OUTPUT_FORMATS = {
+    OUTPUT_FORMAT_KEEP: None,
+    OUTPUT_FORMAT_JPEG: {'format': 'JPEG', 'extension': '.jpg', 'lossless': False},
+    OUTPUT_FORMAT_PNG: {'format': 'PNG', 'extension': '.png', 'lossless': True},
+    OUTPUT_FORMAT_WEBP: {'format': 'WEBP', 'extension': '.webp', 'lossless': False},
+    OUTPUT_FORMAT_WEBP_LOSSLESS: {'format': 'WEBP', 'extension': '.webp', 'lossless': True}
+}
+
+# The encoder settings, the defaults are the ones of Pillow
+ENCODER_DEFAULTS = {
+    'jpeg_quality': 75,
+    'jpeg_progressive': False,
+    'jpeg_optimize': False,
+    'jpeg_subsampling': '4:2:0',
+    'png_compress_level': 6,
+    'webp_quality': 80,
+    'webp_method': 4
+}
+
+JPEG_SUBSAMPLINGS = ['4:4:4', '4:2:2', '4:2:0']
+
+# The lowest quality the size budget search goes down to
+MIN_QUALITY = 10
+
+def get_encoder_settings(settings=None):
+    """Returns the encoder settings, completed with the defaults
+
+    :param settings: The settings (dict), may be None or contain only some of the settings
+    :return: The settings (dict)
+    """
+    return dict(ENCODER_DEFAULTS, **(settings or {}))
+
+def get_output_format(output_format):
+    """Returns the output format if it is known, 'keep' else
+
+    :param output_format: The output format name
+    :return: The output format name
+    """
+    if output_format in OUTPUT_FORMATS:
+        return output_format
+    logging.warning('Unknown output format "%s", using "%s"', output_format, OUTPUT_FORMAT_KEEP)
+    return OUTPUT_FORMAT_KEEP
+
+def get_format_label(img_format, lossless=False):
+    """Returns a label of the format, e.g. for statistics
+
+    :param img_format: The Pillow format
+    :param lossless: Flag whether the format is written lossless
+    :return: The label, e.g. 'WEBP' or 'WEBP-LOSSLESS'
+    """
+    return f'{img_format}-LOSSLESS' if lossless and img_format == 'WEBP' else img_format
+
+def get_save_options(img_format, settings, quality=None, lossless=False):
+    """Returns the options of Image.save for the format
+
+    :param img_format: The Pillow format, e.g. 'JPEG'
+    :param settings: The encoder settings, see get_encoder_settings
+    :param quality: The quality, overrides the quality of the settings [optional]
+    :param lossless: Flag whether to write WebP lossless
+    :return: The options (dict)
+    """
+    if img_format == 'JPEG':
+        return {
+            'quality': quality if quality is not None else settings['jpeg_quality'],
+            'progressive': settings['jpeg_progressive'],
+            'optimize': settings['jpeg_optimize'],
+            'subsampling': settings['jpeg_subsampling']
+        }
+    if img_format == 'PNG':
+        return {'compress_level': settings['png_compress_level']}
+    if img_format == 'WEBP':
+        return {
+            'quality': quality if quality is not None else settings['webp_quality'],
+            'method': settings['webp_method'],
+            'lossless': lossless
+        }
+    return {}
+
+def get_quality(img_format, settings, lossless=False):
+    """Returns the quality the format is encoded at
+
+    :param img_format: The Pillow format
+    :param settings: The encoder settings
+    :param lossless: Flag whether the format is written lossless
+    :return: The quality or None if the format has no quality setting or is written lossless
+    """
+    if img_format == 'JPEG':
+        return settings['jpeg_quality']
+    if img_format == 'WEBP' and not lossless:
+        return settings['webp_quality']
+    return None
+
+def convert_for_format(img, img_format):
+    """Converts the image into a mode the format can store
+
+    Transparent images are composited onto white for JPEG, CMYK images are converted to RGB for PNG.
+    Pillow converts the remaining modes itself, if needed.
+
+    :param img: The image
+    :param img_format: The Pillow format
+    :return: The image, converted if necessary
+    """
+    if img_format == 'JPEG':
+        return flatten_image(img)
+    if img_format == 'PNG' and img.mode == 'CMYK':
+        return img.convert('RGB')
+    return img
+
+def encode(img, img_format, settings, quality=None, lossless=False):
+    """Encodes the image into memory
+
+    :param img: The image
+    :param img_format: The Pillow format
+    :param settings: The encoder settings
+    :param quality: The quality, overrides the quality of the settings [optional]
+    :param lossless: Flag whether to write WebP lossless
+    :return: The encoded image (BytesIO)
+    """
+    buf = io.BytesIO()
+    img.save(buf, img_format, **get_save_options(img_format, settings, quality=quality, lossless=lossless))
+    return buf
+
+def encode_image(img, img_format, settings=None, max_bytes=0, lossless=False):
+    """Encodes the image into memory, within the size budget if one is given
+
+    The image is converted into a mode the format can store first, see convert_for_format.
+
+    With a size budget, images in lossy formats are encoded at the configured quality first.
+    If they are too large, the highest quality that fits is bisected between MIN_QUALITY and the
+    configured quality, every attempt is encoded into memory. If even MIN_QUALITY is too large,
+    the image is encoded at MIN_QUALITY. Lossless formats are encoded once.
+
+    :param img: The image
+    :param img_format: The Pillow format
+    :param settings: The encoder settings, see get_encoder_settings, None for the defaults
+    :param max_bytes: The maximum size in bytes, 0 for no limit
+    :param lossless: Flag whether to write WebP lossless
+    :return: Tuple (encoded image (BytesIO), quality or None, number of encodings)
+    """
+    settings = get_encoder_settings(settings)
+    img = convert_for_format(img, img_format)
+    quality = get_quality(img_format, settings, lossless=lossless)
+    buf = encode(img, img_format, settings, lossless=lossless)
+    if not max_bytes or buf.tell() <= max_bytes:
+        return buf, quality, 1
+    if quality is None:
+        logging.warning('Cannot encode %s images within %d bytes, writing %d bytes', get_format_label(img_format, lossless), max_bytes, buf.tell())
+        return buf, quality, 1
+
+    attempts = 1
+    best = None
+    # The smallest encoding that is too large, written if no quality fits
+    smallest = (buf, quality)
+    low, high = MIN_QUALITY, quality - 1
+    while low <= high:
+        mid = (low + high) // 2
+        candidate = encode(img, img_format, settings, quality=mid)
+        attempts += 1
+        if candidate.tell() <= max_bytes:
+            best = (candidate, mid)
+            low = mid + 1
+        else:
+            smallest = (candidate, mid)
+            high = mid - 1
+    if not best:
+        best = smallest
+        logging.warning('Cannot encode image within %d bytes, writing %d bytes at quality %d', max_bytes, best[0].tell(), best[1])
+    return best[0], best[1], attempts
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""FileTypeCache
+
+Caches the file types sniffed from the content of files. Does not depend on Qt.
+"""
+
+import logging
+import os
+import threading
+
+import filetype
+
+# Mime types of the supported images
+IMAGE_MIME_TYPES = ['image/jpeg', 'image/png']
+
+# Mime types of all images known to filetype, see filetype.is_image
+ANY_IMAGE_MIME_TYPES = [matcher.mime for matcher in filetype.image_matchers]
+
+class FileTypeCache():
+    """Mime types of files, sniffed from their first bytes
+
+    An entry is valid as long as the size and the modification time of the file are the same,
+    files dropped or selected again are not read again. Thread-safe, files are sniffed outside the lock.
+    """
+
+    def __init__(self):
+        """Initializes the cache"""
+        # Path -> tuple (size, mtime in ns, mime type or None)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_mime(self, path):
+        """Returns the mime type of the file
+
+        :param path: The file path
+        :return: The mime type or None if it is unknown or the file cannot be read
+        """
+        try:
+            stat = os.stat(path)
+        except OSError as ex:
+            logging.debug('Could not stat "%s": %s', path, ex)
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        try:
+            kind = filetype.guess(path)
+        except OSError as ex:
+            logging.debug('Could not sniff "%s": %s', path, ex)
+            return None
+        mime = kind.mime if kind else None
+        with self._lock:
+            self._entries[path] = (stat.st_size, stat.st_mtime_ns, mime)
+        return mime
+
+    def is_image(self, path, mime_types=IMAGE_MIME_TYPES):
+        """Returns whether the file is a supported image
+
+        :param path: The file path
+        :param mime_types: The mime types of the accepted images
+        :return: True if the file is an image of one of the mime types (default: JPEG or PNG), False else
+        """
+        return self.get_mime(path) in mime_types
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""ImageList
+
+Ordered list of the selected image paths without duplicates. Does not depend on Qt.
+"""
+
+from lib.Dedupe import get_path_key
+
+class ImageList():
+    """Ordered image paths with constant time lookup of paths of the same file
+
+    The paths and their keys (see lib.Dedupe.get_path_key) are kept in two parallel lists, indexed
+    by row, and the keys in a set for the lookup. Removing or moving rows shifts the references
+    after them only, the paths are not copied.
+    """
+
+    def __init__(self, paths=None):
+        """Initializes the list
+
+        :param paths: The initial paths
+        """
+        self._paths = []
+        self._keys = []
+        self._key_set = set()
+        if paths:
+            self.add_entries(self.get_new_entries(paths))
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __getitem__(self, row):
+        return self._paths[row]
+
+    def get_paths(self):
+        """Returns the paths
+
+        :return: A copy of the paths, in list order
+        """
+        return list(self._paths)
+
+    def get_new_entries(self, paths):
+        """Returns the entries of the paths that are not in the list yet
+
+        Paths of the same file are only returned once. Reads the file system, see filter_new_entries.
+
+        :param paths: The paths
+        :return: List of tuples (path, key) in the order of the paths, see add_entries
+        """
+        return self.filter_new_entries([(path, get_path_key(path)) for path in paths])
+
+    def filter_new_entries(self, entries):
+        """Returns the entries that are not in the list yet, without reading the file system
+
+        Entries of the same file are only returned once.
+
+        :param entries: List of tuples (path, key), the keys computed with lib.Dedupe.get_path_key
+        :return: List of tuples (path, key) in the order of the entries, see add_entries
+        """
+        new_entries = []
+        keys = set()
+        for path, key in entries:
+            if key not in self._key_set and key not in keys:
+                keys.add(key)
+                new_entries.append((path, key))
+        return new_entries
+
+    def add_entries(self, entries):
+        """Appends entries returned by get_new_entries
+
+        :param entries: List of tuples (path, key)
+        """
+        for path, key in entries:
+            self._paths.append(path)
+            self._keys.append(key)
+            self._key_set.add(key)
+
+    def remove(self, row, count=1):
+        """Removes rows
+
+        :param row: The first row
+        :param count: The number of rows
+        """
+        for key in self._keys[row:row + count]:
+            self._key_set.discard(key)
+        del self._paths[row:row + count]
+        del self._keys[row:row + count]
+
+    def move(self, row, count, destination):
+        """Moves rows
+
+        :param row: The first row
+        :param count: The number of rows
+        :param destination: The row to move them before, counted before the move
+        """
+        if destination > row:
+            destination -= count
+        for lst in (self._paths, self._keys):
+            block = lst[row:row + count]
+            del lst[row:row + count]
+            lst[destination:destination] = block
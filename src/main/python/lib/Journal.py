@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Journal"""
+
+import hashlib
+import json
+import logging
+import os
+
+JOURNAL_NAME = '.imagescaler-journal'
+
+class Journal():
+    """Checkpoint journal of a batch
+
+    Records the indices of the finished images of a batch, one line per image, flushed
+    immediately so that the journal survives crashes. A cancelled or crashed batch
+    leaves its journal in the output directory, running the same batch (same images,
+    same parameters) again resumes it. The journal is removed when a batch completes.
+    """
+
+    _VERSION = 1
+
+    def __init__(self, outdir, images, params):
+        """Initializes the journal
+
+        :param outdir: The output directory
+        :param images: The images of the batch
+        :param params: The scale parameters (dict)
+        """
+        self.path = os.path.join(outdir, JOURNAL_NAME)
+        self.key = self._get_key(images, params)
+        self.nr_images = len(images)
+
+        self._file = None
+
+    def open(self):
+        """Opens the journal, continues the journal of the same batch if there is one
+
+        :return: The indices of the images that have been finished before (set)
+        """
+        done = self._load()
+        if done is None:
+            done = set()
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._file.write(json.dumps({'version': self._VERSION, 'key': self.key, 'images': self.nr_images}) + '\n')
+            self._file.flush()
+        else:
+            logging.info('Resuming batch, %d of %d images are done', len(done), self.nr_images)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            # Terminates an incomplete last line, empty lines are ignored
+            self._file.write('\n')
+            self._file.flush()
+        return done
+
+    def record(self, index):
+        """Records the image as finished
+
+        :param index: The index of the image
+        """
+        self._file.write(f'{index}\n')
+        self._file.flush()
+
+    def close(self, completed):
+        """Closes the journal
+
+        :param completed: Flag whether the batch has been completed, removes the journal
+        """
+        if self._file:
+            self._file.close()
+            self._file = None
+        if completed:
+            try:
+                os.remove(self.path)
+            except OSError as ex:
+                logging.debug('Could not remove journal "%s": %s', self.path, ex)
+
+    def _load(self):
+        """Loads the finished indices of the journal of the same batch
+
+        :return: The indices (set) or None if there is no journal of this batch
+        """
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                if header.get('version') != self._VERSION or header.get('key') != self.key:
+                    logging.debug('Journal "%s" belongs to another batch', self.path)
+                    return None
+                done = set()
+                for line in f:
+                    # The last line may be incomplete after a crash
+                    if line.endswith('\n') and line.strip().isdigit():
+                        done.add(int(line))
+                return {index for index in done if index < self.nr_images}
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def _get_key(self, images, params):
+        """Returns the key identifying the batch
+
+        :param images: The images
+        :param params: The scale parameters (dict)
+        :return: The key
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+        for img in images:
+            digest.update(os.path.abspath(img).encode('utf-8', 'surrogateescape'))
+            digest.update(b'\0')
+        return digest.hexdigest()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Manifest"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+
+MANIFEST_NAME = '.imagescaler-manifest.sqlite'
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """Returns the content hash of the file
+
+    :param path: The file path
+    :param chunk_size: The size of the chunks the file is read in
+    :return: The hex digest
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_bytes(data):
+    """Returns the content hash of data that has been read already, equal to hash_file of the file
+
+    :param data: The data
+    :return: The hex digest
+    """
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+class Manifest():
+    """Persistent record of the outputs in an output directory
+
+    Every entry maps an input file (path, size, mtime, optional content hash) and the
+    scale parameters to the output file (path, size, mtime). An output is up to date if
+    neither the input nor the output changed since it has been recorded.
+    Not thread-safe, use from a single thread.
+    """
+
+    _COMMIT_EVERY = 100
+
+    def __init__(self, outdir, use_hash=False):
+        """Initializes the manifest
+
+        :param outdir: The output directory
+        :param use_hash: Flag whether to compare content hashes if size or mtime of an input changed
+        """
+        self.path = os.path.join(outdir, MANIFEST_NAME)
+        self.use_hash = use_hash
+
+        self._conn = None
+        self._uncommitted = 0
+
+    def open(self):
+        """Opens (and creates) the manifest database"""
+        logging.debug('Opening manifest "%s"', self.path)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS outputs (
+                                input_path TEXT NOT NULL,
+                                params TEXT NOT NULL,
+                                input_size INTEGER NOT NULL,
+                                input_mtime_ns INTEGER NOT NULL,
+                                input_hash TEXT,
+                                output_path TEXT NOT NULL,
+                                output_size INTEGER NOT NULL,
+                                output_mtime_ns INTEGER NOT NULL,
+                                PRIMARY KEY (input_path, params))''')
+        self._conn.commit()
+
+    def close(self):
+        """Commits pending entries and closes the manifest database"""
+        if self._conn:
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+    def is_up_to_date(self, input_path, output_path, params):
+        """Returns whether the output of the input is up to date
+
+        :param input_path: The input path
+        :param output_path: The output path
+        :param params: The scale parameters (dict)
+        :return: Boolean flag whether the output is up to date
+        """
+        row = self._conn.execute('''SELECT input_size, input_mtime_ns, input_hash, output_path, output_size, output_mtime_ns
+                                    FROM outputs WHERE input_path = ? AND params = ?''',
+                                 (os.path.abspath(input_path), self._params_key(params))).fetchone()
+        if not row:
+            return False
+        input_size, input_mtime_ns, input_hash, recorded_output_path, output_size, output_mtime_ns = row
+        try:
+            input_stat = os.stat(input_path)
+            output_stat = os.stat(output_path)
+        except OSError:
+            return False
+        if recorded_output_path != os.path.abspath(output_path) \
+           or output_stat.st_size != output_size or output_stat.st_mtime_ns != output_mtime_ns:
+            return False
+        if input_stat.st_size != input_size:
+            return False
+        if input_stat.st_mtime_ns == input_mtime_ns:
+            return True
+        if self.use_hash and input_hash and hash_file(input_path) == input_hash:
+            logging.debug('Content of "%s" did not change, updating its mtime', input_path)
+            self._conn.execute('UPDATE outputs SET input_mtime_ns = ? WHERE input_path = ? AND params = ?',
+                               (input_stat.st_mtime_ns, os.path.abspath(input_path), self._params_key(params)))
+            self._changed()
+            return True
+
+        return False
+
+    def record(self, input_path, output_path, params, input_hash=None):
+        """Records the output of the input
+
+        :param input_path: The input path
+        :param output_path: The output path
+        :param params: The scale parameters (dict)
+        :param input_hash: The content hash of the input, optional
+        """
+        try:
+            input_stat = os.stat(input_path)
+            output_stat = os.stat(output_path)
+        except OSError as ex:
+            logging.debug('Not recording "%s": %s', input_path, ex)
+            return
+        self._conn.execute('INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                           (os.path.abspath(input_path), self._params_key(params),
+                            input_stat.st_size, input_stat.st_mtime_ns, input_hash,
+                            os.path.abspath(output_path), output_stat.st_size, output_stat.st_mtime_ns))
+        self._changed()
+
+    def _changed(self):
+        """Commits every _COMMIT_EVERY changes"""
+        self._uncommitted += 1
+        if self._uncommitted >= self._COMMIT_EVERY:
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def _params_key(self, params):
+        """Returns the database key of the scale parameters
+
+        :param params: The scale parameters (dict)
+        :return: The key
+        """
+        return json.dumps(params, sort_keys=True)
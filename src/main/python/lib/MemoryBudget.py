@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""MemoryBudget"""
+
+import logging
+import os
+
+from PIL import Image
+
+# Used if the physical memory cannot be determined
+DEFAULT_BUDGET = 2 * 1024 * 1024 * 1024
+
+def get_physical_memory():
+    """Returns the physical memory of the machine
+
+    :return: The physical memory in bytes or None if it cannot be determined
+    """
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def get_memory_budget(budget_mb=0):
+    """Returns the memory budget
+
+    :param budget_mb: The budget in MB, 0 for half of the physical memory
+    :return: The budget in bytes
+    """
+    if budget_mb > 0:
+        return budget_mb * 1024 * 1024
+    physical_memory = get_physical_memory()
+    return physical_memory // 2 if physical_memory else DEFAULT_BUDGET
+
+def get_pixel_size(mode):
+    """Returns the number of bytes Pillow stores a pixel of the mode in
+
+    Multi-band modes are stored in 4 bytes per pixel, e.g. RGB as RGBX.
+
+    :param mode: The image mode
+    :return: The number of bytes
+    """
+    if mode.startswith('I;16'):
+        return 2
+    if mode in ('1', 'L', 'P'):
+        return 1
+    return 4
+
+def read_header(path):
+    """Reads the number of pixels and the mode from the header of the image file, without decoding it
+
+    :param path: The image path
+    :return: Tuple (number of pixels, mode) or None if the header cannot be read
+    """
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            return width * height, img.mode
+    except Exception as ex:
+        logging.debug('Could not read the header of "%s": %s', path, ex)
+        return None
+
+def get_decoded_size(header):
+    """Returns the memory of the decoded image
+
+    :param header: Tuple (number of pixels, mode), see read_header, or None
+    :return: The size in bytes, 0 if the header is None
+    """
+    if not header:
+        return 0
+    pixels, mode = header
+    return pixels * get_pixel_size(mode)
+
+class MemoryBudget():
+    """Admits images to be scaled concurrently as long as their decoded sizes fit into the budget
+
+    An image is always admitted if no other image is being scaled, so an image that is larger than
+    the budget is scaled alone. Not thread-safe, use from a single thread.
+    """
+
+    def __init__(self, budget):
+        """Initializes the budget
+
+        :param budget: The budget in bytes
+        """
+        self.budget = budget
+
+        self.used = 0
+        self.nr_admitted = 0
+
+    def can_admit(self, size):
+        """Returns whether an image of the given size can be admitted now
+
+        :param size: The estimated size in bytes
+        :return: True if the image can be admitted, False else
+        """
+        return self.nr_admitted == 0 or self.used + size <= self.budget
+
+    def admit(self, size):
+        """Admits an image
+
+        :param size: The estimated size in bytes
+        """
+        self.used += size
+        self.nr_admitted += 1
+
+    def release(self, size):
+        """Releases an admitted image
+
+        :param size: The estimated size in bytes
+        """
+        self.used -= size
+        self.nr_admitted -= 1
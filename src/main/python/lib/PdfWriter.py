@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""PdfWriter"""
+
+import io
+import logging
+import os
+
+from PIL import Image
+
+def flatten_image(img, background=(255, 255, 255)):
+    """Returns an RGB (or L/CMYK) version of the image, transparency is composited onto the background
+
+    :param img: The image
+    :param background: The background color
+    :return: The flattened image
+    """
+    if img.mode in ('RGB', 'L', 'CMYK'):
+        return img
+    if img.mode == 'P' and 'transparency' in img.info:
+        img = img.convert('RGBA')
+    if img.mode in ('RGBA', 'LA', 'PA', 'RGBa', 'La'):
+        img = img.convert('RGBA')
+        rgb = Image.new('RGB', img.size, background)
+        rgb.paste(img, mask=img.getchannel('A'))
+        return rgb
+    return img.convert('RGB')
+
+class PdfWriter():
+    """Writes a PDF file of one image per page, page by page
+
+    Pages are written to the file as soon as they are added, only the object offsets
+    are kept in memory. The file is written to a temporary path and moved to the
+    target path on close.
+    """
+
+    _COLOR_SPACES = {
+        'L': '/DeviceGray',
+        'RGB': '/DeviceRGB',
+        'CMYK': '/DeviceCMYK'
+    }
+
+    _OBJ_CATALOG = 1
+    _OBJ_PAGES = 2
+
+    def __init__(self, path, resolution=100.0):
+        """Initializes the writer
+
+        :param path: The PDF path
+        :param resolution: The resolution in dpi, defines the page size
+        """
+        self.path = path
+        self.resolution = resolution
+
+        self._tmp_path = f'{path}.part'
+        self._file = None
+        self._offsets = {}
+        self._last_obj = self._OBJ_PAGES
+        self._pages = []
+
+    def open(self):
+        """Opens the temporary file and writes the header"""
+        logging.debug('Writing PDF file "%s"', self._tmp_path)
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def get_nr_pages(self):
+        """Returns the number of pages written so far
+
+        :return: The number of pages
+        """
+        return len(self._pages)
+
+    def add_image(self, img):
+        """Adds the image as a new page, encoded as JPEG
+
+        :param img: The image
+        """
+        img = flatten_image(img)
+        buf = io.BytesIO()
+        img.save(buf, 'JPEG')
+        self.add_jpeg(buf.getvalue(), img.size, img.mode)
+
+    def add_jpeg_file(self, path):
+        """Adds the JPEG file as a new page, the file data is embedded without re-encoding
+
+        :param path: The JPEG path
+        :return: Boolean flag whether the file could be embedded as is, False if it is no embeddable JPEG
+        """
+        with Image.open(path) as img:
+            if img.format != 'JPEG' or img.mode not in self._COLOR_SPACES:
+                return False
+            size = img.size
+            mode = img.mode
+        with open(path, 'rb') as f:
+            self.add_jpeg(f.read(), size, mode)
+
+        return True
+
+    def close(self):
+        """Writes page tree, catalog and cross-reference table and moves the file to its path"""
+        kids = ' '.join(f'{page} 0 R' for page in self._pages)
+        self._write_obj(self._OBJ_PAGES, f'<< /Type /Pages /Kids [{kids}] /Count {len(self._pages)} >>'.encode('ascii'))
+        self._write_obj(self._OBJ_CATALOG, f'<< /Type /Catalog /Pages {self._OBJ_PAGES} 0 R >>'.encode('ascii'))
+
+        size = self._last_obj + 1
+        xref_offset = self._file.tell()
+        xref = [f'xref\n0 {size}\n', '0000000000 65535 f \n']
+        for obj in range(1, size):
+            if obj in self._offsets:
+                xref.append(f'{self._offsets[obj]:010d} 00000 n \n')
+            else:
+                xref.append('0000000000 65535 f \n')
+        xref.append(f'trailer\n<< /Size {size} /Root {self._OBJ_CATALOG} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n')
+        self._file.write(''.join(xref).encode('ascii'))
+        self._file.close()
+        self._file = None
+
+        os.replace(self._tmp_path, self.path)
+        logging.debug('Wrote PDF file "%s" with %d pages', self.path, len(self._pages))
+
+    def abort(self):
+        """Closes and removes the temporary file"""
+        if self._file:
+            self._file.close()
+            self._file = None
+        try:
+            os.remove(self._tmp_path)
+        except OSError as ex:
+            logging.debug('Could not remove "%s": %s', self._tmp_path, ex)
+
+    def add_jpeg(self, data, size, mode):
+        """Adds a page showing the JPEG data, the data is embedded as DCTDecode stream
+
+        :param data: The JPEG data
+        :param size: The image size (width, height)
+        :param mode: The image mode, 'L', 'RGB' or 'CMYK'
+        """
+        width, height = size
+        obj_image = self._last_obj + 1
+        obj_content = obj_image + 1
+        obj_page = obj_image + 2
+        self._last_obj = obj_page
+
+        # Like Pillow, CMYK JPEGs are written with inverted (Adobe) values
+        decode = ' /Decode [1 0 1 0 1 0 1 0]' if mode == 'CMYK' else ''
+        self._write_stream(obj_image,
+                           (f'/Type /XObject /Subtype /Image /Width {width} /Height {height} '
+                            f'/ColorSpace {self._COLOR_SPACES[mode]} /BitsPerComponent 8 /Filter /DCTDecode{decode}'),
+                           data)
+
+        page_width = width * 72.0 / self.resolution
+        page_height = height * 72.0 / self.resolution
+        self._write_stream(obj_content, '', f'q {page_width:.4f} 0 0 {page_height:.4f} 0 0 cm /image Do Q\n'.encode('ascii'))
+        self._write_obj(obj_page,
+                        (f'<< /Type /Page /Parent {self._OBJ_PAGES} 0 R /MediaBox [0 0 {page_width:.4f} {page_height:.4f}] '
+                         f'/Resources << /XObject << /image {obj_image} 0 R >> >> /Contents {obj_content} 0 R >>').encode('ascii'))
+        self._pages.append(obj_page)
+
+    def _write_obj(self, obj, body):
+        """Writes an object
+
+        :param obj: The object number
+        :param body: The object body (bytes)
+        """
+        self._offsets[obj] = self._file.tell()
+        self._file.write(f'{obj} 0 obj\n'.encode('ascii'))
+        self._file.write(body)
+        self._file.write(b'\nendobj\n')
+
+    def _write_stream(self, obj, dictionary, data):
+        """Writes a stream object
+
+        :param obj: The object number
+        :param dictionary: Additional entries of the stream dictionary
+        :param data: The stream data
+        """
+        self._offsets[obj] = self._file.tell()
+        self._file.write(f'{obj} 0 obj\n<< {dictionary} /Length {len(data)} >>\nstream\n'.encode('ascii'))
+        self._file.write(data)
+        self._file.write(b'\nendstream\nendobj\n')
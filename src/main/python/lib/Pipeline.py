@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Pipeline
+
+Overlaps the disk access of a batch with scaling. Does not depend on Qt.
+"""
+
+import logging
+import queue
+import threading
+import time
+
+from lib.Scaler import is_decoded_in_strips, read_image_file, write_image_file
+from lib.SharedBuffer import release
+from lib.StageStats import STAGE_READ, STAGE_WRITE
+
+class Pipeline():
+    """Read-ahead and write-behind stages around the workers of a batch
+
+    A reader thread reads the inputs into memory in submission order and starts the workers with
+    the content, while the workers scale the images read before. The workers encode into memory
+    and hand the outputs to a writer thread, which writes them while the workers scale the next
+    images. The number of images read but not scaled yet and the number of outputs waiting to be
+    written are bounded, a slow disk blocks the reader or the workers instead of filling the memory.
+    PNG images that are decoded in strips are not read ahead, their workers stream them from the file.
+    Outputs handed over as SharedBuffer are freed once they have been written or dropped.
+    """
+
+    def __init__(self, compute, results, max_read, max_write, strip_min_pixels=0, cancel_event=None, read=read_image_file):
+        """Initializes the pipeline
+
+        :param compute: Callable (index, image path, content or None) that starts scaling an image,
+            the worker puts (index, result of scale_image_task) into the pipeline when done, see put
+        :param results: The queue to put (index, result) into when an output has been written
+        :param max_read: The maximum number of images that have been read and are not scaled yet
+        :param max_write: The maximum number of outputs waiting to be written
+        :param strip_min_pixels: The minimum number of pixels of PNG images that are decoded in strips
+        :param cancel_event: The event that cancels the batch, cancelled outputs are not written
+        :param read: Callable (image path) that reads an input, e.g. lib.SharedBuffer.read_shared for worker processes
+        """
+        self.compute = compute
+        self.read = read
+        self.results = results
+        self.strip_min_pixels = strip_min_pixels
+        self.cancel_event = cancel_event
+
+        self._read_queue = queue.Queue()
+        self._read_slots = threading.Semaphore(max_read)
+        self._write_queue = queue.Queue(maxsize=max_write)
+        self._read_durations = {}
+        self._stopped = threading.Event()
+        self._reader = threading.Thread(target=self._read, name='Pipeline-Reader', daemon=True)
+        self._writer = threading.Thread(target=self._write, name='Pipeline-Writer', daemon=True)
+
+    def start(self):
+        """Starts the reader and the writer"""
+        self._reader.start()
+        self._writer.start()
+
+    def stop(self):
+        """Stops the reader and the writer
+
+        Images that have not been read yet are not started anymore, results that arrive later are
+        reported without writing their outputs.
+        """
+        self._stopped.set()
+        self._read_queue.put(None)
+        self._write_queue.put(None)
+        self._reader.join()
+        self._writer.join()
+
+    def submit(self, index, img):
+        """Submits an image, returns immediately
+
+        :param index: The index of the image
+        :param img: The image path
+        """
+        self._read_queue.put((index, img))
+
+    def put(self, item):
+        """Hands the result of a worker to the writer, blocks while too many outputs are waiting
+
+        Same interface as the result queue, so that workers need not know about the pipeline.
+
+        :param item: Tuple (index, result of scale_image_task)
+        """
+        self._read_slots.release()
+        while not self._stopped.is_set():
+            try:
+                self._write_queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+        index, result = item
+        result = dict(result, ok=False)
+        release(result.pop('data', None))
+        self.results.put((index, result))
+
+    def _read(self):
+        """Reads the submitted images and starts their workers"""
+        while True:
+            item = self._read_queue.get()
+            if item is None or self._stopped.is_set():
+                return
+            index, img = item
+            self._read_slots.acquire()
+            if self._stopped.is_set():
+                return
+            data = None
+            if not (self.cancel_event and self.cancel_event.is_set()) and not is_decoded_in_strips(img, self.strip_min_pixels):
+                start = time.perf_counter()
+                try:
+                    data = self.read(img)
+                    self._read_durations[index] = time.perf_counter() - start
+                except OSError as ex:
+                    # The worker reads it again and reports the error
+                    logging.debug('Could not read "%s" ahead: %s', img, ex)
+            self.compute(index, img, data)
+
+    def _write(self):
+        """Writes the outputs and reports the results"""
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                return
+            index, result = item
+            data = result.pop('data', None)
+            read_duration = self._read_durations.pop(index, None)
+            if data is not None:
+                if self.cancel_event and self.cancel_event.is_set():
+                    logging.debug('Cancelled, not writing "%s"', result['output'])
+                    result = dict(result, ok=False, cancelled=True)
+                else:
+                    start = time.perf_counter()
+                    try:
+                        write_image_file(result['output'], data)
+                        result['stages'][STAGE_WRITE] = time.perf_counter() - start
+                        if read_duration is not None:
+                            result['stages'][STAGE_READ] = read_duration
+                    except OSError as ex:
+                        logging.warning('Exception while writing "%s": %s', result['output'], ex)
+                        result = dict(result, ok=False, stages={}, error=type(ex).__name__, message=str(ex))
+                release(data)
+            self.results.put((index, result))
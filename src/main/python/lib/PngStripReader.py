@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""PngStripReader"""
+
+import io
+import logging
+import struct
+import zlib
+
+from PIL import Image
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Pillow mode and raw mode of the rows per (color type, bit depth) that can be decoded in strips.
+# The raw mode packs a decoded row back into the PNG row layout, the previous row of a strip.
+_STRIP_MODES = {
+    (0, 8): ('L', 'L'),
+    (0, 16): ('I;16', 'I;16B'),
+    (2, 8): ('RGB', 'RGB'),
+    (3, 8): ('P', 'P'),
+    (4, 8): ('LA', 'LA'),
+    (6, 8): ('RGBA', 'RGBA')
+}
+
+_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+# Chunks before the image data that are not copied into the strips (animation control)
+_SKIPPED_CHUNKS = (b'IHDR', b'acTL', b'fcTL')
+
+_READ_SIZE = 1024 * 1024
+
+def _chunk(chunk_type, data):
+    """Returns a PNG chunk
+
+    :param chunk_type: The chunk type, e.g. b'IDAT'
+    :param data: The chunk data
+    :return: The chunk (bytes)
+    """
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff)
+
+class PngStripReader():
+    """Decodes a non-interlaced PNG file in strips of rows, without holding the whole image in memory
+
+    The compressed image data is streamed from the file and inflated strip by strip. Every strip
+    is decoded by Pillow as a small PNG image of its own: the rows of the strip, still filtered,
+    preceded by the last row of the previous strip, unfiltered, as the reference row of the
+    PNG filters of the first row.
+    """
+
+    def __init__(self, path):
+        """Initializes the reader
+
+        :param path: The PNG file path
+        """
+        self.path = path
+
+        self.width = 0
+        self.height = 0
+        self.bit_depth = 0
+        self.color_type = 0
+        self.interlace = 0
+        self.mode = None
+
+        self._file = None
+        self._chunks = []
+        self._idat_remaining = 0
+        self._rawmode = None
+
+    def open(self):
+        """Opens the file and reads the chunks up to the image data
+
+        :raises ValueError: If the file is not a valid PNG file
+        """
+        self._file = open(self.path, 'rb')
+        if self._file.read(8) != PNG_SIGNATURE:
+            raise ValueError('Not a PNG file')
+        while True:
+            length, chunk_type = self._read_chunk_header()
+            if chunk_type == b'IDAT':
+                self._idat_remaining = length
+                break
+            data = self._file.read(length)
+            self._file.read(4)
+            if chunk_type == b'IHDR':
+                if len(data) != 13:
+                    raise ValueError('Invalid header')
+                self.width, self.height, self.bit_depth, self.color_type, _, _, self.interlace = struct.unpack('>IIBBBBB', data)
+            elif chunk_type == b'IEND':
+                raise ValueError('No image data')
+            elif chunk_type not in _SKIPPED_CHUNKS:
+                self._chunks.append((chunk_type, data))
+        self.mode, self._rawmode = _STRIP_MODES.get((self.color_type, self.bit_depth), (None, None))
+
+    def close(self):
+        """Closes the file"""
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def is_supported(self):
+        """Returns whether the image can be decoded in strips
+
+        :return: True if the image is not interlaced and has a supported color type and bit depth
+        """
+        return not self.interlace and self.mode is not None
+
+    def iter_strips(self, rows):
+        """Decodes the image strip by strip
+
+        :param rows: The number of rows per strip
+        :return: Generator of tuples (first row, image of the previous row and the strip), the strip starts at row 1 of the image
+        :raises ValueError: If the image data is truncated
+        """
+        row_bytes = (self.width * _CHANNELS[self.color_type] * self.bit_depth + 7) // 8
+        decompressor = zlib.decompressobj()
+        data = bytearray()
+        previous_row = bytes(row_bytes)
+        y = 0
+        while y < self.height:
+            nr_rows = min(rows, self.height - y)
+            needed = nr_rows * (row_bytes + 1)
+            while len(data) < needed:
+                compressed = decompressor.unconsumed_tail or self._read_idat(_READ_SIZE)
+                if not compressed:
+                    raise ValueError('Truncated image data')
+                data += decompressor.decompress(compressed, needed - len(data))
+            img = self._decode_strip(previous_row, data[:needed], nr_rows)
+            del data[:needed]
+            previous_row = img.crop((0, nr_rows, self.width, nr_rows + 1)).tobytes('raw', self._rawmode)
+            yield y, img
+            y += nr_rows
+
+    def _decode_strip(self, previous_row, strip_data, nr_rows):
+        """Decodes a strip
+
+        :param previous_row: The previous row, unfiltered
+        :param strip_data: The filtered rows of the strip
+        :param nr_rows: The number of rows of the strip
+        :return: The image of the previous row and the strip
+        """
+        header = struct.pack('>IIBBBBB', self.width, nr_rows + 1, self.bit_depth, self.color_type, 0, 0, 0)
+        png = io.BytesIO()
+        png.write(PNG_SIGNATURE)
+        png.write(_chunk(b'IHDR', header))
+        for chunk_type, data in self._chunks:
+            png.write(_chunk(chunk_type, data))
+        # The data is stored, not compressed again, filter type 0 (none) for the previous row
+        png.write(_chunk(b'IDAT', zlib.compress(b'\0' + previous_row + strip_data, 0)))
+        png.write(_chunk(b'IEND', b''))
+        png.seek(0)
+        img = Image.open(png)
+        img.load()
+        return img
+
+    def _read_chunk_header(self):
+        """Reads the length and type of the next chunk
+
+        :return: Tuple (length, type)
+        :raises ValueError: If the file ends
+        """
+        header = self._file.read(8)
+        if len(header) < 8:
+            raise ValueError('Unexpected end of file')
+        return struct.unpack('>I4s', header)
+
+    def _read_idat(self, size):
+        """Reads compressed image data, continues with the next IDAT chunk at the end of a chunk
+
+        :param size: The maximum number of bytes
+        :return: The data, empty at the end of the image data
+        """
+        while not self._idat_remaining:
+            if self._idat_remaining is None:
+                return b''
+            # Skips the CRC of the finished chunk
+            self._file.read(4)
+            length, chunk_type = self._read_chunk_header()
+            if chunk_type != b'IDAT':
+                logging.debug('End of image data in "%s"', self.path)
+                self._idat_remaining = None
+                return b''
+            self._idat_remaining = length
+        data = self._file.read(min(size, self._idat_remaining))
+        if not data:
+            return b''
+        self._idat_remaining -= len(data)
+        return data
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Progress"""
+
+import time
+
+# Minimum seconds between two progress reports
+PROGRESS_INTERVAL = 0.2
+
+class Progress():
+    """Progress of a batch, weighted by the pixels of the images
+
+    The pixels of an image are known from its header once it has been started, the pixels of the
+    images not started yet are extrapolated from the average of the scaled ones. Images whose
+    output was up to date and skipped images count as done without any work. Reports are coalesced: due returns True
+    at most once per interval. Not thread-safe, use from a single thread.
+    """
+
+    def __init__(self, nr_images, interval=PROGRESS_INTERVAL):
+        """Initializes the progress
+
+        :param nr_images: The number of images of the batch
+        :param interval: The minimum seconds between two reports
+        """
+        self.nr_images = nr_images
+        self.interval = interval
+
+        self.processed = 0
+        self.cached = 0
+        self.scaled = 0
+        self.pixels_done = 0
+        self.pixels_started = 0
+        self.nr_started = 0
+        self.bytes_in = 0
+
+        self._start = time.perf_counter()
+        self._last_report = None
+
+    def start(self, pixels):
+        """Records that an image has been started
+
+        :param pixels: The number of pixels of the image, 0 if unknown
+        """
+        self.nr_started += 1
+        self.pixels_started += pixels
+
+    def done(self, pixels=0, bytes_in=0, cached=False, started=True, skipped=False):
+        """Records that an image is done
+
+        :param pixels: The number of pixels of the image as passed to start
+        :param bytes_in: The number of bytes read
+        :param cached: Flag whether the output was up to date
+        :param started: Flag whether the image has been passed to start
+        :param skipped: Flag whether the image has been skipped, e.g. as a duplicate
+        """
+        self.processed += 1
+        if started:
+            self.nr_started -= 1
+            self.pixels_started -= pixels
+        if skipped:
+            return
+        if cached:
+            self.cached += 1
+            return
+        self.scaled += 1
+        self.pixels_done += pixels
+        self.bytes_in += bytes_in
+
+    def cancel(self, pixels=0):
+        """Records that a started image has been cancelled
+
+        :param pixels: The number of pixels of the image as passed to start
+        """
+        self.nr_started -= 1
+        self.pixels_started -= pixels
+
+    def due(self):
+        """Returns whether a report is due, starts a new interval if so
+
+        :return: True if the last report is at least one interval ago or if all images are done, False else
+        """
+        now = time.perf_counter()
+        if self.processed < self.nr_images and self._last_report is not None and now - self._last_report < self.interval:
+            return False
+        self._last_report = now
+        return True
+
+    def get_report(self):
+        """Returns the progress report
+
+        :return: The report (dict)
+            - processed: Number of images done
+            - total: Number of images of the batch
+            - cached: Number of images whose output was up to date
+            - fraction: The pixel-weighted fraction of the work done, 0.0 - 1.0
+            - images_per_s: Images done per second
+            - mb_per_s: Megabytes read per second
+            - eta: Estimated seconds until the batch is done, None if unknown
+        """
+        elapsed = time.perf_counter() - self._start
+        nr_unknown = self.nr_images - self.processed - self.nr_started
+        average = self.pixels_done / self.scaled if self.scaled else 0
+        pixels_remaining = self.pixels_started + nr_unknown * average
+        if self.processed >= self.nr_images:
+            fraction = 1.0
+        elif self.pixels_done + pixels_remaining > 0:
+            fraction = self.pixels_done / (self.pixels_done + pixels_remaining)
+        else:
+            fraction = self.processed / self.nr_images
+        eta = None
+        if self.processed >= self.nr_images:
+            eta = 0.0
+        elif self.pixels_done and elapsed > 0:
+            eta = pixels_remaining / (self.pixels_done / elapsed)
+        return {
+            'processed': self.processed,
+            'total': self.nr_images,
+            'cached': self.cached,
+            'fraction': fraction,
+            'images_per_s': self.processed / elapsed if elapsed > 0 else 0.0,
+            'mb_per_s': self.bytes_in / elapsed / 1000000 if elapsed > 0 else 0.0,
+            'eta': eta
+        }
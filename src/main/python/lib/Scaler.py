@@ -0,0 +1,669 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Scaler
+
+Scales single images. Does not depend on Qt, so that it can run in worker processes.
+"""
+
+import io
+import logging
+import math
+import mmap
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+import time
+
+from PIL import Image
+
+from lib.Encoder import OUTPUT_FORMAT_KEEP, OUTPUT_FORMATS, encode_image, get_format_label
+from lib.Manifest import hash_bytes, hash_file
+from lib.PngStripReader import PngStripReader
+from lib.SharedBuffer import SHARED_MIN_BYTES, SharedBuffer
+from lib.StageStats import STAGE_READ, STAGE_DECODE, STAGE_RESAMPLE, STAGE_ENCODE, STAGE_WRITE
+
+PRESET_FASTEST = 'fastest'
+PRESET_BALANCED = 'balanced'
+PRESET_BEST = 'best'
+
+# Resampling filter and reducing gap per preset. Before the filter is applied, JPEGs are decoded
+# at a reduced DCT scale (draft) and images are reduced by an integer factor (Image.reduce),
+# as long as they stay at least reducing_gap times the target size. None disables both.
+PRESETS = {
+    PRESET_FASTEST: {'filter': Image.BILINEAR, 'reducing_gap': 1.0},
+    PRESET_BALANCED: {'filter': Image.LANCZOS, 'reducing_gap': 2.0},
+    PRESET_BEST: {'filter': Image.LANCZOS, 'reducing_gap': None}
+}
+
+# Status of an image in its result record, see get_result_record
+STATUS_SCALED = 'scaled'
+STATUS_CACHED = 'cached'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+STATUS_DUPLICATE = 'duplicate'
+
+# The reducing gap of images decoded in strips if the preset has none, the results are
+# indistinguishable from resampling the full image in most cases (see Image.resize)
+STRIP_REDUCING_GAP = 3.0
+
+# The approximate size of a decoded strip
+STRIP_BYTES = 16 * 1024 * 1024
+
+# Raw modes to store the reduced strips in a memory-mapped file per mode, Image.frombuffer maps these modes
+_STRIP_MMAP_RAWMODES = {'L': 'L', 'RGB': 'RGBX', 'RGBA': 'RGBA'}
+
+# The cancel event of a worker process, see init_worker_process
+_process_cancel_event = None
+
+class ScalingCancelledError(Exception):
+    """Raised when scaling an image has been cancelled"""
+
+def init_worker_process(cancel_event, max_image_pixels=0):
+    """Initializes a worker process
+
+    Ctrl+C in a terminal interrupts the whole process group. The workers ignore it,
+    the parent cancels the batch through the cancel event instead.
+
+    :param cancel_event: The multiprocessing event that cancels the batch
+    :param max_image_pixels: The decompression bomb limit, see set_max_image_pixels
+    """
+    global _process_cancel_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _process_cancel_event = cancel_event
+    set_max_image_pixels(max_image_pixels)
+
+def set_max_image_pixels(max_image_pixels):
+    """Sets the number of pixels above which Pillow refuses to open images (decompression bomb protection)
+
+    Pillow warns above the limit and raises an error above twice the limit. Images decoded in strips are not affected.
+
+    :param max_image_pixels: The number of pixels, 0 to keep the default of Pillow
+    """
+    if max_image_pixels:
+        Image.MAX_IMAGE_PIXELS = max_image_pixels
+
+def get_preset(preset):
+    """Returns the preset if it is known, the balanced preset else
+
+    :param preset: The preset name
+    :return: The preset name
+    """
+    if preset in PRESETS:
+        return preset
+    logging.warning('Unknown preset "%s", using "%s"', preset, PRESET_BALANCED)
+    return PRESET_BALANCED
+
+def check_cancelled(cancel_event):
+    """Raises ScalingCancelledError if the event is set
+
+    :param cancel_event: The cancel event, may be None
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        raise ScalingCancelledError()
+
+def get_worker_id():
+    """Returns an id of the current worker
+
+    :return: The process id in worker processes, the thread id else
+    """
+    if multiprocessing.current_process().name != 'MainProcess':
+        return f'process-{os.getpid()}'
+    return f'thread-{threading.get_ident()}'
+
+def get_scaled_img_path(path_img, outdir, scaled_image_suffix, output_format=OUTPUT_FORMAT_KEEP):
+    """Returns the image name of the scaled image
+
+    :param path_img: The image path
+    :param outdir: The output directory
+    :param scaled_image_suffix: Scaled image suffix
+    :param output_format: The output format, see lib.Encoder.OUTPUT_FORMATS, determines the file extension
+    :return: The output image path or None if the image is not readable
+    """
+    try:
+        with open(path_img, encoding='utf-8') as f:
+            fname = os.path.basename(f.name)
+            lindex = fname.rfind('.')
+            newname = fname[:lindex] + scaled_image_suffix
+            suffix = OUTPUT_FORMATS[output_format]['extension'] if OUTPUT_FORMATS.get(output_format) else fname[lindex:]
+            out_path = f'{outdir}/{newname}{suffix}'
+            logging.debug('Output image path: "%s"', out_path)
+
+            return out_path
+    except Exception as ex:
+        logging.error('Error getting path for image "%s": %s', path_img, ex)
+        return None
+
+def get_max_size(orig_size, width=None, height=None):
+    """Returns the bounding box the image is scaled into
+
+    :param orig_size: The original size (width, height)
+    :param width: The width [optional if height set]
+    :param height: The height [optional if width set]
+    :return: The maximum size (width, height)
+    """
+    orig_width, orig_height = orig_size
+    if width and height:
+        return (width, height)
+    if width:
+        return (width, orig_height)
+    if height:
+        return (orig_width, height)
+    # No width or height specified
+    raise RuntimeError('Width or height required!')
+
+def get_thumbnail_size(orig_size, max_size):
+    """Returns the size Image.thumbnail scales an image of the given size to
+
+    :param orig_size: The original size (width, height)
+    :param max_size: The maximum size (width, height)
+    :return: The scaled size (width, height) or None if the image is not scaled down
+    """
+    orig_width, orig_height = orig_size
+    x, y = int(max_size[0]), int(max_size[1])
+    if x >= orig_width and y >= orig_height:
+        return None
+
+    def round_aspect(number, key):
+        return max(min(math.floor(number), math.ceil(number), key=key), 1)
+
+    aspect = orig_width / orig_height
+    if x / y >= aspect:
+        x = round_aspect(y * aspect, key=lambda n: abs(aspect - n / y))
+    else:
+        y = round_aspect(x / aspect, key=lambda n: 0 if n == 0 else abs(aspect - x / n))
+    return x, y
+
+def get_image_format(path):
+    """Returns the Pillow format of the file extension of the path
+
+    :param path: The file path
+    :return: The format, e.g. 'JPEG'
+    """
+    ext = os.path.splitext(path)[1].lower()
+    img_format = Image.registered_extensions().get(ext)
+    if not img_format:
+        raise ValueError(f'Unknown file extension: {ext}')
+    return img_format
+
+def get_conversion(input_image_path, output_format=OUTPUT_FORMAT_KEEP):
+    """Returns a label of the format conversion of the image, e.g. for statistics
+
+    :param input_image_path: The input image path
+    :param output_format: The output format
+    :return: The label, e.g. 'JPEG -> WEBP'
+    """
+    input_format = Image.registered_extensions().get(os.path.splitext(input_image_path)[1].lower(), 'UNKNOWN')
+    output = OUTPUT_FORMATS.get(output_format)
+    output_label = get_format_label(output['format'], output['lossless']) if output else input_format
+    return f'{input_format} -> {output_label}'
+
+def _reduce_strips(reader, factors, use_mmap, cancel_event):
+    """Decodes the image strip by strip and reduces every strip by the factors
+
+    :param reader: The opened PNG strip reader
+    :param factors: The reduction factors (x, y)
+    :param use_mmap: Flag whether to store the reduced image in a memory-mapped temporary file
+    :param cancel_event: The cancel event, may be None
+    :return: The reduced image
+    """
+    factor_x, factor_y = factors
+    reduced_size = (-(-reader.width // factor_x), -(-reader.height // factor_y))
+    rows = max(1, STRIP_BYTES // (reader.width * 4) // factor_y) * factor_y
+    reduced = None
+    buffer = None
+    for y, strip in reader.iter_strips(rows):
+        check_cancelled(cancel_event)
+        nr_rows = strip.height - 1
+        if strip.mode == 'I;16':
+            strip = strip.convert('I')
+        # The first row of a strip is the last row of the previous one
+        part = strip.reduce(factors, box=(0, 1, reader.width, nr_rows + 1))
+        if reduced is None and buffer is None:
+            rawmode = _STRIP_MMAP_RAWMODES.get(part.mode) if use_mmap else None
+            if rawmode:
+                with tempfile.TemporaryFile() as f:
+                    f.truncate(reduced_size[0] * reduced_size[1] * len(rawmode))
+                    # The mapping stays valid after the file has been closed
+                    buffer = mmap.mmap(f.fileno(), 0)
+            else:
+                reduced = Image.new(part.mode, reduced_size)
+        if buffer is not None:
+            data = part.tobytes('raw', rawmode)
+            offset = y // factor_y * reduced_size[0] * len(rawmode)
+            buffer[offset:offset + len(data)] = data
+        else:
+            reduced.paste(part, (0, y // factor_y))
+    if buffer is not None:
+        return Image.frombuffer(rawmode, reduced_size, buffer, 'raw', rawmode, 0, 1)
+    return reduced
+
+def _is_strip_candidate(reader, min_pixels):
+    """Returns whether the opened image is decoded in strips
+
+    Palette images are not: reducing them averages colors outside the palette, the output would
+    change to RGB and depend on the size. Decoded, they take one byte per pixel only.
+
+    :param reader: The opened PNG strip reader
+    :param min_pixels: The minimum number of pixels of images that are decoded in strips
+    :return: True if the image is decoded in strips, False else
+    """
+    return reader.is_supported() and reader.mode != 'P' and reader.width * reader.height >= min_pixels
+
+def decode_in_strips(input_image_path, width, height, reducing_gap, min_pixels, use_mmap=True, cancel_event=None):
+    """Decodes a large PNG image strip by strip and reduces it by an integer factor on the fly
+
+    Peak memory is proportional to the reduced image and one strip, not to the decoded image.
+    The reduced image is at least reducing_gap times the target size, like in Image.resize.
+
+    :param input_image_path: The input image path
+    :param width: The width [optional if height set]
+    :param height: The height [optional if width set]
+    :param reducing_gap: The reducing gap, None for STRIP_REDUCING_GAP
+    :param min_pixels: The minimum number of pixels of images that are decoded in strips
+    :param use_mmap: Flag whether to keep the reduced image in a memory-mapped temporary file instead of the heap
+    :param cancel_event: The cancel event, may be None
+    :return: Tuple (reduced image, box of the image in the reduced image, original size, target size, mode of the decoded image)
+        or None if the image is not decoded in strips
+    :raises ScalingCancelledError: If scaling has been cancelled
+    """
+    reader = PngStripReader(input_image_path)
+    try:
+        try:
+            reader.open()
+        except (OSError, ValueError):
+            return None
+        orig_size = (reader.width, reader.height)
+        if not _is_strip_candidate(reader, min_pixels):
+            return None
+        target_size = get_thumbnail_size(orig_size, get_max_size(orig_size, width=width, height=height))
+        if not target_size:
+            return None
+        reducing_gap = reducing_gap or STRIP_REDUCING_GAP
+        factors = (int(orig_size[0] / target_size[0] / reducing_gap) or 1, int(orig_size[1] / target_size[1] / reducing_gap) or 1)
+        if factors == (1, 1):
+            return None
+        logging.debug('Decoding %d x %d px in strips, reducing by %d x %d', orig_size[0], orig_size[1], factors[0], factors[1])
+        reduced = _reduce_strips(reader, factors, use_mmap, cancel_event)
+        return reduced, (0, 0, orig_size[0] / factors[0], orig_size[1] / factors[1]), orig_size, target_size, reader.mode
+    finally:
+        reader.close()
+
+def read_image_file(input_image_path):
+    """Reads the input image into memory
+
+    :param input_image_path: The input image path
+    :return: The file content (bytes)
+    """
+    with open(input_image_path, 'rb') as f:
+        return f.read()
+
+def write_image_file(output_image_path, data):
+    """Writes the encoded output image
+
+    :param output_image_path: The output image path
+    :param data: The encoded image (bytes-like object or SharedBuffer, which is attached but not freed)
+    """
+    with open(output_image_path, 'wb') as f:
+        if isinstance(data, SharedBuffer):
+            with data.attach().getbuffer() as view:
+                f.write(view)
+        else:
+            f.write(data)
+
+def is_decoded_in_strips(input_image_path, min_pixels):
+    """Returns whether the image is large enough to be decoded in strips, reads the header only
+
+    :param input_image_path: The input image path
+    :param min_pixels: The minimum number of pixels of images that are decoded in strips, 0 to never decode in strips
+    :return: True if the image is a supported PNG image of at least min_pixels pixels without a palette, False else
+    """
+    if not min_pixels:
+        return False
+    reader = PngStripReader(input_image_path)
+    try:
+        reader.open()
+        return _is_strip_candidate(reader, min_pixels)
+    except (OSError, ValueError):
+        return False
+    finally:
+        reader.close()
+
+def scale_image(input_image_path, output_image_path, width=None, height=None, fast_decode=False, preset=PRESET_BALANCED, output_format=OUTPUT_FORMAT_KEEP, encoder_settings=None, max_bytes=0, strip_min_pixels=0, strip_mmap=True, cancel_event=None):
+    """Scales the image
+
+    The input is read into memory before decoding and the output is encoded into memory
+    before writing, so that the durations of disk access and of the codecs can be told apart.
+    Large PNG images are streamed from the file and decoded in strips instead, see decode_in_strips.
+    Cancellation is checked between the stages, a cancelled image is not written.
+
+    :param input_image_path: The input image path
+    :param output_image_path: The output image path
+    :param width: The width [optional if height set]
+    :param height: The height [optional if width set]
+    :param fast_decode: Flag whether to decode JPEGs at 1/2, 1/4 or 1/8 scale (libjpeg) when the target is small enough
+    :param preset: The quality/speed preset, see PRESETS
+    :param output_format: The output format, see lib.Encoder.OUTPUT_FORMATS, 'keep' for the format of the output file extension
+    :param encoder_settings: The encoder settings, see lib.Encoder.get_encoder_settings, None for the defaults
+    :param max_bytes: The maximum output size in bytes, 0 for no limit, see lib.Encoder.encode_image
+    :param strip_min_pixels: The minimum number of pixels of PNG images that are decoded in strips, 0 to never decode in strips
+    :param strip_mmap: Flag whether to keep the reduced image of images decoded in strips in a memory-mapped temporary file
+    :param cancel_event: The event that cancels scaling, optional
+    :return: Tuple (durations in seconds per stage (dict), number of bytes read, number of bytes written)
+    :raises ScalingCancelledError: If scaling has been cancelled
+    """
+    stages, bytes_in, buf, _ = encode_scaled_image(input_image_path, output_image_path, width=width, height=height, fast_decode=fast_decode,
+                                                preset=preset, output_format=output_format, encoder_settings=encoder_settings, max_bytes=max_bytes,
+                                                strip_min_pixels=strip_min_pixels, strip_mmap=strip_mmap, cancel_event=cancel_event)
+    encoded = time.perf_counter()
+    write_image_file(output_image_path, buf.getbuffer())
+    stages[STAGE_WRITE] = time.perf_counter() - encoded
+    return stages, bytes_in, buf.tell()
+
+def encode_scaled_image(input_image_path, output_image_path, width=None, height=None, fast_decode=False, preset=PRESET_BALANCED, output_format=OUTPUT_FORMAT_KEEP, encoder_settings=None, max_bytes=0, strip_min_pixels=0, strip_mmap=True, data=None, cancel_event=None):
+    """Scales the image and encodes the output into memory, without writing it
+
+    See scale_image for the parameters.
+
+    :param data: The content of the input image if it has already been read, None to read it; never decoded in strips
+    :return: Tuple (durations in seconds per stage (dict) without the write stage, number of bytes read, encoded image (io.BytesIO),
+        tuple (input size, output size))
+    :raises ScalingCancelledError: If scaling has been cancelled
+    """
+    check_cancelled(cancel_event)
+    start = time.perf_counter()
+    resample = PRESETS[preset]['filter']
+    reducing_gap = PRESETS[preset]['reducing_gap']
+    strips = None
+    if strip_min_pixels and data is None:
+        strips = decode_in_strips(input_image_path, width, height, reducing_gap, strip_min_pixels,
+                                  use_mmap=strip_mmap, cancel_event=cancel_event)
+    if strips:
+        reduced_image, box, orig_size, target_size, mode = strips
+        bytes_in = os.path.getsize(input_image_path)
+        # Reading and decoding are interleaved, both count as decoding
+        read = start
+        decoded = time.perf_counter()
+        check_cancelled(cancel_event)
+
+        original_image = reduced_image.resize(target_size, resample, box=box)
+        if original_image.mode == 'RGBX':
+            original_image = original_image.convert('RGB')
+        elif mode == 'I;16':
+            original_image = original_image.convert(mode)
+        # Releases the memory-mapped file, if any
+        del reduced_image
+        resampled = time.perf_counter()
+        check_cancelled(cancel_event)
+    else:
+        if data is None:
+            data = read_image_file(input_image_path)
+        bytes_in = len(data)
+        read = time.perf_counter()
+        check_cancelled(cancel_event)
+
+        original_image = Image.open(io.BytesIO(data))
+        orig_size = original_image.size
+        logging.debug('The original image size is %d wide x %d high', orig_size[0], orig_size[1])
+
+        max_size = get_max_size(original_image.size, width=width, height=height)
+
+        target_size = get_thumbnail_size(original_image.size, max_size)
+        box = None
+        fast = fast_decode and original_image.format == 'JPEG'
+        if fast:
+            # Decode straight to the smallest DCT scale that is still at least the target size
+            reducing_gap = None
+            draft_size = target_size
+        elif reducing_gap:
+            draft_size = (int(target_size[0] * reducing_gap), int(target_size[1] * reducing_gap)) if target_size else None
+        else:
+            draft_size = None
+        if draft_size and original_image.format == 'JPEG':
+            res = original_image.draft(None, draft_size)
+            box = res[1] if res else None
+            logging.debug('Decoding at %d x %d px', original_image.size[0], original_image.size[1])
+        original_image.load()
+        decoded = time.perf_counter()
+        check_cancelled(cancel_event)
+
+        if target_size and original_image.size != target_size:
+            original_image = original_image.resize(target_size, resample, box=box, reducing_gap=reducing_gap)
+        resampled = time.perf_counter()
+        check_cancelled(cancel_event)
+
+    output = OUTPUT_FORMATS.get(output_format)
+    img_format = output['format'] if output else get_image_format(output_image_path)
+    lossless = output['lossless'] if output else False
+    buf, quality, attempts = encode_image(original_image, img_format, settings=encoder_settings, max_bytes=max_bytes, lossless=lossless)
+    encoded = time.perf_counter()
+    check_cancelled(cancel_event)
+
+    logging.debug('The scaled image size is %d wide x %d high', original_image.size[0], original_image.size[1])
+    logging.debug('Encoded "%s" as %s in %.1f ms, %d bytes, quality %s, %d encodings',
+                  output_image_path, get_format_label(img_format, lossless), (encoded - resampled) * 1000, buf.tell(), quality, attempts)
+
+    stages = {
+        STAGE_READ: read - start,
+        STAGE_DECODE: decoded - read,
+        STAGE_RESAMPLE: resampled - decoded,
+        STAGE_ENCODE: encoded - resampled
+    }
+    return stages, bytes_in, buf, (orig_size, original_image.size)
+
+def get_failed_result(worker=None, error=None, message=None):
+    """Returns the result of an image that could not be processed
+
+    :param worker: The worker id
+    :param error: The class name of the error
+    :param message: The error message
+    :return: The result (dict), see scale_image_task
+    """
+    return {
+        'output': None,
+        'ok': False,
+        'input_hash': None,
+        'worker': worker,
+        'duration': 0.0,
+        'cancelled': False,
+        'stages': {},
+        'bytes_in': 0,
+        'bytes_out': 0,
+        'conversion': None,
+        'input_size': None,
+        'output_size': None,
+        'error': error,
+        'message': message
+    }
+
+def get_result_record(index, img, result=None):
+    """Returns the record of an image of a batch, as reported to the GUI, the CLI and automation
+
+    :param index: The index of the image in the batch
+    :param img: The image path
+    :param result: The result of scale_image_task, None if the image has not been started
+    :return: The record (dict)
+        - index: The index of the image in the batch
+        - input: The image path
+        - output: The output path, None if there is no output
+        - status: 'scaled', 'cached' (the output was up to date), 'failed', 'cancelled'
+            or 'duplicate' (not scaled, see duplicate_of)
+        - input_size: [width, height] of the input or None
+        - output_size: [width, height] of the output or None
+        - bytes_in: The number of bytes read
+        - bytes_out: The number of bytes written
+        - duration: The duration in seconds
+        - error: The class name of the error of a failed image or None
+        - message: The error message or None
+        - duplicate_of: The path of the image a duplicate is a copy of or None
+    """
+    if result is None or result['cancelled']:
+        status = STATUS_CANCELLED
+    elif result.get('duplicate_of'):
+        status = STATUS_DUPLICATE
+    elif result.get('cached'):
+        status = STATUS_CACHED
+    elif result['ok']:
+        status = STATUS_SCALED
+    else:
+        status = STATUS_FAILED
+    result = result or get_failed_result()
+    return {
+        'index': index,
+        'input': img,
+        'output': result['output'] if result['ok'] else None,
+        'status': status,
+        'input_size': list(result['input_size']) if result['input_size'] else None,
+        'output_size': list(result['output_size']) if result['output_size'] else None,
+        'bytes_in': result['bytes_in'],
+        'bytes_out': result['bytes_out'],
+        'duration': result['duration'],
+        'error': result['error'],
+        'message': result['message'],
+        'duplicate_of': result.get('duplicate_of')
+    }
+
+def scale_image_task(img, outdir, scaled_image_suffix, width=None, height=None, fast_decode=False, preset=PRESET_BALANCED, output_format=OUTPUT_FORMAT_KEEP, encoder_settings=None, max_bytes=0, strip_min_pixels=0, strip_mmap=True, hash_input=False, data=None, write=True, cancel_event=None):
+    """Scales one image of a batch, runs in a worker thread or worker process
+
+    :param img: The image path
+    :param outdir: The output directory
+    :param scaled_image_suffix: Scaled image suffix
+    :param width: The width
+    :param height: The height
+    :param fast_decode: Flag whether to use reduced JPEG decoding
+    :param preset: The quality/speed preset
+    :param output_format: The output format
+    :param encoder_settings: The encoder settings
+    :param max_bytes: The maximum output size in bytes, 0 for no limit
+    :param strip_min_pixels: The minimum number of pixels of PNG images that are decoded in strips, 0 to never decode in strips
+    :param strip_mmap: Flag whether to keep the reduced image of images decoded in strips in a memory-mapped temporary file
+    :param hash_input: Flag whether to compute the content hash of the input
+    :param data: The content of the input image if it has already been read, None to read it
+    :param write: Flag whether to write the output, False to return the encoded output in the result
+    :param cancel_event: The event that cancels the batch, in worker processes the one passed to init_worker_process
+    :return: The result (dict)
+        - output: The scaled image path or None
+        - ok: Boolean flag whether the image has been scaled
+        - input_hash: The content hash of the input or None
+        - worker: The worker id
+        - duration: The duration in seconds
+        - cancelled: Boolean flag whether scaling has been cancelled
+        - stages: The durations in seconds per stage, empty if the image could not be scaled
+        - bytes_in: The number of bytes read
+        - bytes_out: The number of bytes written
+        - conversion: The format conversion, see get_conversion
+        - input_size: Tuple (width, height) of the input or None
+        - output_size: Tuple (width, height) of the output or None
+        - error: The class name of the error if the image could not be scaled, None else
+        - message: The error message or None
+        - data: The encoded output (bytes) if it has not been written, only if the image has been scaled
+    """
+    start = time.perf_counter()
+    ok = False
+    cancelled = False
+    input_hash = None
+    stages = {}
+    bytes_in = 0
+    bytes_out = 0
+    output_data = None
+    input_size = None
+    output_size = None
+    error = None
+    message = None
+    logging.debug('Processing image "%s", %sx%s px (width x height)', img, width, height)
+    scaled_img_name = get_scaled_img_path(img, outdir, scaled_image_suffix, output_format=output_format)
+    if scaled_img_name:
+        logging.debug('Scaled path of image "%s": "%s"', img, scaled_img_name)
+        logging.debug('Writing to "%s"', scaled_img_name)
+        try:
+            if hash_input:
+                input_hash = hash_file(img) if data is None else hash_bytes(data)
+            kwargs = {
+                'width': width,
+                'height': height,
+                'fast_decode': fast_decode,
+                'preset': preset,
+                'output_format': output_format,
+                'encoder_settings': encoder_settings,
+                'max_bytes': max_bytes,
+                'strip_min_pixels': strip_min_pixels,
+                'strip_mmap': strip_mmap,
+                'cancel_event': cancel_event if cancel_event is not None else _process_cancel_event
+            }
+            stages, bytes_in, buf, (input_size, output_size) = encode_scaled_image(img, scaled_img_name, data=data, **kwargs)
+            if write:
+                encoded = time.perf_counter()
+                write_image_file(scaled_img_name, buf.getbuffer())
+                stages[STAGE_WRITE] = time.perf_counter() - encoded
+                bytes_out = buf.tell()
+            else:
+                output_data = buf.getvalue()
+                bytes_out = len(output_data)
+            ok = True
+        except ScalingCancelledError:
+            logging.debug('Scaling "%s" cancelled', img)
+            cancelled = True
+        except Exception as ex:
+            logging.warning('Exception while scaling "%s": %s', img, ex)
+            error = type(ex).__name__
+            message = str(ex)
+    else:
+        error = 'OSError'
+        message = 'The image is not readable'
+
+    result = {
+        'output': scaled_img_name,
+        'ok': ok,
+        'input_hash': input_hash,
+        'worker': get_worker_id(),
+        'duration': time.perf_counter() - start,
+        'cancelled': cancelled,
+        'stages': stages,
+        'bytes_in': bytes_in,
+        'bytes_out': bytes_out,
+        'conversion': get_conversion(img, output_format),
+        'input_size': input_size,
+        'output_size': output_size,
+        'error': error,
+        'message': message
+    }
+    if ok and not write:
+        result['data'] = output_data
+    return result
+
+def scale_shared_image_task(img, outdir, scaled_image_suffix, data=None, share_output=False, **kwargs):
+    """Scales one image of a batch in a worker process, exchanging the input and the output in shared memory
+
+    The input is used in place, only the descriptors of the buffers are sent between the processes.
+
+    :param img: The image path
+    :param outdir: The output directory
+    :param scaled_image_suffix: Scaled image suffix
+    :param data: The content of the input image as SharedBuffer, which the caller frees when done, or bytes; None to read it
+    :param share_output: Flag whether to return a large encoded output as SharedBuffer, the caller owns and frees it
+    :param kwargs: The other arguments of scale_image_task
+    :return: The result (dict), see scale_image_task
+    """
+    if isinstance(data, SharedBuffer):
+        try:
+            with data.attach().getbuffer() as view:
+                result = scale_image_task(img, outdir, scaled_image_suffix, data=view, **kwargs)
+        finally:
+            data.close()
+    else:
+        result = scale_image_task(img, outdir, scaled_image_suffix, data=data, **kwargs)
+    output_data = result.get('data')
+    if share_output and output_data is not None and len(output_data) >= SHARED_MIN_BYTES:
+        shared = SharedBuffer.from_bytes(output_data)
+        # The ownership goes to the caller with the result
+        shared.close()
+        result['data'] = shared
+    return result
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Schedule
+
+Orders the images of a batch before they are started. Does not depend on Qt.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.MemoryBudget import read_header
+
+SCHEDULE_LIST = 'list'
+SCHEDULE_LARGEST_FIRST = 'largest-first'
+SCHEDULE_SMALLEST_FIRST = 'smallest-first'
+SCHEDULES = [SCHEDULE_LIST, SCHEDULE_LARGEST_FIRST, SCHEDULE_SMALLEST_FIRST]
+
+def get_schedule(schedule):
+    """Returns the schedule if it is known, 'list' else
+
+    :param schedule: The schedule name
+    :return: The schedule name
+    """
+    if schedule in SCHEDULES:
+        return schedule
+    logging.warning('Unknown schedule "%s", using "%s"', schedule, SCHEDULE_LIST)
+    return SCHEDULE_LIST
+
+def read_headers(images, indices, workers=4, cancel_event=None):
+    """Reads the headers of the images in parallel, without decoding them
+
+    :param images: The image paths
+    :param indices: The indices of the images to read
+    :param workers: The number of threads reading the headers
+    :param cancel_event: The event that cancels reading
+    :return: Dict index -> tuple (number of pixels, mode) or None, see lib.MemoryBudget.read_header
+    """
+    def _read(index):
+        if cancel_event and cancel_event.is_set():
+            return None
+        return read_header(images[index])
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='Schedule') as executor:
+        return dict(zip(indices, executor.map(_read, indices)))
+
+def get_start_order(indices, headers, schedule=SCHEDULE_LIST):
+    """Returns the order in which the images are started
+
+    Largest first (longest processing time first) keeps all workers busy until the end of the batch,
+    instead of one worker finishing a large image last. Smallest first returns the first results early.
+    Images of equal size and images whose header cannot be read keep their list order,
+    the latter are started last with largest first and first with smallest first.
+
+    :param indices: The indices of the images, in list order
+    :param headers: Dict index -> tuple (number of pixels, mode) or None, see read_headers
+    :param schedule: The schedule, see SCHEDULES
+    :return: The indices in start order (list)
+    """
+    if schedule == SCHEDULE_LIST:
+        return list(indices)
+
+    def _pixels(index):
+        header = headers.get(index)
+        return header[0] if header else 0
+
+    return sorted(indices, key=_pixels, reverse=schedule == SCHEDULE_LARGEST_FIRST)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""SharedBuffer
+
+Hands large buffers between the processes of a batch by name instead of by value. Does not depend on Qt.
+"""
+
+import logging
+import os
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python < 3.8, buffers are pickled
+    shared_memory = None
+
+# Smaller buffers are pickled, creating and mapping a segment costs more than copying them
+SHARED_MIN_BYTES = 1024 * 1024
+
+def is_shared_memory_available():
+    """Returns whether buffers can be shared between processes
+
+    :return: True if shared memory is available, False else
+    """
+    return shared_memory is not None
+
+def can_share_outputs():
+    """Returns whether worker processes can hand outputs to the parent in shared memory
+
+    On Windows, a segment is freed when the last process closes it, the worker cannot hand one over.
+
+    :return: True if outputs can be shared, False else
+    """
+    return is_shared_memory_available() and os.name != 'nt'
+
+class SharedBuffer():
+    """Bytes in a shared memory segment
+
+    Pickles as a small descriptor (name and size), so that only the descriptor is sent to or
+    received from a worker process. Lifetime: the process that creates a buffer owns the segment
+    until it hands the ownership over with a result, the owner calls unlink once no other
+    process uses it anymore. Other processes attach, use getbuffer and close without unlinking.
+    All views returned by getbuffer have to be released before close or unlink.
+    """
+
+    def __init__(self, name, size):
+        """Initializes the descriptor, use create, from_bytes or from_file to create a buffer
+
+        :param name: The name of the shared memory segment
+        :param size: The number of bytes used
+        """
+        self.name = name
+        self.size = size
+
+        self._shm = None
+
+    def __getstate__(self):
+        return {'name': self.name, 'size': self.size}
+
+    def __setstate__(self, state):
+        self.__init__(state['name'], state['size'])
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def create(cls, size):
+        """Creates a buffer, the calling process owns it
+
+        :param size: The number of bytes
+        :return: The attached buffer
+        """
+        # Segments must not be empty
+        shm = shared_memory.SharedMemory(create=True, size=max(1, size))
+        buffer = cls(shm.name, size)
+        buffer._shm = shm
+        return buffer
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Creates a buffer with a copy of the data, the calling process owns it
+
+        :param data: The data (bytes-like object)
+        :return: The attached buffer
+        """
+        with memoryview(data) as view:
+            buffer = cls.create(view.nbytes)
+            buffer._shm.buf[:view.nbytes] = view.cast('B')
+        return buffer
+
+    @classmethod
+    def from_file(cls, path):
+        """Creates a buffer with the content of the file, read directly into the segment, the calling process owns it
+
+        :param path: The file path
+        :return: The attached buffer
+        """
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            buffer = cls.create(size)
+            try:
+                with buffer._shm.buf[:size] as view:
+                    read = f.readinto(view)
+                if read != size:
+                    raise OSError(f'Read {read} of {size} bytes')
+            except BaseException:
+                buffer.unlink()
+                raise
+        return buffer
+
+    def attach(self):
+        """Attaches the segment of a buffer created by another process
+
+        :return: The buffer
+        """
+        if self._shm is None:
+            self._shm = shared_memory.SharedMemory(name=self.name)
+        return self
+
+    def getbuffer(self):
+        """Returns a view of the bytes, release it (or use it as context manager) when done
+
+        :return: The view (memoryview)
+        """
+        return self._shm.buf[:self.size]
+
+    def close(self):
+        """Detaches the segment, keeps it for other processes"""
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def unlink(self):
+        """Frees the segment, called by the owner"""
+        try:
+            self.attach()
+            self._shm.unlink()
+        except FileNotFoundError:
+            logging.debug('Shared memory "%s" has been freed already', self.name)
+        finally:
+            self.close()
+
+def read_shared(path):
+    """Reads a file to hand it to a worker process, large files into a shared buffer
+
+    :param path: The file path
+    :return: A SharedBuffer owned by the calling process or the content (bytes) of small files
+    """
+    if os.path.getsize(path) < SHARED_MIN_BYTES:
+        with open(path, 'rb') as f:
+            return f.read()
+    return SharedBuffer.from_file(path)
+
+def release(data):
+    """Frees the data if it is a shared buffer owned by the calling process
+
+    :param data: The data, a SharedBuffer, bytes or None
+    """
+    if isinstance(data, SharedBuffer):
+        data.unlink()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""StageStats"""
+
+import math
+
+STAGE_READ = 'read'
+STAGE_DECODE = 'decode'
+STAGE_RESAMPLE = 'resample'
+STAGE_ENCODE = 'encode'
+STAGE_WRITE = 'write'
+STAGE_PDF = 'pdf'
+STAGES = [STAGE_READ, STAGE_DECODE, STAGE_RESAMPLE, STAGE_ENCODE, STAGE_WRITE, STAGE_PDF]
+
+def get_percentile(sorted_values, percentile):
+    """Returns the percentile (nearest rank) of the values
+
+    :param sorted_values: The values, sorted ascending, not empty
+    :param percentile: The percentile, 0-100
+    :return: The value
+    """
+    rank = max(1, math.ceil(percentile / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def get_size_change(stats):
+    """Returns the relative size change of outputs against their inputs
+
+    :param stats: The statistics with bytes_in and bytes_out
+    :return: The change, e.g. -0.3 for outputs 30% smaller than their inputs, 0.0 without inputs
+    """
+    return stats['bytes_out'] / stats['bytes_in'] - 1 if stats['bytes_in'] else 0.0
+
+class StageStats():
+    """Collects the durations of the pipeline stages of a batch"""
+
+    def __init__(self):
+        """Initializes the statistics"""
+        self.durations = {stage: [] for stage in STAGES}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.conversions = {}
+
+    def add(self, stages, bytes_in=0, bytes_out=0, conversion=None):
+        """Adds the stage durations of one image or page
+
+        :param stages: The durations in seconds per stage (dict)
+        :param bytes_in: The number of bytes read
+        :param bytes_out: The number of bytes written
+        :param conversion: The format conversion of the image, e.g. 'JPEG -> WEBP' [optional]
+        """
+        for stage, duration in stages.items():
+            self.durations[stage].append(duration)
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        if conversion:
+            stats = self.conversions.setdefault(conversion, {'count': 0, 'bytes_in': 0, 'bytes_out': 0, 'encode': 0.0})
+            stats['count'] += 1
+            stats['bytes_in'] += bytes_in
+            stats['bytes_out'] += bytes_out
+            stats['encode'] += stages.get(STAGE_ENCODE, 0.0)
+
+    def get_summary(self):
+        """Returns the aggregates
+
+        :return: The summary (dict)
+            - stages: count, total, p50, p95 and max in seconds per stage that has durations, in pipeline order
+            - bytes_in: The number of bytes read
+            - bytes_out: The number of bytes written
+            - conversions: count, bytes_in, bytes_out and the total encode time in seconds per format conversion
+        """
+        stages = {}
+        for stage in STAGES:
+            values = sorted(self.durations[stage])
+            if values:
+                stages[stage] = {
+                    'count': len(values),
+                    'total': sum(values),
+                    'p50': get_percentile(values, 50),
+                    'p95': get_percentile(values, 95),
+                    'max': values[-1]
+                }
+        return {
+            'stages': stages,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'conversions': {conversion: dict(stats) for conversion, stats in sorted(self.conversions.items())}
+        }
+
+def format_summary(summary):
+    """Returns the summary as text lines, e.g. for logging
+
+    :param summary: The summary, see StageStats.get_summary
+    :return: The lines (list)
+    """
+    lines = [f'{"stage":<10} {"count":>6} {"total [s]":>10} {"p50 [ms]":>9} {"p95 [ms]":>9} {"max [ms]":>9}']
+    for stage, stats in summary['stages'].items():
+        lines.append(f'{stage:<10} {stats["count"]:>6} {stats["total"]:>10.3f} {stats["p50"] * 1000:>9.1f} '
+                     f'{stats["p95"] * 1000:>9.1f} {stats["max"] * 1000:>9.1f}')
+    lines.append(f'Read {summary["bytes_in"] / 1000000:.1f} MB, wrote {summary["bytes_out"] / 1000000:.1f} MB')
+    for conversion, stats in summary.get('conversions', {}).items():
+        lines.append(f'{conversion}: {stats["count"]} images, {stats["bytes_in"] / 1000000:.1f} MB -> {stats["bytes_out"] / 1000000:.1f} MB '
+                     f'({get_size_change(stats):+.1%}), encoding {stats["encode"]:.3f}s')
+    return lines
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""WorkerTuner
+
+Adjusts the number of active workers of a batch while it runs. Does not depend on Qt.
+"""
+
+import logging
+import os
+import statistics
+import threading
+import time
+
+# Minimum seconds a measurement window lasts
+TUNING_WINDOW = 2.0
+
+# Relative throughput change below which two windows count as equal
+TUNING_TOLERANCE = 0.05
+
+# Number of windows to stay at a worker count that cannot be improved before probing again
+TUNING_HOLD_WINDOWS = 5
+
+def get_max_workers(max_workers=0):
+    """Returns the maximum number of workers of the tuner
+
+    :param max_workers: The maximum number of workers, 0 for twice the number of CPU cores
+    :return: The maximum number of workers
+    """
+    if max_workers > 0:
+        return max_workers
+    return 2 * (os.cpu_count() or 1)
+
+class WorkerLimit():
+    """Adjustable limit of the workers scaling at the same time
+
+    acquire blocks while the limit is reached, a lowered limit takes effect as the running workers finish.
+    Thread-safe.
+    """
+
+    def __init__(self, limit):
+        """Initializes the limit
+
+        :param limit: The maximum number of active workers
+        """
+        self.limit = limit
+        self.active = 0
+
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Waits until a worker may start and counts it as active"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    def release(self):
+        """Counts a worker as finished"""
+        with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    def set_limit(self, limit):
+        """Sets the limit
+
+        :param limit: The maximum number of active workers
+        """
+        with self._condition:
+            self.limit = limit
+            self._condition.notify_all()
+
+class WorkerTuner():
+    """Hill-climbing controller of the number of workers
+
+    Measures the throughput in megapixels per second over windows of at least TUNING_WINDOW seconds
+    and twice as many images as workers. Megapixels instead of images keep windows of differently
+    sized images comparable. After every window the number of workers is changed by one:
+    - in the same direction as before while the throughput improves
+    - back, and then held, if it got worse
+    - down if it did not change, fewer workers take less memory for the same throughput
+    A count that is held is probed again after TUNING_HOLD_WINDOWS windows, as the disk or the
+    images may have changed. Results of images started before a change are not measured.
+    Not thread-safe, use from a single thread.
+    """
+
+    def __init__(self, workers, min_workers=1, max_workers=0, window=TUNING_WINDOW):
+        """Initializes the tuner
+
+        :param workers: The initial number of workers
+        :param min_workers: The minimum number of workers
+        :param max_workers: The maximum number of workers, 0 for twice the number of CPU cores
+        :param window: The minimum seconds of a measurement window
+        """
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, get_max_workers(max_workers))
+        self.workers = min(max(workers, self.min_workers), self.max_workers)
+        self.window = window
+
+        self.decisions = []
+
+        self._start = time.perf_counter()
+        self._last_throughput = None
+        self._last_move = 0
+        self._hold_after_move = False
+        self._holds = 0
+        self._settle = 0
+        self._reset_window()
+
+    def _reset_window(self):
+        """Starts a new measurement window"""
+        self._window_start = time.perf_counter()
+        self._pixels = 0
+        self._images = 0
+        self._durations = []
+
+    def done(self, pixels, duration):
+        """Records that a worker has scaled an image
+
+        :param pixels: The number of pixels of the image
+        :param duration: The seconds the worker took
+        """
+        if self._settle > 0:
+            # Started before the last change
+            self._settle -= 1
+            if not self._settle:
+                self._reset_window()
+            return
+        self._pixels += pixels
+        self._images += 1
+        self._durations.append(duration)
+
+    def update(self):
+        """Ends the measurement window if it is complete and adjusts the number of workers
+
+        :return: The new number of workers or None if it has not changed
+        """
+        elapsed = time.perf_counter() - self._window_start
+        if self._settle or elapsed < self.window or self._images < 2 * self.workers:
+            return None
+        throughput = self._pixels / elapsed / 1000000
+        images_per_s = self._images / elapsed
+        latency = statistics.median(self._durations)
+        move = self._decide(throughput)
+        if self.workers + move < self.min_workers or self.workers + move > self.max_workers:
+            move = 0
+        previous = self.workers
+        self.workers += move
+        self._last_move = move
+        self._last_throughput = throughput
+        self.decisions.append({
+            'time': time.perf_counter() - self._start,
+            'workers': previous,
+            'mp_per_s': throughput,
+            'images_per_s': images_per_s,
+            'latency': latency,
+            'next': self.workers
+        })
+        logging.info('Workers: %d -> %d (%.1f MP/s, %.1f images/s, median latency %.0f ms)',
+                     previous, self.workers, throughput, images_per_s, latency * 1000)
+        self._reset_window()
+        if not move:
+            return None
+        # The images running now were started with the old number of workers
+        self._settle = previous
+        return self.workers
+
+    def _decide(self, throughput):
+        """Returns the change of the number of workers after a window
+
+        :param throughput: The throughput of the window in megapixels per second
+        :return: -1, 0 or 1
+        """
+        if self._last_throughput is None:
+            return 1
+        if self._hold_after_move:
+            self._hold_after_move = False
+            self._holds = 0
+            return 0
+        change = throughput / self._last_throughput - 1 if self._last_throughput > 0 else 0.0
+        if not self._last_move:
+            self._holds += 1
+            if self._holds < TUNING_HOLD_WINDOWS and abs(change) <= 2 * TUNING_TOLERANCE:
+                return 0
+            self._holds = 0
+            return 1 if self.workers < self.max_workers else -1
+        if change > TUNING_TOLERANCE:
+            return self._last_move
+        if change < -TUNING_TOLERANCE:
+            self._hold_after_move = True
+            return -self._last_move
+        if self._last_move > 0:
+            # More workers did not help, go back and stay there
+            self._hold_after_move = True
+        return -1
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2019-2022 Denis Meyer
+#
+# This file is part of ImageScaler.
+#
+
+"""Tests of lib.Dedupe"""
+
+import os
+import tempfile
+import unittest
+
+from PIL import Image
+
+from lib.Dedupe import DEDUPE_PERCEPTUAL, find_duplicates
+
+class DedupeTests(unittest.TestCase):
+    """Tests of the perceptual dedupe mode"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _save(self, img, name):
+        path = os.path.join(self.tmpdir.name, name)
+        img.save(path)
+        return path
+
+    def _get_gradient(self, size):
+        img = Image.linear_gradient('L').resize(size).rotate(90, expand=True)
+        return Image.merge('RGB', (img, img.point(lambda value: value // 2), Image.new('L', img.size, 64)))
+
+    def test_solid_colours_are_kept(self):
+        red = self._save(Image.new('RGBA', (64, 64), (255, 0, 0, 128)), 'red.png')
+        black = self._save(Image.new('RGB', (64, 64), (0, 0, 0)).convert('P'), 'black.png')
+        white = self._save(Image.new('RGB', (48, 48), (255, 255, 255)), 'white.jpg')
+        self.assertEqual(find_duplicates([red, black, white], mode=DEDUPE_PERCEPTUAL), {})
+
+    def test_different_colours_are_kept(self):
+        gradient = self._get_gradient((256, 256))
+        orange = self._save(gradient, 'orange.png')
+        blue = self._save(Image.merge('RGB', gradient.split()[::-1]), 'blue.png')
+        self.assertEqual(find_duplicates([orange, blue], mode=DEDUPE_PERCEPTUAL), {})
+
+    def test_scaled_copy_is_duplicate(self):
+        gradient = self._get_gradient((256, 256))
+        original = self._save(gradient, 'original.png')
+        scaled = self._save(gradient.resize((128, 128), Image.LANCZOS), 'scaled.jpg')
+        self.assertEqual(find_duplicates([original, scaled], mode=DEDUPE_PERCEPTUAL), {1: 0})
+
+if __name__ == '__main__':
+    unittest.main()